@@ -0,0 +1,193 @@
+import zlib
+import base64
+import hashlib
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+def _parse_day(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        return None
+
+class HyperLogLog:
+    """Noyob elementlar sonini taxminiy hisoblash (p=12: 4 KB, xatolik ~1.6%)"""
+    
+    def __init__(self, p: int = 12, registers: Optional[np.ndarray] = None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+        self._alpha = 0.7213 / (1 + 1.079 / self.m)
+    
+    @staticmethod
+    def _hash(item) -> int:
+        return int.from_bytes(hashlib.blake2b(str(item).encode('utf-8'), digest_size=8).digest(), 'big')
+    
+    def add(self, item) -> bool:
+        """Element qo'shish; registr o'zgargan bo'lsa True"""
+        value = self._hash(item)
+        index = value >> (64 - self.p)
+        rest = value & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+    
+    def count(self) -> int:
+        return self.estimate(self.registers)
+    
+    def estimate(self, registers: np.ndarray) -> int:
+        raw = self._alpha * self.m * self.m / float(np.sum(np.exp2(-registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(registers == 0))
+        # Kichik sonlar uchun chiziqli hisoblash aniqroq
+        if raw <= 2.5 * self.m and zeros:
+            return round(self.m * np.log(self.m / zeros))
+        return round(raw)
+    
+    def to_bytes(self) -> bytes:
+        return zlib.compress(self.registers.tobytes())
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, p: int = 12) -> 'HyperLogLog':
+        registers = np.frombuffer(zlib.decompress(data), dtype=np.uint8).copy()
+        return cls(p, registers)
+
+class ActivityTracker:
+    """Kunlik faollik: har kun uchun faol foydalanuvchilar HLL i va hisoblagichlar.
+    
+    DAU/WAU/MAU kunlik HLL larni birlashtirib hisoblanadi, shuning uchun
+    statistika foydalanuvchilar soniga bog'liq emas.
+    """
+    
+    RETENTION_DAYS = 35
+    
+    def __init__(self, p: int = 12):
+        self.p = p
+        self._days: Dict[str, Dict[str, Any]] = {}
+    
+    @staticmethod
+    def _day_key(day: Optional[date] = None) -> str:
+        return (day or datetime.now().date()).isoformat()
+    
+    def _get_day(self, key: str) -> Dict[str, Any]:
+        entry = self._days.get(key)
+        if entry is None:
+            entry = {'hll': HyperLogLog(self.p), 'questions': 0, 'new_users': 0}
+            self._days[key] = entry
+            self._prune(key)
+        return entry
+    
+    def _prune(self, newest: str):
+        cutoff = (date.fromisoformat(newest) - timedelta(days=self.RETENTION_DAYS - 1)).isoformat()
+        for key in [key for key in self._days if key < cutoff]:
+            del self._days[key]
+    
+    def record_active(self, user_id: int, day: Optional[date] = None) -> bool:
+        # Saqlash kerakligini qaytaradi (HLL faqat ba'zan o'zgaradi)
+        return self._get_day(self._day_key(day))['hll'].add(user_id)
+    
+    def merge_sketch(self, data: bytes, day: Optional[date] = None):
+        """Boshqa jarayon yozgan kunlik HLL ni qo'shish (registrlar maksimumi)"""
+        entry = self._get_day(self._day_key(day))
+        other = HyperLogLog.from_bytes(data, self.p)
+        np.maximum(entry['hll'].registers, other.registers, out=entry['hll'].registers)
+    
+    def record_new_user(self, day: Optional[date] = None):
+        self._get_day(self._day_key(day))['new_users'] += 1
+    
+    def record_question(self, day: Optional[date] = None):
+        self._get_day(self._day_key(day))['questions'] += 1
+    
+    def active_users(self, days: int = 1, end: Optional[date] = None) -> int:
+        """Oxirgi `days` kun ichida faol bo'lgan noyob foydalanuvchilar (taxminiy)"""
+        end = end or datetime.now().date()
+        sketches = [self._days[key]['hll'].registers
+                    for key in (self._day_key(end - timedelta(days=offset)) for offset in range(days))
+                    if key in self._days]
+        if not sketches:
+            return 0
+        return HyperLogLog(self.p).estimate(np.maximum.reduce(sketches))
+    
+    def questions(self, day: Optional[date] = None) -> int:
+        entry = self._days.get(self._day_key(day))
+        return entry['questions'] if entry else 0
+    
+    def history(self, days: int = 30, end: Optional[date] = None) -> List[Dict[str, Any]]:
+        """Kunlar bo'yicha: sana, faol foydalanuvchilar, savollar, yangi foydalanuvchilar"""
+        end = end or datetime.now().date()
+        result = []
+        for offset in range(days - 1, -1, -1):
+            key = self._day_key(end - timedelta(days=offset))
+            entry = self._days.get(key)
+            result.append({
+                'date': key,
+                'active_users': entry['hll'].count() if entry else 0,
+                'questions': entry['questions'] if entry else 0,
+                'new_users': entry['new_users'] if entry else 0
+            })
+        return result
+    
+    def summary(self) -> Dict[str, int]:
+        return {
+            'active_today': self.active_users(1),
+            'active_week': self.active_users(7),
+            'active_month': self.active_users(30),
+            'questions_today': self.questions()
+        }
+    
+    def seed(self, users: Iterable[tuple]):
+        """Eski ma'lumotlardan boshlang'ich holat: (user_id, last_active, join_date)"""
+        for user_id, last_active, join_date in users:
+            active_day = _parse_day(last_active)
+            if active_day:
+                self.record_active(user_id, active_day)
+            join_day = _parse_day(join_date)
+            if join_day:
+                self.record_new_user(join_day)
+        # Saqlash muddatidan eski kunlar olib tashlanadi
+        if self._days:
+            self._prune(max(self._days))
+    
+    def day_row(self, day: Optional[date] = None) -> tuple:
+        """SQLite uchun: (kun, HLL, savollar, yangi foydalanuvchilar)"""
+        key = self._day_key(day)
+        entry = self._get_day(key)
+        return key, entry['hll'].to_bytes(), entry['questions'], entry['new_users']
+    
+    def rows(self) -> List[tuple]:
+        return [self.day_row(date.fromisoformat(key)) for key in sorted(self._days)]
+    
+    def load_rows(self, rows: Iterable[tuple]):
+        for key, sketch, questions, new_users in rows:
+            self._days[key] = {
+                'hll': HyperLogLog.from_bytes(sketch, self.p),
+                'questions': questions,
+                'new_users': new_users
+            }
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'p': self.p,
+            'days': {
+                key: {
+                    'hll': base64.b64encode(entry['hll'].to_bytes()).decode('ascii'),
+                    'questions': entry['questions'],
+                    'new_users': entry['new_users']
+                }
+                for key, entry in sorted(self._days.items())
+            }
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ActivityTracker':
+        tracker = cls(data.get('p', 12))
+        tracker.load_rows(
+            (key, base64.b64decode(entry['hll']), entry.get('questions', 0), entry.get('new_users', 0))
+            for key, entry in data.get('days', {}).items()
+        )
+        return tracker
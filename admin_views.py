@@ -0,0 +1,125 @@
+import html
+from typing import Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from database import Database
+from storage import DEFAULT_TENANT
+
+USERS_PAGE_SIZE = 10
+KNOWLEDGE_PAGE_SIZE = 5
+
+# callback_data 64 baytdan oshmasligi uchun qidiruv matni qisqartiriladi
+MAX_QUERY_BYTES = 32
+
+# Har bir yozuv qismining (HTML dan keyingi) eng katta uzunligi: sahifa
+# har doim Telegram xabari chegarasidan (4096) kichik bo'ladi
+NAME_LIMIT = 48
+QUESTION_LIMIT = 200
+ANSWER_LIMIT = 500
+
+View = Tuple[str, Optional[InlineKeyboardMarkup]]
+
+def clip_query(text: str) -> str:
+    return text.strip().encode('utf-8')[:MAX_QUERY_BYTES].decode('utf-8', 'ignore').strip()
+
+def preview(text: str, limit: int) -> str:
+    """HTML uchun xavfsiz, `limit` belgidan oshmaydigan qisqa matn"""
+    text = ' '.join((text or '').split())
+    escaped = html.escape(text, quote=False)
+    while len(escaped) > limit:
+        # Qisqartirish escape dan oldin qilinadi, aks holda "&amp;" bo'linib qolishi mumkin
+        text = text[:max(len(text) * (limit - 1) // len(escaped), 0)]
+        escaped = html.escape(text, quote=False) + '…'
+    return escaped
+
+def _navigation(previous: Optional[str], following: Optional[str]) -> Optional[InlineKeyboardMarkup]:
+    buttons = []
+    if previous:
+        buttons.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=previous))
+    if following:
+        buttons.append(InlineKeyboardButton("Keyingi ➡️", callback_data=following))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+def render_users_page(db: Database, cursor: int = 0, backward: bool = False, page: int = 1,
+                      query: str = '') -> View:
+    """Foydalanuvchilar sahifasi: user_id bo'yicha keyset (cursor - chegaradagi ID)"""
+    rows = db.get_users_page(cursor, USERS_PAGE_SIZE + 1, query, backward)
+    if backward:
+        # Ortiqcha yozuv oldinda yana sahifa borligini bildiradi
+        has_previous = len(rows) > USERS_PAGE_SIZE
+        rows = rows[-USERS_PAGE_SIZE:]
+        has_next = True
+        if not has_previous:
+            page = 1
+    else:
+        has_next = len(rows) > USERS_PAGE_SIZE
+        rows = rows[:USERS_PAGE_SIZE]
+        has_previous = page > 1
+    
+    if not rows:
+        if query:
+            return f"🔍 \"{html.escape(query)}\" bo'yicha foydalanuvchi topilmadi", None
+        return "📭 Hali foydalanuvchilar mavjud emas", None
+    
+    if query:
+        header = f"👥 <b>Foydalanuvchilar</b> — 🔍 \"{html.escape(query)}\""
+    else:
+        header = f"👥 <b>Foydalanuvchilar</b> (jami: {db.count_users()})"
+    lines = [header, f"📄 Sahifa {page}", ""]
+    
+    first_number = (page - 1) * USERS_PAGE_SIZE
+    for number, (user_id, data) in enumerate(rows, first_number + 1):
+        name = preview(data.get('first_name') or "Noma'lum", NAME_LIMIT)
+        username = f" (@{preview(data['username'], NAME_LIMIT)})" if data.get('username') else ""
+        blocked = " 🚫" if data.get('blocked') else ""
+        last_active = (data.get('last_active') or '')[:16].replace('T', ' ')
+        lines.append(f"{number}. <code>{user_id}</code> — {name}{username}{blocked}")
+        lines.append(f"    ❓ {data.get('questions_asked', 0)} ta savol · 🕒 {last_active}")
+    
+    previous = f"u:p:{rows[0][0]}:{page - 1}:{query}" if has_previous else None
+    following = f"u:n:{rows[-1][0]}:{page + 1}:{query}" if has_next else None
+    return "\n".join(lines), _navigation(previous, following)
+
+def render_knowledge_page(db: Database, offset: int = 0, query: str = '',
+                          tenant: str = DEFAULT_TENANT) -> View:
+    rows = db.get_knowledge_page(offset, KNOWLEDGE_PAGE_SIZE + 1, query, tenant)
+    has_next = len(rows) > KNOWLEDGE_PAGE_SIZE
+    rows = rows[:KNOWLEDGE_PAGE_SIZE]
+    
+    if not rows:
+        if query:
+            return f"🔍 \"{html.escape(query)}\" bo'yicha ma'lumot topilmadi", None
+        return "📭 Ma'lumotlar bazasi bo'sh", None
+    
+    shown = f"{offset + 1}–{offset + len(rows)}"
+    if query:
+        header = f"📚 <b>Ma'lumotlar bazasi</b> — 🔍 \"{html.escape(query)}\" ({shown})"
+    else:
+        header = f"📚 <b>Ma'lumotlar bazasi</b> ({shown} / {db.count_knowledge(tenant)})"
+    lines = [header, ""]
+    
+    for number, (question, answer) in enumerate(rows, offset + 1):
+        lines.append(f"<b>{number}. ❓ {preview(question, QUESTION_LIMIT)}</b>")
+        lines.append(f"✅ {preview(answer, ANSWER_LIMIT)}")
+        lines.append("")
+    
+    previous = f"kb:{max(offset - KNOWLEDGE_PAGE_SIZE, 0)}:{query}" if offset > 0 else None
+    following = f"kb:{offset + KNOWLEDGE_PAGE_SIZE}:{query}" if has_next else None
+    return "\n".join(lines).rstrip(), _navigation(previous, following)
+
+def render_callback(db: Database, data: str, tenant: str = DEFAULT_TENANT) -> Optional[View]:
+    """Inline tugma ma'lumotidan sahifani qayta chizish (noma'lum format - None).
+    
+    Bilimlar sahifasi chatga biriktirilgan maktab (tenant) bazasidan olinadi.
+    """
+    try:
+        if data.startswith('u:'):
+            _, direction, cursor, page, query = data.split(':', 4)
+            return render_users_page(db, int(cursor), direction == 'p', max(int(page), 1), query)
+        if data.startswith('kb:'):
+            _, offset, query = data.split(':', 2)
+            return render_knowledge_page(db, max(int(offset), 0), query, tenant)
+    except ValueError:
+        return None
+    return None
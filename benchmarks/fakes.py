@@ -0,0 +1,152 @@
+import json
+import time
+import random
+import asyncio
+import itertools
+from collections import Counter
+from typing import Tuple
+
+from aiohttp import web
+
+async def start_server(app: web.Application) -> Tuple[web.AppRunner, str]:
+    """Serverni 127.0.0.1 dagi bo'sh portda ishga tushirish: (runner, base_url)"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    return runner, f"http://{host}:{port}"
+
+class FakeTelegram:
+    """Bot API o'rnini bosuvchi lokal server.
+    
+    Har bir metod chaqiruvi sanaladi. `blocked_every` ga bo'linadigan chat_id lar
+    botni bloklagan (403) deb hisoblanadi, `flood_rate` ehtimollik bilan 429
+    (retry_after) qaytariladi.
+    """
+    
+    def __init__(self, latency: float = 0.0, blocked_every: int = 0, flood_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency = latency
+        self.blocked_every = blocked_every
+        self.flood_rate = flood_rate
+        self.calls = Counter()
+        self.errors = Counter()
+        self._random = random.Random(seed)
+        self._message_ids = itertools.count(1)
+    
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        return app
+    
+    async def _params(self, request: web.Request) -> dict:
+        if request.content_type == 'application/json':
+            return await request.json()
+        # python-telegram-bot murakkab qiymatlarni JSON satr sifatida yuboradi
+        return {key: value for key, value in (await request.post()).items() if isinstance(value, str)}
+    
+    def _message(self, chat_id, text: str = None) -> dict:
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'}
+        }
+        if text is not None:
+            message['text'] = text
+        return message
+    
+    @staticmethod
+    def _error(code: int, description: str, **parameters) -> web.Response:
+        body = {'ok': False, 'error_code': code, 'description': description}
+        if parameters:
+            body['parameters'] = parameters
+        return web.json_response(body, status=code)
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = await self._params(request)
+        self.calls[method] += 1
+        
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        if method == 'getMe':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'
+            }})
+        if method == 'getUpdates':
+            return web.json_response({'ok': True, 'result': []})
+        if method in ('setWebhook', 'deleteWebhook', 'deleteMessage', 'answerCallbackQuery'):
+            return web.json_response({'ok': True, 'result': True})
+        
+        chat_id = params.get('chat_id', 0)
+        if self.flood_rate and self._random.random() < self.flood_rate:
+            self.errors['flood'] += 1
+            return self._error(429, 'Too Many Requests: retry after 1', retry_after=1)
+        if self.blocked_every and int(chat_id) % self.blocked_every == 0:
+            self.errors['blocked'] += 1
+            return self._error(403, 'Forbidden: bot was blocked by the user')
+        
+        return web.json_response({'ok': True, 'result': self._message(chat_id, params.get('text'))})
+    
+    @property
+    def total_calls(self) -> int:
+        return sum(self.calls.values())
+
+class FakeOpenRouter:
+    """OpenRouter chat/completions o'rnini bosuvchi lokal server.
+    
+    Javob vaqti `latency` atrofida (±50%), `error_rate` ehtimollik bilan 500
+    qaytariladi. `stream: true` so'rovlarga SSE bo'laklari yuboriladi.
+    """
+    
+    PATH = '/api/v1/chat/completions'
+    
+    def __init__(self, latency: float = 0.5, error_rate: float = 0.0, chunks: int = 8, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.chunks = chunks
+        self.calls = 0
+        self.errors = 0
+        self.active = 0
+        self.max_active = 0
+        self._random = random.Random(seed)
+    
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.PATH, self.handle)
+        return app
+    
+    def _answer(self, prompt: str) -> str:
+        return f"Bu savolga javob: {prompt}. " * 3
+    
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            delay = self.latency * self._random.uniform(0.5, 1.5)
+            if self._random.random() < self.error_rate:
+                self.errors += 1
+                await asyncio.sleep(delay)
+                return web.json_response({'error': {'code': 500, 'message': 'fake upstream error'}}, status=500)
+            
+            answer = self._answer(payload['messages'][-1]['content'])
+            if not payload.get('stream'):
+                await asyncio.sleep(delay)
+                return web.json_response({'choices': [{'message': {'role': 'assistant', 'content': answer}}]})
+            
+            response = web.StreamResponse(headers={'Content-Type': 'text/event-stream'})
+            await response.prepare(request)
+            size = max(len(answer) // self.chunks, 1)
+            for start in range(0, len(answer), size):
+                await asyncio.sleep(delay / self.chunks)
+                chunk = {'choices': [{'delta': {'content': answer[start:start + size]}}]}
+                await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+            return response
+        finally:
+            self.active -= 1
@@ -0,0 +1,753 @@
+"""HasanAI bot uchun benchmark va yuklama sinovlari.
+
+Bot haqiqiy Telegram va OpenRouter o'rniga lokal soxta serverlar bilan ishlaydi
+(benchmarks/fakes.py). Har bir senariy vaqtinchalik papkada toza ma'lumotlar
+bilan ishga tushiriladi.
+
+Misollar (loyiha ildizidan):
+    python -m benchmarks.run storm --users 2000 --questions 5000 --latency 0.3 --error-rate 0.02
+    python -m benchmarks.run overload --questions 2000 --latency 5 --rps 40
+    python -m benchmarks.run broadcast --users 100000 --blocked-every 50
+    python -m benchmarks.run knowledge --sizes 1000,10000,50000
+    python -m benchmarks.run startup --users 50000 --kb-size 10000
+    python -m benchmarks.run tenants --tenants 500 --max-active 32 --queries 5000
+    python -m benchmarks.run all --backend sqlite --json results.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+import itertools
+import argparse
+import tempfile
+import functools
+import subprocess
+import contextlib
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Config import paytida o'qiladi (Application ga token kerak, tarmoqqa chiqilmaydi)
+os.environ.setdefault('BOT_TOKEN', '1:benchmark')
+os.environ.setdefault('OPENROUTER_API_KEY', 'benchmark')
+os.environ.setdefault('ADMIN_ID', '1')
+
+from telegram import Update
+from telegram.ext import Application
+
+import httpx
+
+from config import Config
+from database import Database
+from benchmarks.fakes import FakeOpenRouter, FakeTelegram, start_server
+
+import bot
+import metrics
+
+ADMIN_ID = 1
+FIRST_USER_ID = 10_000_000
+
+WORDS = (
+    "maktab dars o'qituvchi direktor sinf jadval imtihon bayram kutubxona sport "
+    "to'garak ota-ona majlis uy vazifasi baho chorak ta'til o'quvchi fan matematika "
+    "ona tili ingliz tili tarix kimyo fizika biologiya informatika musobaqa olimpiada "
+    "qachon qayerda kim nima qancha soat nechta qanday"
+).split()
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    # Millisekundlarda
+    return {
+        'p50_ms': round(percentile(values, 50) * 1000, 2),
+        'p95_ms': round(percentile(values, 95) * 1000, 2),
+        'p99_ms': round(percentile(values, 99) * 1000, 2),
+        'max_ms': round(max(values, default=0) * 1000, 2)
+    }
+
+def make_sentence(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+def make_qa_pairs(count: int, seed: int) -> Dict[str, str]:
+    rng = random.Random(seed)
+    qa_pairs = {}
+    while len(qa_pairs) < count:
+        question = f"{make_sentence(rng, 4)} {len(qa_pairs)}?"
+        qa_pairs[question] = make_sentence(rng, 20)
+    return qa_pairs
+
+def prepare_data_dir(path: str, users: int = 0, qa_pairs: Dict[str, str] = None):
+    """Database ochilishidan oldin JSON fayllarni tayyorlash (sqlite ham ulardan ko'chiradi)"""
+    data_dir = os.path.join(path, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    now = datetime.now().isoformat()
+    if users:
+        with open(os.path.join(data_dir, 'users.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                str(FIRST_USER_ID + index): {
+                    'username': f'user{index}',
+                    'first_name': f'User {index}',
+                    'join_date': now,
+                    'questions_asked': 0,
+                    'last_active': now
+                }
+                for index in range(users)
+            }, f)
+    if qa_pairs:
+        with open(os.path.join(data_dir, 'knowledge_base.json'), 'w', encoding='utf-8') as f:
+            json.dump({'qa_pairs': qa_pairs}, f, ensure_ascii=False)
+
+def make_update(application: Application, update_id: int, user_id: int, text: str) -> Update:
+    data = {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}',
+                     'username': f'user{user_id}'},
+            'text': text
+        }
+    }
+    if text.startswith('/'):
+        data['message']['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return Update.de_json(data, application.bot)
+
+def measure_import(runs: int = 3) -> float:
+    """Yangi interpreter da `import bot` vaqti (eng yaxshi natija), s"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = "import time; started = time.perf_counter(); import bot; print(time.perf_counter() - started)"
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return min(times)
+
+@contextlib.contextmanager
+def count_instances(*classes):
+    """Berilgan klasslardan nechta obyekt yaratilganini sanash"""
+    created = Counter()
+    originals = {cls: cls.__init__ for cls in classes}
+    
+    def wrap(cls, original):
+        @functools.wraps(original)
+        def __init__(self, *args, **kwargs):
+            if type(self) is cls:
+                created[cls.__name__] += 1
+            original(self, *args, **kwargs)
+        return __init__
+    
+    for cls, original in originals.items():
+        cls.__init__ = wrap(cls, original)
+    try:
+        yield created
+    finally:
+        for cls, original in originals.items():
+            cls.__init__ = original
+
+class Harness:
+    """Soxta serverlar, vaqtinchalik papka va BotHandlers ni birga boshqarish"""
+    
+    def __init__(self, args: argparse.Namespace, telegram: FakeTelegram = None):
+        self.args = args
+        self.telegram = telegram or FakeTelegram(latency=args.tg_latency, seed=args.seed)
+        self.upstream = FakeOpenRouter(latency=args.latency, error_rate=args.error_rate, seed=args.seed)
+        self.runners = []
+        self.workdir = None
+        self.handlers = None
+        self.application = None
+        self.timings = {}
+        self._cwd = os.getcwd()
+    
+    async def start(self, users: int = 0, qa_pairs: Dict[str, str] = None):
+        telegram_runner, telegram_url = await start_server(self.telegram.build_app())
+        upstream_runner, upstream_url = await start_server(self.upstream.build_app())
+        self.runners = [telegram_runner, upstream_runner]
+        
+        # Database va reklama holati nisbiy yo'llardan foydalanadi
+        self.workdir = tempfile.mkdtemp(prefix='hasanai-bench-')
+        prepare_data_dir(self.workdir, users, qa_pairs)
+        os.chdir(self.workdir)
+        
+        Config.ADMIN_ID = ADMIN_ID
+        Config.STORAGE_BACKEND = self.args.backend
+        Config.OPENROUTER_API_URL = upstream_url + FakeOpenRouter.PATH
+        Config.STREAMING = not self.args.no_streaming
+        Config.CACHE_FILE = ''
+        if self.args.user_rate is not None:
+            Config.USER_RATE = self.args.user_rate
+            Config.USER_BURST = max(self.args.user_rate, 1)
+        
+        # main() dagi tartib: Services -> BotHandlers -> Application -> post_init
+        started = time.perf_counter()
+        services = bot.Services()
+        self.timings['services'] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        self.handlers = bot.BotHandlers(services)
+        builder = (
+            Application.builder()
+            .token(Config.BOT_TOKEN)
+            .base_url(f"{telegram_url}/bot")
+            .base_file_url(f"{telegram_url}/file/bot")
+        )
+        self.application = bot.build_application(self.handlers, builder)
+        self.timings['application'] = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        await self.application.initialize()
+        await self.handlers.post_init(self.application)
+        self.timings['post_init'] = time.perf_counter() - started
+    
+    @property
+    def writes(self) -> int:
+        return self.handlers.db.backend.writes
+    
+    async def stop(self):
+        try:
+            if self.application is not None:
+                await self.application.shutdown()
+                await self.handlers.post_shutdown(self.application)
+            for runner in self.runners:
+                await runner.cleanup()
+        finally:
+            os.chdir(self._cwd)
+
+async def run_storm(args: argparse.Namespace) -> Dict[str, Any]:
+    """Savollar bo'roni: ko'p foydalanuvchidan bir vaqtda kelgan savollar.
+    
+    Savollar aralash: bir qismi bazadagi savollar, bir qismi mashhur (takroriy)
+    savollar, qolgani noyob - LLM ga boradi.
+    """
+    rng = random.Random(args.seed)
+    qa_pairs = make_qa_pairs(args.kb_size, args.seed)
+    kb_questions = list(qa_pairs)
+    popular = [f"{make_sentence(rng, 5)}?" for _ in range(50)]
+    
+    harness = Harness(args)
+    await harness.start(users=0, qa_pairs=qa_pairs)
+    try:
+        application = harness.application
+        processor = application.update_processor
+        
+        updates = []
+        for update_id in range(1, args.questions + 1):
+            user_id = FIRST_USER_ID + rng.randrange(args.users)
+            roll = rng.random()
+            if roll < args.kb_ratio:
+                text = rng.choice(kb_questions)
+            elif roll < args.kb_ratio + args.repeat_ratio:
+                text = rng.choice(popular)
+            else:
+                text = f"{make_sentence(rng, 6)} #{update_id}?"
+            updates.append(make_update(application, update_id, user_id, text))
+        
+        writes_before = harness.writes
+        telegram_before = harness.telegram.total_calls
+        latencies = []
+        
+        async def deliver(update: Update):
+            started = time.perf_counter()
+            # Polling/webhook dagidek: update processor orqali
+            await processor.process_update(update, application.process_update(update))
+            latencies.append(time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        tasks = []
+        interval = 1 / args.rps if args.rps else 0
+        for index, update in enumerate(updates):
+            tasks.append(asyncio.create_task(deliver(update)))
+            if interval:
+                # Kelish vaqtini kechikishlar to'planib qolmasdan ushlab turish
+                delay = started + (index + 1) * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        
+        await asyncio.to_thread(harness.handlers.db.flush)
+        service = harness.handlers.openai_service
+        cache_stats = service.cache.stats()
+        count = len(updates)
+        return {
+            'scenario': 'storm',
+            'backend': args.backend,
+            'messages': count,
+            'users': args.users,
+            'kb_size': args.kb_size,
+            'elapsed_s': round(elapsed, 3),
+            'messages_per_s': round(count / elapsed, 1),
+            'latency': latency_summary(latencies),
+            'upstream_calls': harness.upstream.calls,
+            'upstream_calls_per_msg': round(harness.upstream.calls / count, 4),
+            'upstream_errors': harness.upstream.errors,
+            'upstream_max_concurrency': harness.upstream.max_active,
+            'single_flight_shared': service.inflight.shared,
+            'cache_hit_rate': cache_stats['hit_rate'],
+            'telegram_calls_per_msg': round((harness.telegram.total_calls - telegram_before) / count, 3),
+            'disk_writes': harness.writes - writes_before,
+            'disk_writes_per_msg': round((harness.writes - writes_before) / count, 4),
+            'rejected_overloaded': harness.handlers.admission.rejected
+        }
+    finally:
+        await harness.stop()
+
+async def run_overload(args: argparse.Namespace) -> Dict[str, Any]:
+    """Ortiqcha yuklama: noyob LLM savollari savollar navbatini to'ldiradi.
+    
+    Har bir foydalanuvchi bitta savol beradi (tezlik cheklovi ishlamaydi).
+    Navbat to'lganda ortiqcha savollar rad etilishi, bazadagi savollar esa
+    LLM yuklamasiga qaramay yuklamasiz holatdagidek tez javob olishi tekshiriladi.
+    """
+    rng = random.Random(args.seed)
+    qa_pairs = make_qa_pairs(args.kb_size, args.seed)
+    kb_questions = list(qa_pairs)
+    
+    harness = Harness(args)
+    await harness.start(users=0, qa_pairs=qa_pairs)
+    try:
+        application = harness.application
+        processor = application.update_processor
+        admission = harness.handlers.admission
+        
+        updates = []
+        for update_id in range(1, args.questions + 1):
+            if rng.random() < args.kb_ratio:
+                updates.append(('kb', make_update(application, update_id, FIRST_USER_ID + update_id,
+                                                  rng.choice(kb_questions))))
+            else:
+                updates.append(('llm', make_update(application, update_id, FIRST_USER_ID + update_id,
+                                                   f"{make_sentence(rng, 6)} #{update_id}?")))
+        
+        latencies = []
+        peak = {'active': 0, 'waiting': 0}
+        
+        async def deliver(kind: str, update: Update):
+            started = time.perf_counter()
+            await processor.process_update(update, application.process_update(update))
+            latencies.append((kind, update.effective_user.id, time.perf_counter() - started))
+        
+        async def deliver_all(batch: list):
+            # --rps berilsa, savollar shu tezlikda keladi (aks holda hammasi birdaniga)
+            started = time.perf_counter()
+            interval = 1 / args.rps if args.rps else 0
+            tasks = []
+            for index, (kind, update) in enumerate(batch):
+                tasks.append(asyncio.create_task(deliver(kind, update)))
+                if interval:
+                    delay = started + (index + 1) * interval - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+            await asyncio.gather(*tasks)
+        
+        async def sample():
+            while True:
+                peak['active'] = max(peak['active'], admission.active)
+                peak['waiting'] = max(peak['waiting'], admission.waiting)
+                await asyncio.sleep(0.01)
+        
+        # LLM yuklamasisiz bazadagi savollar kechikishi (taqqoslash uchun)
+        await harness.handlers._warm_task
+        await deliver_all([('baseline', make_update(application, update_id, FIRST_USER_ID + update_id,
+                                                    rng.choice(kb_questions)))
+                           for update_id in range(args.questions + 1, args.questions + 101)])
+        kb_baseline = [latency for kind, _, latency in latencies if kind == 'baseline']
+        latencies.clear()
+        
+        sampler = asyncio.create_task(sample())
+        started = time.perf_counter()
+        await deliver_all(updates)
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+        
+        # Javob olgan savollar bazada sanalgan (har bir foydalanuvchi bitta savol bergan)
+        await asyncio.to_thread(harness.handlers.db.flush)
+        users = harness.handlers.db.get_users()
+        answered = {'kb': [], 'llm': []}
+        rejected = Counter()
+        for kind, user_id, latency in latencies:
+            if users.get(str(user_id), {}).get('questions_asked'):
+                answered[kind].append(latency)
+            else:
+                rejected[kind] += 1
+        
+        # Bazadagi savollar LLM navbatini kutmasligi kerak: kechikish yuklamasiz holatdagiga yaqin.
+        # Hammasi birdaniga kelganda (--rps 0) esa benchmark jarayonining o'zi CPU ga tiqiladi
+        assert not rejected['kb'], f"{rejected['kb']} ta bazadagi savol rad etildi"
+        if args.rps:
+            kb_p95 = percentile(answered['kb'], 95)
+            kb_limit = percentile(kb_baseline, 95) * 3 + 0.02
+            assert kb_p95 <= kb_limit, (f"bazadagi savollar p95 {kb_p95 * 1000:.1f} ms, "
+                                        f"{kb_limit * 1000:.1f} ms dan oshmasligi kerak")
+        
+        count = len(updates)
+        return {
+            'scenario': 'overload',
+            'backend': args.backend,
+            'messages': count,
+            'elapsed_s': round(elapsed, 3),
+            'concurrent_updates': processor.max_concurrent_updates,
+            'max_active_questions': admission.limit,
+            'question_queue_size': admission.max_waiting,
+            'peak_active': peak['active'],
+            'peak_waiting': peak['waiting'],
+            'rejected_overloaded': admission.rejected,
+            'rejected_ratio': round(admission.rejected / count, 4),
+            'rejected_kb': rejected['kb'],
+            'rejected_llm': rejected['llm'],
+            'upstream_calls': harness.upstream.calls,
+            'kb_baseline_latency': latency_summary(kb_baseline),
+            'kb_answered_latency': latency_summary(answered['kb']),
+            'llm_answered_latency': latency_summary(answered['llm'])
+        }
+    finally:
+        await harness.stop()
+
+async def run_broadcast(args: argparse.Namespace) -> Dict[str, Any]:
+    """Reklamani ko'p foydalanuvchiga yuborish (tezlik cheklovi --rate bilan)"""
+    telegram = FakeTelegram(latency=args.tg_latency, blocked_every=args.blocked_every,
+                            flood_rate=args.flood_rate, seed=args.seed)
+    harness = Harness(args, telegram)
+    await harness.start(users=args.users)
+    try:
+        broadcaster = harness.handlers.broadcaster
+        broadcaster.rate = args.rate
+        broadcaster.workers = args.workers
+        broadcaster.limiter.rate = args.rate
+        broadcaster.limiter.capacity = args.rate
+        
+        writes_before = harness.writes
+        started = time.perf_counter()
+        await broadcaster.run(harness.application.bot, ADMIN_ID, {'type': 'text', 'text': 'Benchmark reklama'})
+        elapsed = time.perf_counter() - started
+        await asyncio.to_thread(harness.handlers.db.flush)
+        
+        sends = telegram.calls['sendMessage']
+        return {
+            'scenario': 'broadcast',
+            'backend': args.backend,
+            'users': args.users,
+            'rate_limit': args.rate,
+            'workers': args.workers,
+            'elapsed_s': round(elapsed, 3),
+            'messages_per_s': round(args.users / elapsed, 1),
+            'telegram_send_calls': sends,
+            'blocked': telegram.errors['blocked'],
+            'flood_429': telegram.errors['flood'],
+            'disk_writes': harness.writes - writes_before,
+            'disk_writes_per_msg': round((harness.writes - writes_before) / max(args.users, 1), 4)
+        }
+    finally:
+        await harness.stop()
+
+async def run_knowledge(args: argparse.Namespace) -> Dict[str, Any]:
+    """Katta ma'lumotlar bazasida qidiruv: qurish vaqti va lookup kechikishi"""
+    results = []
+    for size in (int(value) for value in args.sizes.split(',')):
+        rng = random.Random(args.seed)
+        qa_pairs = make_qa_pairs(size, args.seed)
+        questions = list(qa_pairs)
+        
+        harness = Harness(args)
+        await harness.start(qa_pairs=qa_pairs)
+        try:
+            service = harness.handlers.openai_service
+            # Fondagi warm_up tugagach, qurish vaqti alohida o'lchanadi
+            await harness.handlers._warm_task
+            knowledge = service.tenants.get(bot.DEFAULT_TENANT)
+            knowledge._matcher = knowledge._index = None
+            
+            started = time.perf_counter()
+            knowledge.get_matcher()
+            matcher_build = time.perf_counter() - started
+            started = time.perf_counter()
+            knowledge.get_index()
+            index_build = time.perf_counter() - started
+            
+            # Aniq savol, o'zgartirilgan savol va bazada yo'q savol aralashmasi
+            queries = []
+            for _ in range(args.queries):
+                question = rng.choice(questions)
+                kind = rng.randrange(3)
+                if kind == 0:
+                    queries.append(question)
+                elif kind == 1:
+                    queries.append(question.replace(' ', '  ', 1)[:-3] + ' bormi?')
+                else:
+                    queries.append(make_sentence(rng, 6))
+            
+            latencies = []
+            answered = 0
+            for query in queries:
+                started = time.perf_counter()
+                answer, _ = service.lookup(query)
+                latencies.append(time.perf_counter() - started)
+                answered += answer is not None
+            
+            # Yangi ma'lumot qo'shish va undan keyingi birinchi qidiruv
+            writes_before = harness.writes
+            add_latencies = []
+            for index in range(args.adds):
+                started = time.perf_counter()
+                harness.handlers.db.add_knowledge(f"yangi savol {index}?", make_sentence(rng, 10))
+                await service.prepare()
+                service.lookup(rng.choice(queries))
+                add_latencies.append(time.perf_counter() - started)
+            
+            results.append({
+                'kb_size': size,
+                'matcher_build_ms': round(matcher_build * 1000, 1),
+                'index_build_ms': round(index_build * 1000, 1),
+                'lookup': latency_summary(latencies),
+                'answered_without_llm': round(answered / max(len(queries), 1), 3),
+                'add_then_lookup': latency_summary(add_latencies),
+                'disk_writes_per_add': round((harness.writes - writes_before) / max(args.adds, 1), 2)
+            })
+        finally:
+            await harness.stop()
+    
+    return {'scenario': 'knowledge', 'backend': args.backend, 'results': results}
+
+async def run_tenants(args: argparse.Namespace) -> Dict[str, Any]:
+    """Ko'p maktab: chatlar /start <kod> bilan biriktiriladi, savollar maktablar
+    orasida notekis (Zipf) taqsimlanadi. Faol maktablar soni, xotiradan
+    chiqarishlar, sovuq/issiq qidiruv kechikishi va bazalar ajratilganligi.
+    """
+    rng = random.Random(args.seed)
+    harness = Harness(args)
+    await harness.start()
+    try:
+        db = harness.handlers.db
+        service = harness.handlers.openai_service
+        tenants = service.tenants
+        tenants.max_active = args.max_active
+        evictions_before = metrics.TENANT_EVICTIONS.value()
+        
+        # Har bir maktab javobi o'z kodi bilan boshlanadi: boshqa maktab javobi darhol ko'rinadi
+        started = time.perf_counter()
+        codes = [f"maktab{index}" for index in range(args.tenants)]
+        questions = {}
+        for number, code in enumerate(codes):
+            qa_pairs = make_qa_pairs(args.tenant_kb_size, args.seed + number)
+            db.save_tenant(code, f"{number}-maktab")
+            db.add_knowledge_bulk({question: f"[{code}] {answer}" for question, answer in qa_pairs.items()}, code)
+            questions[code] = list(qa_pairs)
+        setup = time.perf_counter() - started
+        
+        # Deep-link orqali biriktirish (to'liq /start handler)
+        chats = args.users
+        weights = [1 / (rank + 1) ** args.tenant_skew for rank in range(len(codes))]
+        chat_tenants = rng.choices(codes, weights, k=chats)
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            harness.application.process_update(
+                make_update(harness.application, index + 1, FIRST_USER_ID + index, f"/start {code}"))
+            for index, code in enumerate(chat_tenants)
+        ))
+        bind_time = time.perf_counter() - started
+        wrong_binding = sum(tenants.resolve(FIRST_USER_ID + index) != code
+                            for index, code in enumerate(chat_tenants))
+        
+        hot, cold, blocking = [], [], []
+        answered = wrong_tenant = 0
+        for _ in range(args.queries):
+            chat = FIRST_USER_ID + rng.randrange(chats)
+            started = time.perf_counter()
+            tenant = tenants.resolve(chat)
+            was_active = tenants._loaded(tenant) is not None
+            query = rng.choice(questions[tenant]) if rng.random() < 0.5 else make_sentence(rng, 6)
+            # handle_message dagidek: sovuq maktab bazasi fon oqimida quriladi
+            await service.prepare(tenant)
+            lookup_started = time.perf_counter()
+            answer, _ = service.lookup(query, None, tenant)
+            blocking.append(time.perf_counter() - lookup_started)
+            (hot if was_active else cold).append(time.perf_counter() - started)
+            if answer is not None:
+                answered += 1
+                wrong_tenant += not answer.startswith(f"[{tenant}]")
+        
+        return {
+            'scenario': 'tenants',
+            'backend': args.backend,
+            'tenants': args.tenants,
+            'kb_per_tenant': args.tenant_kb_size,
+            'max_active': args.max_active,
+            'chats': chats,
+            'setup_s': round(setup, 2),
+            'bind_per_chat_ms': round(bind_time / chats * 1000, 3),
+            'wrong_binding': wrong_binding,
+            'queries': args.queries,
+            'lookup_hot': latency_summary(hot),
+            'lookup_cold': latency_summary(cold),
+            'lookup_loop_blocking': latency_summary(blocking),
+            'cold_ratio': round(len(cold) / max(args.queries, 1), 3),
+            'active_tenants': len(tenants),
+            'evictions': int(metrics.TENANT_EVICTIONS.value() - evictions_before),
+            'answered_without_llm': round(answered / max(args.queries, 1), 3),
+            'answers_from_other_tenant': wrong_tenant
+        }
+    finally:
+        await harness.stop()
+
+async def run_startup(args: argparse.Namespace) -> Dict[str, Any]:
+    """Sovuq ishga tushish: import, obyektlarni qurish, birinchi javoblar va
+    har bir xabar uchun yaratiladigan og'ir obyektlar soni.
+    """
+    rng = random.Random(args.seed)
+    qa_pairs = make_qa_pairs(args.kb_size, args.seed)
+    kb_questions = list(qa_pairs)
+    import_time = await asyncio.to_thread(measure_import)
+    
+    harness = Harness(args)
+    heavy = (bot.Services, bot.BotHandlers, bot.OpenRouterService, Database, httpx.AsyncClient)
+    with count_instances(*heavy) as created:
+        started = time.perf_counter()
+        await harness.start(users=args.users, qa_pairs=qa_pairs)
+        ready = time.perf_counter() - started
+        at_startup = dict(created)
+        try:
+            application = harness.application
+            processor = application.update_processor
+            update_ids = itertools.count(1)
+            
+            async def deliver(user_id: int, text: str) -> float:
+                update = make_update(application, next(update_ids), user_id, text)
+                started = time.perf_counter()
+                await processor.process_update(update, application.process_update(update))
+                return time.perf_counter() - started
+            
+            # Birinchi javoblar: fonda KB indeksi qurilayotgan paytda ham
+            first_kb = await deliver(FIRST_USER_ID, rng.choice(kb_questions))
+            first_llm = await deliver(FIRST_USER_ID + 1, f"{make_sentence(rng, 6)} birinchi?")
+            started = time.perf_counter()
+            await harness.handlers._warm_task
+            warm_wait = time.perf_counter() - started
+            
+            # Oddiy savollar orasida admin matnli reklama tayyorlab, bekor qiladi
+            created.clear()
+            messages = 0
+            for index in range(args.questions):
+                user_id = FIRST_USER_ID + rng.randrange(args.users)
+                text = rng.choice(kb_questions) if rng.random() < args.kb_ratio else f"{make_sentence(rng, 6)} #{index}?"
+                await deliver(user_id, text)
+                messages += 1
+                if index % 50 == 0:
+                    for admin_text in ('/broadcast text', 'Benchmark reklama', "yo'q"):
+                        await deliver(ADMIN_ID, admin_text)
+                        messages += 1
+        finally:
+            await harness.stop()
+    
+    return {
+        'scenario': 'startup',
+        'backend': args.backend,
+        'users': args.users,
+        'kb_size': args.kb_size,
+        'import_bot_ms': round(import_time * 1000, 1),
+        'services_ms': round(harness.timings['services'] * 1000, 1),
+        'application_ms': round(harness.timings['application'] * 1000, 1),
+        'post_init_ms': round(harness.timings['post_init'] * 1000, 1),
+        'ready_ms': round(ready * 1000, 1),
+        'first_kb_answer_ms': round(first_kb * 1000, 1),
+        'first_llm_answer_ms': round(first_llm * 1000, 1),
+        'warm_up_wait_ms': round(warm_wait * 1000, 1),
+        'created_at_startup': at_startup,
+        'messages': messages,
+        'created_per_msg': {name: round(count / messages, 4) for name, count in created.items()} or 0
+    }
+
+SCENARIOS = {
+    'storm': run_storm,
+    'overload': run_overload,
+    'startup': run_startup,
+    'broadcast': run_broadcast,
+    'knowledge': run_knowledge,
+    'tenants': run_tenants
+}
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HasanAI bot benchmark")
+    parser.add_argument('scenario', choices=[*SCENARIOS, 'all'])
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help="natijalarni JSON faylga yozish")
+    parser.add_argument('--verbose', action='store_true', help="bot loglarini ko'rsatish")
+    
+    upstream = parser.add_argument_group('soxta OpenRouter / Telegram')
+    upstream.add_argument('--latency', type=float, default=0.5, help="LLM javob vaqti, s")
+    upstream.add_argument('--error-rate', type=float, default=0.0, help="LLM 500 xatolari ulushi")
+    upstream.add_argument('--tg-latency', type=float, default=0.0, help="Bot API javob vaqti, s")
+    upstream.add_argument('--no-streaming', action='store_true')
+    
+    storm = parser.add_argument_group('storm')
+    storm.add_argument('--users', type=int, default=None,
+                       help="foydalanuvchilar soni (storm: 1000, broadcast: 10000)")
+    storm.add_argument('--questions', type=int, default=3000)
+    storm.add_argument('--rps', type=float, default=0, help="kelish tezligi, 0 - hammasi birdaniga")
+    storm.add_argument('--kb-size', type=int, default=1000)
+    storm.add_argument('--kb-ratio', type=float, default=0.3)
+    storm.add_argument('--repeat-ratio', type=float, default=0.4)
+    storm.add_argument('--user-rate', type=float, default=None,
+                       help="Config.USER_RATE ni almashtirish (standart: konfiguratsiyadagi)")
+    
+    broadcast = parser.add_argument_group('broadcast')
+    broadcast.add_argument('--rate', type=float, default=Config.BROADCAST_RATE)
+    broadcast.add_argument('--workers', type=int, default=Config.BROADCAST_WORKERS)
+    broadcast.add_argument('--blocked-every', type=int, default=0)
+    broadcast.add_argument('--flood-rate', type=float, default=0.0)
+    
+    knowledge = parser.add_argument_group('knowledge')
+    knowledge.add_argument('--sizes', default='1000,10000,50000')
+    knowledge.add_argument('--queries', type=int, default=2000)
+    knowledge.add_argument('--adds', type=int, default=20)
+    
+    tenants = parser.add_argument_group('tenants')
+    tenants.add_argument('--tenants', type=int, default=200)
+    tenants.add_argument('--tenant-kb-size', type=int, default=300)
+    tenants.add_argument('--max-active', type=int, default=Config.MAX_ACTIVE_TENANTS)
+    tenants.add_argument('--tenant-skew', type=float, default=1.1, help="Zipf darajasi (0 - teng taqsimot)")
+    return parser.parse_args(argv)
+
+def print_result(result: Dict[str, Any], indent: int = 0):
+    for key, value in result.items():
+        if isinstance(value, dict):
+            print(' ' * indent + f"{key}:")
+            print_result(value, indent + 2)
+        elif isinstance(value, list):
+            for item in value:
+                print(' ' * indent + '-')
+                print_result(item, indent + 2)
+        else:
+            print(' ' * indent + f"{key}: {value}")
+
+async def main(argv=None):
+    args = parse_args(argv)
+    # Soxta xatolar loglari natijalarni ko'mib yubormasin
+    logging.getLogger().setLevel(logging.WARNING if args.verbose else logging.CRITICAL)
+    
+    names = list(SCENARIOS) if args.scenario == 'all' else [args.scenario]
+    users = args.users
+    results = []
+    for name in names:
+        args.users = users or (1000 if name in ('storm', 'startup', 'tenants') else 10000)
+        result = await SCENARIOS[name](args)
+        print_result(result)
+        print()
+        results.append(result)
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,12 +1,31 @@
 import os
-import logging
 import json
-import requests
+import time
+import tempfile
+import asyncio
+import logging
+import importlib.util
+import httpx
 from telegram import Update
-from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackContext
+from telegram.constants import ParseMode
+from telegram.error import BadRequest, TelegramError
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, MessageHandler, filters, ContextTypes
 from config import Config
 from database import Database
+from cache import AnswerCache
+from concurrency import SingleFlight, KeyedRateLimiter, PriorityLimiter, Overloaded
+from broadcast import BroadcastEngine
+from streaming import MessageStreamer
+from admin_views import NAME_LIMIT, clip_query, preview, render_users_page, render_knowledge_page, render_callback
+from conversation import ConversationMemory, estimate_tokens
+from llm_router import LLMRouter, OpenRouterError, parse_backends
+from kb_transfer import MAX_IMPORT_BYTES, detect_format, parse_knowledge_file, iter_knowledge_pages, write_export
+from update_processor import PerChatUpdateProcessor, UpdateQueue
+from shared_state import SharedState, create_shared_state
+from tenants import DEFAULT_TENANT, TenantRegistry, parse_tenant_id
+import metrics
 from datetime import datetime
+from typing import Optional, Tuple
 
 # Logging
 logging.basicConfig(
@@ -15,46 +34,193 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Konfiguratsiyani tekshirish
-config_errors = Config.validate_config()
-if config_errors:
-    for error in config_errors:
-        logger.error(f"❌ {error}")
-    logger.error("❌ Bot ishga tushirish uchun konfiguratsiya to'liq emas!")
-    exit(1)
-
 # OpenRouter Service
 class OpenRouterService:
-    def __init__(self):
+    def __init__(self, db: Database, shared: Optional[SharedState] = None):
         self.api_url = Config.OPENROUTER_API_URL
         self.api_key = Config.OPENROUTER_API_KEY
-        self.model = Config.MODEL
-        self.db = Database()
-    
-    def get_response(self, prompt: str) -> str:
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://hasanai-bot.telegram",
-            "X-Title": "HasanAI Bot"
-        }
+        self.upstream = asyncio.Semaphore(Config.UPSTREAM_CONCURRENCY)
+        self.router = LLMRouter(
+            parse_backends(Config.LLM_BACKENDS or Config.MODEL, self.api_url,
+                           Config.LLM_BREAKER_FAILURES, Config.LLM_BREAKER_RESET),
+            max_attempts=Config.LLM_MAX_ATTEMPTS,
+            backoff_base=Config.LLM_BACKOFF_BASE,
+            backoff_max=Config.LLM_BACKOFF_MAX,
+            deadline=Config.LLM_DEADLINE,
+            hedge=Config.LLM_HEDGE,
+            hedge_delay=Config.LLM_HEDGE_DELAY,
+            hedge_min_delay=Config.LLM_HEDGE_MIN_DELAY,
+            limiter=self.upstream
+        )
+        # Kesh kaliti asosiy model nomi bilan (zaxira model javobi ham shu kalitda saqlanadi)
+        self.model = self.router.model
+        self.db = db
+        # Har bir maktabning KB avtomati va indeksi (faol maktablar xotirada)
+        self.tenants = TenantRegistry(db, Config.SCHOOL_NAME, Config.MAX_ACTIVE_TENANTS)
+        # Maktab bazasi qurilishi (kalit - maktab kodi), fon oqimida
+        self.builds = SingleFlight()
+        self.client = None
+        self.cache = AnswerCache(Config.CACHE_MAX_SIZE, Config.CACHE_TTL, Config.CACHE_FILE, shared=shared)
+        self.inflight = SingleFlight()
+        self.memory = ConversationMemory(
+            max_users=Config.CONTEXT_MAX_USERS,
+            max_turns=Config.CONTEXT_MAX_TURNS,
+            token_budget=Config.CONTEXT_TOKEN_BUDGET,
+            ttl=Config.CONTEXT_TTL,
+            message_chars=Config.CONTEXT_MESSAGE_CHARS,
+            summarize=Config.CONTEXT_SUMMARY
+        )
         
-        # Knowledge bazasidan kontekst
-        knowledge_base = self.db.get_knowledge_base()
-        qa_pairs = knowledge_base.get('qa_pairs', {})
+        # Kesh va umumiy so'rovlar hisoblagichlari metrikalarda ko'rinadi
+        metrics.CACHE_HITS.set_function(lambda: self.cache.hits)
+        metrics.CACHE_MISSES.set_function(lambda: self.cache.misses)
+        metrics.CACHE_ENTRIES.set_function(lambda: len(self.cache))
+        metrics.UPSTREAM_SHARED.set_function(lambda: self.inflight.shared)
+        metrics.CONTEXT_USERS.set_function(lambda: len(self.memory))
+    
+    # Umumiy HTTP klient (keep-alive ulanishlar puli), post_init da yaratiladi
+    async def start(self):
+        # HTTP/2 faqat h2 paketi o'rnatilgan bo'lsa yoqiladi
+        http2 = Config.HTTP2 and importlib.util.find_spec('h2') is not None
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+                "HTTP-Referer": "https://hasanai-bot.telegram",
+                "X-Title": "HasanAI Bot"
+            },
+            limits=httpx.Limits(
+                max_connections=Config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(Config.HTTP_TIMEOUT, connect=Config.HTTP_CONNECT_TIMEOUT)
+        )
+        self.router.client = self.client
+        logger.info(f"OpenRouter HTTP klienti tayyor (HTTP/2: {http2}), modellar: "
+                    f"{', '.join(backend.name for backend in self.router.backends)}")
+        self.cache.load()
+    
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+            self.router.client = None
+        self.cache.save()
+    
+    async def import_knowledge(self, qa_pairs: dict, tenant: str = DEFAULT_TENANT) -> int:
+        """Ko'p juftlikni bitta tranzaksiyada qo'shish; yangi qo'shilganlar sonini qaytaradi"""
+        knowledge = self.tenants.get(tenant)
+        knowledge.rebuilding = True
+        try:
+            return await asyncio.to_thread(knowledge.import_pairs, qa_pairs)
+        finally:
+            knowledge.rebuilding = False
+    
+    async def prepare(self, tenant: str = DEFAULT_TENANT):
+        """Maktab avtomati va TF-IDF indeksini fon oqimida qurish.
+        
+        Sovuq (yoki xotiradan chiqarilgan) maktab bazasi event loop da
+        qurilmaydi; bir vaqtda kelgan savollar bitta qurilishni kutadi.
+        Baza o'zgargan bo'lsa, yangi avtomat fonda quriladi va savollar
+        uni kutmaydi - tayyor bo'lguncha eskisi javob beradi.
+        """
+        knowledge = self.tenants.get(tenant)
+        if not knowledge.ready:
+            await self.builds.do(tenant, lambda: asyncio.to_thread(knowledge.warm_up))
+        elif tenant not in self.builds and knowledge.stale:
+            task = self.builds.start(tenant, lambda: asyncio.to_thread(knowledge.warm_up))
+            task.add_done_callback(self._log_build_error)
+    
+    @staticmethod
+    def _log_build_error(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Bilimlar bazasi indekslarini yangilashda xatolik: {task.exception()}")
+    
+    def lookup(self, prompt: str, user_id: Optional[int] = None,
+               tenant: str = DEFAULT_TENANT) -> Tuple[Optional[str], list]:
+        """LLM siz javob topish: (javob yoki None, o'xshash savollar)"""
+        knowledge = self.tenants.get(tenant)
+        # Knowledge bazasidan eng uzun mos keladigan savolni qidirish
+        match = knowledge.get_matcher().match(prompt)
+        if match:
+            metrics.LOOKUPS.inc(result='kb')
+            return match[1], []
         
-        # Knowledge bazasidan mos keladigan javobni qidirish
-        for question, answer in qa_pairs.items():
-            if question.lower() in prompt.lower():
-                return answer
+        # O'xshash savollarni qidirish: juda yaqin bo'lsa, javob shu yerning o'zida
+        hits = knowledge.get_index().search(prompt, Config.RETRIEVAL_TOP_K)
+        if hits and hits[0][0] >= Config.RETRIEVAL_THRESHOLD:
+            metrics.LOOKUPS.inc(result='retrieval')
+            return hits[0][2], hits
+        
+        # Suhbat davomidagi savol ("va soat nechida?") uchun keshdagi umumiy javob to'g'ri kelmaydi
+        if self.memory.is_follow_up(user_id, prompt):
+            metrics.LOOKUPS.inc(result='miss')
+            return None, hits
+        
+        # Oldin berilgan javobni keshdan olish
+        cache_key = AnswerCache.make_key(prompt, self.model, Config.TEMPERATURE, knowledge.version, tenant)
+        answer = self.cache.get(cache_key)
+        metrics.LOOKUPS.inc(result='cache' if answer is not None else 'miss')
+        return answer, hits
+    
+    async def get_response(self, prompt: str, on_update=None, lookup=None, user_id: Optional[int] = None,
+                           tenant: str = DEFAULT_TENANT) -> str:
+        # on_update(matn) - oqimli javobning yig'ilgan qismi bilan chaqiriladi
+        # lookup - oldindan hisoblangan self.lookup(prompt, user_id, tenant) natijasi
+        answer, hits = lookup or self.lookup(prompt, user_id, tenant)
+        if answer is not None:
+            if user_id is not None:
+                self.memory.record(user_id, prompt, answer)
+            return answer
+        
+        history = []
+        if self.memory.is_follow_up(user_id, prompt):
+            history = self.memory.messages(user_id, reserved_tokens=estimate_tokens(prompt))
+        if history:
+            # Tarixga bog'liq javob keshlanmaydi va boshqa so'rovlar bilan birlashtirilmaydi
+            answer, ok = await self._ask_llm(prompt, hits, None, on_update, history, tenant)
+        else:
+            answer, ok = await self._ask_cached(prompt, hits, on_update, lookup is not None, tenant)
         
+        if ok and user_id is not None:
+            self.memory.record(user_id, prompt, answer)
+        return answer
+    
+    async def _ask_cached(self, prompt: str, hits: list, on_update, recheck: bool,
+                          tenant: str = DEFAULT_TENANT) -> Tuple[str, bool]:
+        version = self.tenants.get(tenant).version
+        cache_key = AnswerCache.make_key(prompt, self.model, Config.TEMPERATURE, version, tenant)
+        if recheck:
+            # Navbatda kutilgan vaqtda javob keshga tushgan bo'lishi mumkin
+            cached = self.cache.get(cache_key, record_miss=False)
+            if cached is not None:
+                return cached, True
+        
+        # Bir vaqtda kelgan bir xil savollar uchun bitta so'rov yuboriladi
+        # (oqimni faqat birinchi so'rov egasi ko'radi, qolganlar tayyor javobni oladi)
+        return await self.inflight.do(
+            cache_key, lambda: self._ask_llm(prompt, hits, cache_key, on_update, tenant=tenant)
+        )
+    
+    async def _ask_llm(self, prompt: str, hits: list, cache_key: Optional[str], on_update=None,
+                       history: Optional[list] = None, tenant: str = DEFAULT_TENANT) -> Tuple[str, bool]:
+        # (javob, muvaffaqiyatli) - xato matni tarixga va keshga yozilmaydi
         # Agar knowledge bazada javob bo'lmasa, OpenRouter dan so'rash
-        system_message = "Siz 2-maktab yordamchi assistanti sifatida javob berasiz. Faqat berilgan ma'lumotlar asosida javob bering. Agar savolga javob knowledge bazada bo'lmasa, 'Afsuski, men bu haqda maʼlumotga ega emasman' deb javob bering."
+        system_message = self.tenants.get(tenant).system_prompt
+        
+        context_pairs = [(question, answer) for score, question, answer in hits
+                         if score >= Config.RETRIEVAL_MIN_SCORE]
+        if context_pairs:
+            system_message += "\n\nBerilgan ma'lumotlar:\n" + "\n".join(
+                f"Savol: {question}\nJavob: {answer}" for question, answer in context_pairs
+            )
         
         payload = {
-            "model": self.model,
             "messages": [
                 {"role": "system", "content": system_message},
+                *(history or []),
                 {"role": "user", "content": prompt}
             ],
             "max_tokens": Config.MAX_TOKENS,
@@ -62,47 +228,159 @@ class OpenRouterService:
         }
         
         try:
-            response = requests.post(
-                self.api_url, 
-                headers=headers, 
-                json=payload,
-                timeout=30
+            # Model tanlash, qayta urinish va OpenRouter parallelligi router ichida
+            answer = await self.router.complete(
+                payload, on_update if on_update is not None and Config.STREAMING else None
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result['choices'][0]['message']['content'].strip()
-            else:
-                logger.error(f"OpenRouter xatosi: {response.status_code} - {response.text}")
-                return f"❌ Xatolik yuz berdi (Status: {response.status_code})"
-                        
-        except requests.exceptions.RequestException as e:
+            if answer and cache_key is not None:
+                self.cache.set(cache_key, answer)
+            return answer, bool(answer)
+        
+        except OpenRouterError as e:
+            logger.error(f"OpenRouter xatosi: {e}")
+            if e.status_code in (503, 504):
+                return "😔 Hozir javob berib bo'lmadi. Iltimos, birozdan keyin qayta urinib ko'ring.", False
+            return f"❌ Xatolik yuz berdi (Status: {e.status_code})", False
+        except httpx.HTTPError as e:
             logger.error(f"OpenRouter ulanish xatosi: {e}")
-            return f"❌ Serverga ulanishda xatolik"
+            return f"❌ Serverga ulanishda xatolik", False
         except Exception as e:
             logger.error(f"OpenRouter kutilmagan xatolik: {e}")
-            return f"❌ Kutilmagan xatolik"
+            return f"❌ Kutilmagan xatolik", False
+
+class Services:
+    """Bot bo'ylab umumiy obyektlar: main() da bir marta yaratiladi.
+    
+    Bu yerda faqat yengil obyektlar quriladi; HTTP klient va kesh fayli
+    post_init da, KB avtomati va TF-IDF indeksi esa fonda yoki birinchi
+    kerak bo'lganda yaratiladi.
+    """
+    
+    def __init__(self, db: Optional[Database] = None):
+        self.db = db or Database()
+        # Bir nechta bot jarayoni uchun umumiy holat (standart: faqat shu jarayon)
+        self.shared = create_shared_state(Config.SHARED_STATE, Config.SHARED_STATE_PATH, Config.CACHE_MAX_SIZE * 10)
+        self.openai_service = OpenRouterService(self.db, self.shared)
+        self.broadcaster = BroadcastEngine(
+            self.db,
+            Config.BROADCAST_CHECKPOINT,
+            rate=Config.BROADCAST_RATE,
+            workers=Config.BROADCAST_WORKERS,
+            progress_interval=Config.BROADCAST_PROGRESS_INTERVAL,
+            shared=self.shared
+        )
+        # Kirishni boshqarish: foydalanuvchi bo'yicha tezlik va umumiy navbat
+        self.user_limiter = KeyedRateLimiter(Config.USER_RATE, Config.USER_BURST)
+        self.admission = PriorityLimiter(Config.MAX_ACTIVE_QUESTIONS, Config.QUESTION_QUEUE_SIZE)
 
 # Bot Handlers
 class BotHandlers:
-    def __init__(self):
-        self.db = Database()
-        self.openai_service = OpenRouterService()
+    # Tugallanmagan reklama qoralamasi shuncha soniya saqlanadi
+    DRAFT_TTL = 3600
+    SCHOOLS_SHOWN = 30
+    PRUNE_INTERVAL = 60
+    
+    def __init__(self, services: Optional[Services] = None):
+        self.services = services or Services()
+        self.db = self.services.db
+        self.openai_service = self.services.openai_service
+        self.broadcaster = self.services.broadcaster
+        self.user_limiter = self.services.user_limiter
+        self.admission = self.services.admission
+        self.shared = self.services.shared
+        self.tenants = self.openai_service.tenants
+        self._prune_task = None
+        self._warm_task = None
+        self._metrics_runner = None
+    
+    # Uzoq yozmagan foydalanuvchilarning suhbat tarixi xotiradan o'chiriladi
+    # (ma'lumotlarni diskka saqlash bazaning o'z fon oqimida)
+    async def _prune_loop(self):
+        while True:
+            await asyncio.sleep(self.PRUNE_INTERVAL)
+            self.openai_service.memory.prune()
+    
+    async def post_init(self, application: Application):
+        await self.openai_service.start()
+        self._prune_task = asyncio.create_task(self._prune_loop())
+        # Birinchi savol asosiy baza avtomati va indeksi qurilishini kutib qolmasligi uchun
+        self._warm_task = asyncio.create_task(self.openai_service.prepare(DEFAULT_TENANT))
+        
+        metrics.UPDATE_QUEUE.set_function(application.update_queue.qsize)
+        if isinstance(application.update_queue, UpdateQueue):
+            metrics.UPDATES_IN_FLIGHT.set_function(lambda: application.update_queue.in_flight)
+        metrics.ACTIVE_QUESTIONS.set_function(lambda: self.admission.active)
+        metrics.WAITING_QUESTIONS.set_function(lambda: self.admission.waiting)
+        if Config.METRICS_PORT:
+            self._metrics_runner = await metrics.start_metrics_server(Config.METRICS_LISTEN, Config.METRICS_PORT)
+            logger.info(f"Metrikalar: http://{Config.METRICS_LISTEN}:{Config.METRICS_PORT}/metrics")
+        
+        if self.broadcaster.has_unfinished():
+            logger.warning("Tugallanmagan reklama topildi")
+            try:
+                await application.bot.send_message(
+                    Config.ADMIN_ID,
+                    "⚠️ Oldingi reklama oxirigacha yuborilmagan.\nDavom ettirish: /broadcast resume"
+                )
+            except Exception as e:
+                logger.error(f"Adminga xabar yuborilmadi: {e}")
+    
+    async def post_shutdown(self, application: Application):
+        if self._prune_task:
+            self._prune_task.cancel()
+        if self._warm_task:
+            self._warm_task.cancel()
+        if self._metrics_runner:
+            await self._metrics_runner.cleanup()
+        await self.openai_service.close()
+        self.db.close()
+        self.shared.close()
+        logger.info("Ma'lumotlar diskka saqlandi")
     
     def _is_admin(self, user_id: int) -> bool:
         return user_id == Config.ADMIN_ID
     
-    # Start komandasi
+    def _chat_tenant(self, update: Update) -> str:
+        # Admin buyruqlari ham admin chatiga biriktirilgan maktab bazasiga tegishli
+        return self.tenants.resolve(update.effective_chat.id)
+    
+    def _tenant_name(self, tenant: str) -> str:
+        return self.tenants.get(tenant).name
+    
+    # Reklama qoralamasi umumiy holatda: keyingi xabar boshqa jarayonga tushishi mumkin
+    def _get_draft(self, user_id: int) -> dict:
+        value = self.shared.get_value(f"broadcast_draft:{user_id}")
+        return json.loads(value) if value else {}
+    
+    def _save_draft(self, user_id: int, draft: dict):
+        self.shared.set_value(f"broadcast_draft:{user_id}", json.dumps(draft), ttl=self.DRAFT_TTL)
+    
+    def _clear_draft(self, user_id: int):
+        self.shared.delete(f"broadcast_draft:{user_id}")
+    
+    # Start komandasi (/start <maktab_kodi> - chatni shu maktabga biriktirish)
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
         self.db.update_user(user.id, user.username, user.first_name)
+        # /start - suhbatni yangidan boshlash
+        self.openai_service.memory.clear(user.id)
+        
+        if context.args:
+            tenant = parse_tenant_id(context.args[0])
+            if tenant is None or not self.tenants.exists(tenant):
+                await update.message.reply_text("❌ Bunday maktab topilmadi. Havolani tekshiring.")
+                return
+            await asyncio.to_thread(self.tenants.bind, update.effective_chat.id, tenant)
+        else:
+            tenant = self._chat_tenant(update)
+        name = self._tenant_name(tenant)
         
-        welcome_text = """
-👋 Salom! **HasanAI** - 2-maktab yordamchi botiga xush kelibsiz!
+        welcome_text = f"""
+👋 Salom! **HasanAI** - {name} yordamchi botiga xush kelibsiz!
 
 🎯 **Bot imkoniyatlari:**
 • Savollaringizga javob olish
-• 2-maktab haqida ma'lumot
+• {name} haqida ma'lumot
 • Tez va aniq javoblar
 
 💡 **Foydalanish:** Faqat savolingizni yuboring!
@@ -125,13 +403,20 @@ class BotHandlers:
 
 📊 **Statistika:**
 /stats - Bot statistikasi
+/activity - Oxirgi 30 kun faolligi
 
 👥 **Foydalanuvchilar:**
-/users - Foydalanuvchilar ro'yxati
+/users [qidiruv] - Foydalanuvchilar ro'yxati
 
 📚 **Ma'lumotlar bazasi:**
 /add_info - Yangi ma'lumot qo'shish
-/view_knowledge - Ma'lumotlarni ko'rish
+/import_knowledge - CSV/JSONL fayldan import
+/export_knowledge [csv|jsonl] - Bazani faylga yuklab olish
+/view_knowledge [qidiruv] - Ma'lumotlarni ko'rish
+
+🏫 **Maktablar** (hozir: {self._tenant_name(self._chat_tenant(update))}):
+/schools - Maktablar va havolalar
+/add_school - Maktab qo'shish yoki o'zgartirish
 
 📢 **Reklama:**
 /broadcast - Hammaga xabar yuborish
@@ -151,32 +436,72 @@ class BotHandlers:
             await self._handle_broadcast_confirmation(update, context, user_message)
             return
         
+        # Admin matnli reklamani yubordi
+        if self._is_admin(user.id):
+            draft = self._get_draft(user.id)
+            if draft.get('broadcast_type') == 'text' and 'broadcast_text' not in draft:
+                await self._handle_broadcast_text(update, context)
+                return
+        
         # Oddiy foydalanuvchi savoli
         self.db.update_user(user.id, user.username, user.first_name)
         
+        if not self._is_admin(user.id) and not self.user_limiter.allow(user.id):
+            metrics.MESSAGES.inc(result='throttled')
+            await update.message.reply_text("⏳ Juda tez yozyapsiz. Iltimos, biroz kutib qayta so'rang.")
+            return
+        
+        started = time.perf_counter()
+        tenant = self._chat_tenant(update)
+        await self.openai_service.prepare(tenant)
+        lookup = self.openai_service.lookup(user_message, user.id, tenant)
+        
+        # Bazadan yoki keshdan javob topilgan savollar LLM navbatini kutmaydi: ular uchun
+        # update lar cheklovida (CONCURRENT_UPDATES) faol va navbatdagi LLM savollaridan joy qoladi
+        if lookup[0] is not None:
+            await self._answer_question(update, user_message, lookup, tenant)
+            metrics.MESSAGE_SECONDS.observe(time.perf_counter() - started, source='local')
+            return
+        
+        try:
+            async with self.admission.slot():
+                await self._answer_question(update, user_message, lookup, tenant)
+            metrics.MESSAGE_SECONDS.observe(time.perf_counter() - started, source='llm')
+        except Overloaded:
+            metrics.MESSAGES.inc(result='overloaded')
+            await update.message.reply_text("😔 Hozir savollar juda ko'p. Iltimos, birozdan keyin qayta urinib ko'ring.")
+            logger.warning(f"Navbat to'la, savol rad etildi: {user.id}")
+    
+    async def _answer_question(self, update: Update, user_message: str, lookup: tuple,
+                               tenant: str = DEFAULT_TENANT):
+        user = update.effective_user
+        
         # Kutish xabarini yuborish
         wait_msg = await update.message.reply_text("⏳ Javob tayyorlanmoqda...")
         
+        # Javob kutish xabarining o'rnida bosqichma-bosqich paydo bo'ladi
+        streamer = MessageStreamer(wait_msg, Config.STREAM_EDIT_INTERVAL)
+        
         try:
-            # Endi bu sync funksiya, shuning uchun threadda ishlatamiz
-            response = await context.application.run_async(
-                self.openai_service.get_response, user_message
+            response = await self.openai_service.get_response(
+                user_message, on_update=streamer.update, lookup=lookup, user_id=user.id, tenant=tenant
             )
             
             # Savollar sonini yangilash
             self.db.increment_questions(user.id)
             
-            # Kutish xabarini o'chirish
-            await wait_msg.delete()
-            
-            # Javobni yuborish
-            await update.message.reply_text(response)
+            # Yakuniy javob
+            await streamer.finish(response)
+            metrics.MESSAGES.inc(result='answered')
             logger.info(f"Foydalanuvchi savoli: {user.id} - {user_message[:50]}...")
-            
+        
         except Exception as e:
-            await wait_msg.delete()
-            await update.message.reply_text("❌ Javob olishda xatolik yuz berdi. Iltimos, keyinroq urinib ko'ring.")
+            metrics.MESSAGES.inc(result='failed')
             logger.error(f"Xatolik: {e}")
+            try:
+                await wait_msg.edit_text("❌ Javob olishda xatolik yuz berdi. Iltimos, keyinroq urinib ko'ring.")
+            except TelegramError as edit_error:
+                logger.warning(f"Xatolik xabarini ko'rsatib bo'lmadi: {edit_error}")
     
     # Statistika
     async def show_stats(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -185,6 +510,20 @@ class BotHandlers:
             return
         
         stats = self.db.get_stats()
+        cache_stats = self.openai_service.cache.stats()
+        
+        # Ishga tushgandan beri yig'ilgan metrikalar
+        messages = {key[0]: int(value) for key, value in metrics.MESSAGES.values().items()}
+        statuses = ', '.join(f"{key[0]}: {int(value)}"
+                             for key, value in sorted(metrics.UPSTREAM_REQUESTS.values().items())) or "so'rov yo'q"
+        broadcast = {key[0]: int(value) for key, value in metrics.BROADCAST_MESSAGES.values().items()}
+        save_p95 = max((metrics.DB_SAVE_SECONDS.quantile(0.95, file=key[0])
+                        for key in metrics.DB_SAVE_SECONDS.values()), default=0.0)
+        
+        def latency(source: str) -> str:
+            histogram = metrics.MESSAGE_SECONDS
+            return (f"{histogram.count(source=source)} ta, p50 {histogram.quantile(0.5, source=source):.2f} s, "
+                    f"p95 {histogram.quantile(0.95, source=source):.2f} s")
         
         stats_text = f"""
 📊 **HasanAI Statistikasi**
@@ -192,32 +531,50 @@ class BotHandlers:
 👥 **Jami foydalanuvchilar:** {stats['total_users']}
 ❓ **Jami savollar:** {stats['total_questions']}
 🔥 **Bugun faol:** {stats['active_today']}
+📅 **Hafta / oy davomida faol:** {stats['active_week']} / {stats['active_month']}
+💬 **Bugungi savollar:** {stats['questions_today']}
+
+💾 **Javoblar keshi:** {cache_stats['size']} ta
+✅ **Keshdan:** {cache_stats['hits']} | ❌ **Keshda yo'q:** {cache_stats['misses']} ({cache_stats['hit_rate']:.0%})
+
+📈 **Ishga tushgandan beri:**
+💬 Javob berildi: {messages.get('answered', 0)} | ⏳ Cheklandi: {messages.get('throttled', 0)} | 😔 Navbat to'la: {messages.get('overloaded', 0)} | ❌ Xato: {messages.get('failed', 0)}
+📚 Bazadan: {latency('local')}
+🤖 LLM orqali: {latency('llm')}
+🌐 OpenRouter: {statuses} | p95 {metrics.UPSTREAM_SECONDS.quantile(0.95):.2f} s | umumiy javob: {int(metrics.UPSTREAM_SHARED.value())}
+📣 Reklama: ✅ {broadcast.get('sent', 0)} | ❌ {broadcast.get('failed', 0)} | 🚫 {broadcast.get('blocked', 0)} | 429: {int(metrics.BROADCAST_RATE_LIMITED.value())}
+💽 Diskka yozish p95: {save_p95 * 1000:.0f} ms
+📥 Savollar: {self.admission.active} faol, {self.admission.waiting} navbatda
 
 🚀 **Bot faol va ishlayapti!**
         """
         await update.message.reply_text(stats_text)
     
-    # Foydalanuvchilar ro'yxati
-    async def show_users(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # Kunlik faollik tarixi
+    async def show_activity(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not self._is_admin(update.effective_user.id):
             await update.message.reply_text("❌ Siz admin emassiz!")
             return
         
-        users = self.db.load_json('users.json')
+        days = 30
+        if context.args and context.args[0].isdigit():
+            days = min(max(int(context.args[0]), 1), 30)
         
-        if not users:
-            await update.message.reply_text("📭 Hali foydalanuvchilar mavjud emas")
+        history = self.db.get_activity_history(days)
+        lines = [f"{day['date']}  👥 {day['active_users']}  ❓ {day['questions']}  🆕 {day['new_users']}"
+                 for day in reversed(history)]
+        activity_text = f"📅 **Oxirgi {days} kun faolligi:**\n👥 faol | ❓ savollar | 🆕 yangi\n\n" + "\n".join(lines)
+        await update.message.reply_text(activity_text)
+    
+    # Foydalanuvchilar ro'yxati (sahifalab, /users <qidiruv>)
+    async def show_users(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not self._is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ Siz admin emassiz!")
             return
         
-        users_text = "👥 **Foydalanuvchilar ro'yxati:**\n\n"
-        for i, (user_id, user_data) in enumerate(list(users.items())[:20], 1):
-            users_text += f"{i}. **ID:** `{user_id}`\n"
-            users_text += f"   **Ism:** {user_data.get('first_name', 'Noma lum')}\n"
-            users_text += f"   **Username:** @{user_data.get('username', 'Noma lum')}\n"
-            users_text += f"   **Savollar:** {user_data.get('questions_asked', 0)}\n"
-            users_text += "   ──────────────\n"
-        
-        await update.message.reply_text(users_text)
+        query = clip_query(' '.join(context.args or []))
+        text, keyboard = render_users_page(self.db, query=query)
+        await update.message.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
     
     # Ma'lumot qo'shish
     async def add_knowledge(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -242,32 +599,196 @@ class BotHandlers:
         
         question, answer = text.split(' - ', 1)
         
-        self.db.add_knowledge(question.strip(), answer.strip())
-        await update.message.reply_text("✅ **Yangi ma'lumot muvaffaqiyatli qo'shildi!**")
+        tenant = self._chat_tenant(update)
+        # Yozish boshqa jarayon tranzaksiyasini kutishi mumkin (busy_timeout) - event loop da emas
+        await asyncio.to_thread(self.db.add_knowledge, question.strip(), answer.strip(), tenant)
+        await update.message.reply_text(f"✅ **Yangi ma'lumot muvaffaqiyatli qo'shildi!** ({self._tenant_name(tenant)})")
     
-    # Ma'lumotlar bazasini ko'rish
+    # Ma'lumotlar bazasini ko'rish (sahifalab, /view_knowledge <qidiruv>)
     async def view_knowledge(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not self._is_admin(update.effective_user.id):
             await update.message.reply_text("❌ Siz admin emassiz!")
             return
         
-        knowledge_base = self.db.get_knowledge_base()
-        qa_pairs = knowledge_base.get('qa_pairs', {})
+        query = clip_query(' '.join(context.args or []))
+        text, keyboard = render_knowledge_page(self.db, query=query, tenant=self._chat_tenant(update))
+        await update.message.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
+    
+    # Ommaviy import bo'yicha yo'riqnoma
+    async def import_help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not self._is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ Siz admin emassiz!")
+            return
         
-        if not qa_pairs:
-            await update.message.reply_text("📭 **Ma'lumotlar bazasi bo'sh**")
+        await update.message.reply_text("""
+📥 **Ma'lumotlarni fayldan import qilish**
+
+Faylni shu chatga hujjat sifatida yuboring (20 MB gacha):
+
+• **CSV** (.csv, .tsv) - `question,answer` sarlavhasi bilan yoki sarlavhasiz (1-ustun savol, 2-ustun javob). Ajratgich: vergul, nuqtali vergul yoki tab
+• **JSONL** (.jsonl) - har qatorda `{"question": "...", "answer": "..."}`
+
+Bazada bor savollarning javobi yangilanadi, takroriy qatorlardan oxirgisi olinadi.
+        """)
+    
+    # Admin yuborgan CSV/JSONL fayl
+    async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not self._is_admin(update.effective_user.id):
             return
         
-        knowledge_text = "📚 **Ma'lumotlar bazasi:**\n\n"
-        for i, (question, answer) in enumerate(qa_pairs.items(), 1):
-            knowledge_text += f"**{i}. ❓ {question}**\n"
-            knowledge_text += f"   ✅ {answer}\n\n"
+        document = update.message.document
+        file_format = detect_format(document.file_name)
+        if file_format is None:
+            await update.message.reply_text("❌ Faqat .csv, .tsv yoki .jsonl fayllar qabul qilinadi. Yo'riqnoma: /import_knowledge")
+            return
+        if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+            await update.message.reply_text("❌ Fayl juda katta (20 MB dan oshmasligi kerak)")
+            return
+        
+        status = await update.message.reply_text("⏳ Fayl o'qilmoqda...")
+        started = time.perf_counter()
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(document.file_name)[1])
+        os.close(fd)
+        try:
+            telegram_file = await document.get_file()
+            await telegram_file.download_to_drive(path)
             
-            if len(knowledge_text) > 3500:
-                knowledge_text += "... (qolganlari kesib tashlandi)"
-                break
+            tenant = self._chat_tenant(update)
+            existing = list(self.db.get_knowledge_base(tenant).get('qa_pairs', {}))
+            report = await asyncio.to_thread(parse_knowledge_file, path, file_format, existing)
+            if report['pairs']:
+                await status.edit_text(f"⏳ {len(report['pairs'])} ta ma'lumot saqlanmoqda...")
+                await self.openai_service.import_knowledge(report['pairs'], tenant)
+            
+            lines = [
+                "✅ **Import yakunlandi**" if report['pairs'] else "⚠️ **Fayldan ma'lumot qo'shilmadi**",
+                f"🏫 {self._tenant_name(tenant)}",
+                "",
+                f"📄 Qatorlar: {report['total']}",
+                f"🆕 Yangi: {report['new']} | ♻️ Yangilandi: {report['updated']}",
+                f"🔁 Takroriy: {report['duplicates']} | ❌ Xato: {report['invalid']}",
+                f"⏱️ {time.perf_counter() - started:.1f} s"
+            ]
+            if report['errors']:
+                lines += ["", "**Xatolar:**"] + report['errors']
+                if report['invalid'] > len(report['errors']):
+                    lines.append(f"... va yana {report['invalid'] - len(report['errors'])} ta")
+            await status.edit_text("\n".join(lines))
+            logger.info(f"Import ({tenant}): {document.file_name} - {report['new']} yangi, {report['updated']} yangilandi, "
+                        f"{report['invalid']} xato")
         
-        await update.message.reply_text(knowledge_text)
+        except UnicodeDecodeError:
+            await status.edit_text("❌ Fayl UTF-8 kodlashda bo'lishi kerak")
+        except Exception as e:
+            await status.edit_text("❌ Faylni import qilishda xatolik yuz berdi")
+            logger.error(f"Import xatosi: {e}")
+        finally:
+            os.remove(path)
+    
+    # Bazani faylga eksport qilish
+    async def export_knowledge(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not self._is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ Siz admin emassiz!")
+            return
+        
+        file_format = (context.args[0].lower() if context.args else 'csv')
+        if file_format not in ('csv', 'jsonl'):
+            await update.message.reply_text("❌ Format: /export_knowledge csv yoki /export_knowledge jsonl")
+            return
+        
+        fd, path = tempfile.mkstemp(suffix=f'.{file_format}')
+        os.close(fd)
+        try:
+            tenant = self._chat_tenant(update)
+            count = await asyncio.to_thread(write_export, path, iter_knowledge_pages(self.db, tenant=tenant),
+                                            file_format)
+            if not count:
+                await update.message.reply_text("📭 Ma'lumotlar bazasi bo'sh")
+                return
+            
+            with open(path, 'rb') as f:
+                await update.message.reply_document(
+                    f,
+                    filename=f"knowledge_{tenant}_{datetime.now().strftime('%Y%m%d')}.{file_format}",
+                    caption=f"📚 {self._tenant_name(tenant)}: {count} ta savol-javob"
+                )
+        finally:
+            os.remove(path)
+    
+    # Maktablar ro'yxati va /start havolalari
+    async def list_schools(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not self._is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ Siz admin emassiz!")
+            return
+        
+        current = self._chat_tenant(update)
+        schools = self.tenants.list_tenants()
+        lines = [f"🏫 <b>Maktablar</b> (jami: {len(schools)})", ""]
+        # Xabar Telegram chegarasidan oshmasligi uchun faqat birinchilari
+        for tenant, info in schools[:self.SCHOOLS_SHOWN]:
+            marker = " ✅" if tenant == current else ""
+            lines.append(f"• <b>{preview(info['name'], NAME_LIMIT)}</b> — <code>{tenant}</code>{marker}")
+            lines.append(f"    https://t.me/{context.bot.username}?start={tenant}")
+        if len(schools) > self.SCHOOLS_SHOWN:
+            lines.append(f"... va yana {len(schools) - self.SCHOOLS_SHOWN} ta")
+        lines += ["", "Admin buyruqlari ✅ belgilangan maktab bazasiga tegishli. Almashtirish: /start &lt;kod&gt;"]
+        await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML,
+                                        disable_web_page_preview=True)
+    
+    # Maktab qo'shish yoki nomi/promptini o'zgartirish
+    async def add_school(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not self._is_admin(update.effective_user.id):
+            await update.message.reply_text("❌ Siz admin emassiz!")
+            return
+        
+        args = context.args or []
+        tenant = parse_tenant_id(args[0]) if args else None
+        name = ' '.join(args[1:]).strip()
+        if tenant is None or tenant == DEFAULT_TENANT or not name:
+            await update.message.reply_text("""
+❌ **Format:** `/add_school kod Maktab nomi`
+Ixtiyoriy prompt bilan: `/add_school kod Maktab nomi - Prompt matni`
+
+Kod: lotin harflari, raqamlar, _ va - (32 belgigacha)
+
+**Misol:**
+`/add_school maktab5 5-maktab`
+            """)
+            return
+        
+        prompt = ''
+        if ' - ' in name:
+            name, prompt = (part.strip() for part in name.split(' - ', 1))
+        
+        action = "yangilandi" if self.tenants.exists(tenant) else "qo'shildi"
+        await asyncio.to_thread(self.tenants.save, tenant, name, prompt)
+        await update.message.reply_text(
+            f"✅ **{name}** {action}.\n\n"
+            f"Havola: https://t.me/{context.bot.username}?start={tenant}\n"
+            f"Bazani to'ldirish uchun avval shu havola orqali /start bosing."
+        )
+        logger.info(f"Maktab {action}: {tenant} - {name}")
+    
+    # Sahifalar orasida o'tish tugmalari
+    async def handle_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        callback = update.callback_query
+        if not self._is_admin(callback.from_user.id):
+            await callback.answer("❌ Siz admin emassiz!", show_alert=True)
+            return
+        
+        view = render_callback(self.db, callback.data, self._chat_tenant(update))
+        if view is None:
+            await callback.answer()
+            return
+        
+        text, keyboard = view
+        await callback.answer()
+        try:
+            await callback.edit_message_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
+        except BadRequest as e:
+            # Sahifa o'zgarmagan bo'lsa (masalan, tugma ikki marta bosilsa)
+            if 'not modified' not in e.message.lower():
+                raise
     
     # Reklama boshqaruvi
     async def broadcast_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -284,11 +805,22 @@ Quyidagi buyruqlardan birini tanlang:
 `/broadcast text` - Matnli reklama
 `/broadcast photo` - Rasmli reklama  
 `/broadcast video` - Videoli reklama
+`/broadcast resume` - To'xtagan reklamani davom ettirish
             """)
             return
         
         broadcast_type = context.args[0].lower()
-        context.user_data['broadcast_type'] = broadcast_type
+        
+        if broadcast_type == 'resume':
+            if not self.broadcaster.has_unfinished():
+                await update.message.reply_text("📭 Davom ettiriladigan reklama yo'q.")
+                return
+            context.application.create_task(
+                self.broadcaster.run(context.bot, update.effective_chat.id)
+            )
+            return
+        
+        self._save_draft(update.effective_user.id, {'broadcast_type': broadcast_type})
         
         if broadcast_type == 'text':
             await update.message.reply_text("📝 **Matnli reklama yuboring:**")
@@ -304,129 +836,155 @@ Quyidagi buyruqlardan birini tanlang:
         if not self._is_admin(update.effective_user.id):
             return
         
-        if 'broadcast_type' not in context.user_data:
+        draft = self._get_draft(update.effective_user.id)
+        if 'broadcast_type' not in draft:
             return
         
-        broadcast_type = context.user_data['broadcast_type']
+        broadcast_type = draft['broadcast_type']
         caption = update.message.caption or ""
         
         if broadcast_type == 'photo' and update.message.photo:
-            context.user_data['broadcast_photo'] = update.message.photo[-1].file_id
-            context.user_data['broadcast_caption'] = caption
+            draft['broadcast_photo'] = update.message.photo[-1].file_id
+            draft['broadcast_caption'] = caption
+            self._save_draft(update.effective_user.id, draft)
             
             await update.message.reply_text(
                 f"🖼️ **Rasm qabul qilindi!**\n\nTag: {caption}\n\n"
                 f"Reklamani yuborishni tasdiqlaysizmi? (Ha / Yo'q)"
             )
-            
+        
         elif broadcast_type == 'video' and update.message.video:
-            context.user_data['broadcast_video'] = update.message.video.file_id
-            context.user_data['broadcast_caption'] = caption
+            draft['broadcast_video'] = update.message.video.file_id
+            draft['broadcast_caption'] = caption
+            self._save_draft(update.effective_user.id, draft)
             
             await update.message.reply_text(
                 f"🎥 **Video qabul qilindi!**\n\nTag: {caption}\n\n"
                 f"Reklamani yuborishni tasdiqlaysizmi? (Ha / Yo'q)"
             )
     
+    # Text reklama uchun handler
+    async def _handle_broadcast_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        if not self._is_admin(update.effective_user.id):
+            return
+        
+        draft = self._get_draft(update.effective_user.id)
+        if draft.get('broadcast_type') == 'text':
+            draft['broadcast_text'] = update.message.text
+            self._save_draft(update.effective_user.id, draft)
+            await update.message.reply_text(
+                f"📝 **Matn qabul qilindi!**\n\n{update.message.text}\n\n"
+                f"Reklamani yuborishni tasdiqlaysizmi? (Ha / Yo'q)"
+            )
+    
     # Reklama tasdiqlash
     async def _handle_broadcast_confirmation(self, update: Update, context: ContextTypes.DEFAULT_TYPE, confirmation: str):
+        user_id = update.effective_user.id
         if confirmation.lower() == 'ha':
-            await update.message.reply_text("🔄 Reklama yuborilmoqda...")
-            success_count = 0
-            error_count = 0
-            
-            users = self.db.load_json('users.json')
+            draft = self._get_draft(user_id)
+            if 'broadcast_photo' in draft:
+                payload = {
+                    'type': 'photo',
+                    'file_id': draft['broadcast_photo'],
+                    'caption': draft.get('broadcast_caption', '')
+                }
+            elif 'broadcast_video' in draft:
+                payload = {
+                    'type': 'video',
+                    'file_id': draft['broadcast_video'],
+                    'caption': draft.get('broadcast_caption', '')
+                }
+            elif draft.get('broadcast_text'):
+                payload = {'type': 'text', 'text': draft['broadcast_text']}
+            else:
+                metrics.BROADCASTS.inc(result='empty')
+                await update.message.reply_text("❌ Yuboriladigan reklama yo'q. Avval /broadcast ni tanlang.")
+                return
             
-            for user_id in users.keys():
-                try:
-                    if 'broadcast_photo' in context.user_data:
-                        await context.bot.send_photo(
-                            chat_id=user_id,
-                            photo=context.user_data['broadcast_photo'],
-                            caption=context.user_data.get('broadcast_caption', '')
-                        )
-                    elif 'broadcast_video' in context.user_data:
-                        await context.bot.send_video(
-                            chat_id=user_id,
-                            video=context.user_data['broadcast_video'],
-                            caption=context.user_data.get('broadcast_caption', '')
-                        )
-                    else:
-                        # Text reklama
-                        broadcast_text = context.user_data.get('broadcast_text', '')
-                        if broadcast_text:
-                            await context.bot.send_message(
-                                chat_id=user_id,
-                                text=broadcast_text
-                            )
-                    success_count += 1
-                except Exception as e:
-                    error_count += 1
-                    logger.error(f"Reklama yuborishda xatolik {user_id}: {e}")
+            # Joy (boshqa jarayonlardagi qulf ham) qoralama o'chirilishidan oldin band qilinadi:
+            # band bo'lsa qoralama saqlanadi va reklama tugagach qayta tasdiqlash mumkin
+            busy = self.broadcaster.reserve()
+            if busy is not None:
+                metrics.BROADCASTS.inc(result='busy')
+                await update.message.reply_text(f"{busy} Qoralama saqlandi, tugagach 'Ha' deb qayta yuboring.")
+                return
             
             # Tozalash
-            context.user_data.clear()
+            self._clear_draft(user_id)
             
-            await update.message.reply_text(
-                f"✅ Reklama yuborildi!\n\n"
-                f"✅ Muvaffaqiyatli: {success_count}\n"
-                f"❌ Xatolar: {error_count}"
+            # Reklama fonda yuboriladi, holat xabari esa yangilanib boradi
+            metrics.BROADCASTS.inc(result='started')
+            context.application.create_task(
+                self.broadcaster.run(context.bot, update.effective_chat.id, payload, reserved=True)
             )
         else:
-            context.user_data.clear()
+            metrics.BROADCASTS.inc(result='cancelled')
+            self._clear_draft(user_id)
             await update.message.reply_text("❌ Reklama bekor qilindi.")
 
-# Text reklama uchun handler
-async def handle_broadcast_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not BotHandlers()._is_admin(update.effective_user.id):
-        return
-    
-    if 'broadcast_type' in context.user_data and context.user_data['broadcast_type'] == 'text':
-        context.user_data['broadcast_text'] = update.message.text
-        await update.message.reply_text(
-            f"📝 **Matn qabul qilindi!**\n\n{update.message.text}\n\n"
-            f"Reklamani yuborishni tasdiqlaysizmi? (Ha / Yo'q)"
-        )
 
-# Asosiy bot
-def main():
-    # Konfiguratsiyani tekshirish
-    config_errors = Config.validate_config()
-    if config_errors:
-        for error in config_errors:
-            logger.error(f"❌ {error}")
-        logger.error("❌ Bot ishga tushirish uchun konfiguratsiya to'liq emas!")
-        return
-    
-    # Botni yaratish
-    application = Application.builder().token(Config.BOT_TOKEN).build()
+def build_application(handlers: BotHandlers, builder=None) -> Application:
+    """Application ni yaratish va handler larni ro'yxatdan o'tkazish"""
+    # builder - masalan, benchmark dagi soxta Bot API uchun base_url bilan
+    if builder is None:
+        builder = Application.builder().token(Config.BOT_TOKEN)
     
-    # Handlers
-    handlers = BotHandlers()
+    application = (
+        builder
+        .update_queue(UpdateQueue(maxsize=Config.UPDATE_QUEUE_SIZE))
+        .concurrent_updates(PerChatUpdateProcessor(Config.CONCURRENT_UPDATES))
+        .post_init(handlers.post_init)
+        .post_shutdown(handlers.post_shutdown)
+        .build()
+    )
     
     # Command handlers
     application.add_handler(CommandHandler("start", handlers.start))
     application.add_handler(CommandHandler("admin", handlers.admin_panel))
     application.add_handler(CommandHandler("stats", handlers.show_stats))
+    application.add_handler(CommandHandler("activity", handlers.show_activity))
     application.add_handler(CommandHandler("users", handlers.show_users))
     application.add_handler(CommandHandler("add_info", handlers.add_knowledge))
     application.add_handler(CommandHandler("view_knowledge", handlers.view_knowledge))
+    application.add_handler(CommandHandler("import_knowledge", handlers.import_help))
+    application.add_handler(CommandHandler("export_knowledge", handlers.export_knowledge))
+    application.add_handler(CommandHandler("schools", handlers.list_schools))
+    application.add_handler(CommandHandler("add_school", handlers.add_school))
     application.add_handler(CommandHandler("broadcast", handlers.broadcast_start))
+    application.add_handler(CallbackQueryHandler(handlers.handle_page_callback, pattern=r'^(u|kb):'))
     
     # Message handlers
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.handle_message))
     application.add_handler(MessageHandler(filters.PHOTO | filters.VIDEO, handlers.handle_media))
+    application.add_handler(MessageHandler(filters.Document.ALL, handlers.handle_document))
+    return application
+
+# Asosiy bot
+def main():
+    # Konfiguratsiyani tekshirish
+    config_errors = Config.validate_config()
+    if config_errors:
+        for error in config_errors:
+            logger.error(f"❌ {error}")
+        logger.error("❌ Bot ishga tushirish uchun konfiguratsiya to'liq emas!")
+        return
     
-    # Text reklama handler
-    application.add_handler(MessageHandler(
-        filters.TEXT & ~filters.COMMAND & filters.Regex(r'^(?!(Ha|Yo\'q)$).*'), 
-        handle_broadcast_text
-    ))
+    # Umumiy obyektlar, handlers va botni yaratish (har biri bir marta)
+    started = time.perf_counter()
+    services = Services()
+    handlers = BotHandlers(services)
+    application = build_application(handlers)
+    logger.info(f"Bot {time.perf_counter() - started:.2f} s da tayyorlandi")
     
     # Botni ishga tushirish
     logger.info("HasanAI bot ishga tushdi...")
     logger.info(f"Admin ID: {Config.ADMIN_ID}")
-    application.run_polling()
+    if Config.WEBHOOK_URL:
+        # Webhook rejimi (aiohttp server, /health bilan)
+        from webhook import run_webhook
+        asyncio.run(run_webhook(application))
+    else:
+        application.run_polling()
 
 if __name__ == '__main__':
     main()
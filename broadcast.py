@@ -0,0 +1,247 @@
+import json
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from concurrency import TokenBucket
+from database import Database
+from metrics import BROADCAST_MESSAGES, BROADCAST_RATE_LIMITED
+from shared_state import SharedState
+from storage import atomic_write
+
+logger = logging.getLogger(__name__)
+
+class BroadcastEngine:
+    """Reklamani tezlik cheklovi bilan parallel yuborish.
+    
+    Holat (payload, yuborilganlar chegarasi, hisoblagichlar) diskka yozib
+    boriladi, shuning uchun bot qayta ishga tushsa, reklamani to'xtagan
+    joyidan davom ettirish mumkin. `shared` berilsa, bir vaqtda faqat bitta
+    bot jarayoni reklama yuboradi (umumiy qulf).
+    """
+    
+    MAX_ATTEMPTS = 3
+    LOCK_NAME = 'broadcast'
+    
+    def __init__(self, db: Database, checkpoint_path: str, rate: float, workers: int,
+                 progress_interval: float, shared: Optional[SharedState] = None):
+        self.db = db
+        self.checkpoint_path = checkpoint_path
+        self.recipients_path = checkpoint_path + '.recipients'
+        self.rate = rate
+        self.workers = workers
+        self.progress_interval = progress_interval
+        self.limiter = TokenBucket(rate, rate)
+        self.running = False
+        self.shared = shared
+        # Qulf holat yangilanishida uzaytiriladi; jarayon to'xtab qolsa, o'zi bo'shaydi
+        self.lock_ttl = max(60.0, progress_interval * 10)
+    
+    def has_unfinished(self) -> bool:
+        return os.path.exists(self.checkpoint_path)
+    
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            with open(self.recipients_path, 'r', encoding='utf-8') as f:
+                state['recipients'] = json.load(f)
+            return state
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+    
+    def _save_checkpoint(self, state: Dict[str, Any], completed: set):
+        data = {key: value for key, value in state.items() if key != 'recipients'}
+        data['done_ahead'] = sorted(completed)
+        atomic_write(self.checkpoint_path, json.dumps(data, ensure_ascii=False))
+    
+    def _clear_checkpoint(self):
+        for path in (self.checkpoint_path, self.recipients_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def reserve(self) -> Optional[str]:
+        """Reklama uchun joy band qilish (shu va boshqa jarayonlarda).
+        
+        Band bo'lsa adminga ko'rsatiladigan sabab qaytadi, aks holda None.
+        """
+        if self.running:
+            return "⚠️ Boshqa reklama hali yuborilmoqda."
+        if self.shared is not None and not self.shared.acquire_lock(self.LOCK_NAME, ttl=self.lock_ttl):
+            return "⚠️ Boshqa bot jarayonida reklama yuborilmoqda."
+        self.running = True
+        return None
+    
+    async def run(self, bot: Bot, admin_chat_id: int, payload: Dict[str, Any] = None,
+                  reserved: bool = False):
+        """Yangi reklamani boshlash yoki (payload=None) to'xtagan joyidan davom ettirish.
+        
+        reserved=True - joy oldindan `reserve` bilan band qilingan.
+        """
+        if not reserved:
+            busy = self.reserve()
+            if busy is not None:
+                await bot.send_message(admin_chat_id, busy)
+                return
+        
+        try:
+            await self._start(bot, admin_chat_id, payload)
+        finally:
+            self.running = False
+            if self.shared is not None:
+                self.shared.release_lock(self.LOCK_NAME)
+    
+    async def _start(self, bot: Bot, admin_chat_id: int, payload: Optional[Dict[str, Any]]):
+        if payload is not None:
+            recipients = self.db.get_broadcast_recipients()
+            state = {
+                'payload': payload,
+                'admin_chat_id': admin_chat_id,
+                'total': len(recipients),
+                'cursor': 0,
+                'sent': 0,
+                'failed': 0,
+                'blocked': 0,
+                'started_at': time.time()
+            }
+            os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+            atomic_write(self.recipients_path, json.dumps(recipients))
+            state['recipients'] = recipients
+            self._save_checkpoint(state, set())
+        else:
+            state = self._load_checkpoint()
+            if state is None:
+                await bot.send_message(admin_chat_id, "📭 Davom ettiriladigan reklama yo'q.")
+                return
+        
+        await self._run(bot, admin_chat_id, state)
+    
+    async def _run(self, bot: Bot, admin_chat_id: int, state: Dict[str, Any]):
+        recipients: List[int] = state['recipients']
+        completed = set(state.get('done_ahead', []))
+        pending = iter([index for index in range(state['cursor'], len(recipients))
+                        if index not in completed])
+        
+        status = await bot.send_message(admin_chat_id, self._progress_text(state, completed))
+        
+        def complete(index: int, result: str):
+            state[result] += 1
+            BROADCAST_MESSAGES.inc(result=result)
+            completed.add(index)
+            # Ketma-ket tugagan yuborishlar bo'yicha chegarani surish
+            while state['cursor'] in completed:
+                completed.remove(state['cursor'])
+                state['cursor'] += 1
+        
+        async def worker():
+            for index in pending:
+                result = await self._send(bot, int(recipients[index]), state['payload'])
+                complete(index, result)
+        
+        lease_lost = False
+        
+        async def reporter():
+            nonlocal lease_lost
+            last_text = None
+            while True:
+                await asyncio.sleep(self.progress_interval)
+                if self.shared is not None and not self.shared.acquire_lock(self.LOCK_NAME, ttl=self.lock_ttl):
+                    # Qulf boshqa jarayonga o'tgan: ikkalasi birga yubormasligi uchun to'xtaymiz,
+                    # checkpoint esa qulfning yangi egasiga qoladi
+                    lease_lost = sending.cancel()
+                    return
+                self._save_checkpoint(state, completed)
+                text = self._progress_text(state, completed)
+                if text != last_text:
+                    last_text = text
+                    try:
+                        await status.edit_text(text)
+                    except TelegramError as e:
+                        logger.warning(f"Reklama holatini yangilashda xatolik: {e}")
+        
+        sending = asyncio.gather(*(worker() for _ in range(self.workers)))
+        progress = asyncio.create_task(reporter())
+        try:
+            await sending
+        except asyncio.CancelledError:
+            if not lease_lost:
+                raise
+        finally:
+            progress.cancel()
+            # Xatolik yoki to'xtatilganda ham erishilgan joy saqlanadi
+            if not lease_lost and state['cursor'] < len(recipients):
+                self._save_checkpoint(state, completed)
+        
+        if lease_lost:
+            logger.warning("Reklama qulfi boshqa jarayonga o'tib ketdi, yuborish to'xtatildi")
+            try:
+                await status.edit_text(self._progress_text(state, completed) +
+                                       "\n\n⚠️ Reklamani boshqa bot jarayoni davom ettiradi.")
+            except TelegramError as e:
+                logger.warning(f"Reklama holatini yangilashda xatolik: {e}")
+            return
+        
+        self._clear_checkpoint()
+        elapsed = max(time.time() - state['started_at'], 1e-6)
+        final_text = (
+            f"✅ Reklama yuborildi!\n\n"
+            f"✅ Muvaffaqiyatli: {state['sent']}\n"
+            f"❌ Xatolar: {state['failed']}\n"
+            f"🚫 Bloklaganlar: {state['blocked']}\n"
+            f"⏱ Vaqt: {elapsed:.0f} s"
+        )
+        try:
+            await status.edit_text(final_text)
+        except TelegramError:
+            await bot.send_message(admin_chat_id, final_text)
+        logger.info(f"Reklama tugadi: {state['sent']} yuborildi, {state['failed']} xato, "
+                    f"{state['blocked']} bloklangan")
+    
+    def _progress_text(self, state: Dict[str, Any], completed: set) -> str:
+        done = state['cursor'] + len(completed)
+        return (
+            f"🔄 Reklama yuborilmoqda... {done}/{state['total']}\n\n"
+            f"✅ Muvaffaqiyatli: {state['sent']}\n"
+            f"❌ Xatolar: {state['failed']}\n"
+            f"🚫 Bloklaganlar: {state['blocked']}"
+        )
+    
+    async def _send(self, bot: Bot, user_id: int, payload: Dict[str, Any]) -> str:
+        for attempt in range(self.MAX_ATTEMPTS):
+            await self.limiter.acquire()
+            try:
+                await self._deliver(bot, user_id, payload)
+                return 'sent'
+            except RetryAfter as e:
+                # Telegram cheklovi: barcha yuboruvchilar kutadi
+                retry_after = e.retry_after
+                seconds = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else retry_after
+                logger.warning(f"Telegram cheklovi, {seconds} s kutiladi")
+                BROADCAST_RATE_LIMITED.inc()
+                self.limiter.pause(seconds)
+            except Forbidden:
+                self.db.mark_blocked(user_id)
+                return 'blocked'
+            except BadRequest as e:
+                if 'chat not found' in e.message.lower():
+                    self.db.mark_blocked(user_id)
+                    return 'blocked'
+                logger.error(f"Reklama yuborishda xatolik {user_id}: {e}")
+                return 'failed'
+            except TelegramError as e:
+                logger.error(f"Reklama yuborishda xatolik {user_id}: {e}")
+                return 'failed'
+        return 'failed'
+    
+    async def _deliver(self, bot: Bot, user_id: int, payload: Dict[str, Any]):
+        if payload['type'] == 'photo':
+            await bot.send_photo(chat_id=user_id, photo=payload['file_id'], caption=payload.get('caption', ''))
+        elif payload['type'] == 'video':
+            await bot.send_video(chat_id=user_id, video=payload['file_id'], caption=payload.get('caption', ''))
+        else:
+            await bot.send_message(chat_id=user_id, text=payload['text'])
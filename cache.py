@@ -0,0 +1,112 @@
+import json
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from knowledge import normalize_text
+from storage import atomic_write
+
+class AnswerCache:
+    """LLM javoblari uchun LRU + TTL kesh (ixtiyoriy ravishda diskka saqlanadi).
+    
+    `shared` berilsa, u ikkinchi daraja: boshqa jarayonlar olgan javoblar
+    ham topiladi va jarayon ichidagi keshga ko'chiriladi.
+    """
+    
+    def __init__(self, max_size: int, ttl: float, path: str = '', shared=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.shared = shared
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(prompt: str, model: str, temperature: float, kb_version: Any, namespace: str = '') -> str:
+        # namespace - maktab: har birining javoblari va bazasi versiyasi alohida
+        raw = f"{namespace}\x00{normalize_text(prompt)}\x00{model}\x00{temperature}\x00{kb_version}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, key: str, record_miss: bool = True) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            
+            if entry is not None:
+                del self._entries[key]
+        
+        entry = self.shared.cache_get(key) if self.shared is not None else None
+        with self._lock:
+            if entry is not None:
+                self._put(key, entry[0], entry[1])
+                self.hits += 1
+                self.shared_hits += 1
+                return entry[1]
+            if record_miss:
+                self.misses += 1
+            return None
+    
+    def _put(self, key: str, expires_at: float, answer: str):
+        self._entries[key] = (expires_at, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def set(self, key: str, answer: str):
+        with self._lock:
+            self._put(key, time.time() + self.ttl, answer)
+        if self.shared is not None:
+            self.shared.cache_set(key, answer, self.ttl)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+    
+    def load(self):
+        """Diskdagi keshni yuklash"""
+        if not self.path:
+            return
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        
+        now = time.time()
+        with self._lock:
+            for key, expires_at, answer in saved[-self.max_size:]:
+                if expires_at > now:
+                    self._entries[key] = (expires_at, answer)
+    
+    def save(self):
+        if not self.path:
+            return
+        
+        with self._lock:
+            entries = [[key, expires_at, answer] for key, (expires_at, answer) in self._entries.items()]
+        
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        atomic_write(self.path, json.dumps(entries, ensure_ascii=False))
@@ -0,0 +1,191 @@
+import time
+import heapq
+import asyncio
+import itertools
+import contextlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict
+
+class SingleFlight:
+    """Bir xil kalitli parallel so'rovlarni bitta chaqiruvga birlashtirish.
+    
+    Birinchi so'rov chaqiruvni alohida task sifatida boshlaydi, qolganlari
+    o'sha taskning natijasini kutadi. Kutuvchilardan biri bekor qilinsa ham,
+    umumiy chaqiruv to'xtamaydi.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+    
+    def __len__(self) -> int:
+        return len(self._calls)
+    
+    def __contains__(self, key: str) -> bool:
+        return key in self._calls
+    
+    def start(self, key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Chaqiruvni kutmasdan boshlash (shu kalit bilan ketayotgan bo'lsa - o'sha task)"""
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.shared += 1
+        return task
+    
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        return await asyncio.shield(self.start(key, factory))
+    
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Hech kim kutmay qolgan bo'lsa ham, xatolik "olinmagan" deb qolmasin
+        if not task.cancelled():
+            task.exception()
+
+
+class TokenBucket:
+    """Token bucket: o'rtacha `rate` so'rov/soniya, `capacity` gacha portlash"""
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def try_acquire(self, tokens: float = 1) -> bool:
+        now = time.monotonic()
+        if now < self._paused_until:
+            return False
+        self._refill(now)
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+    
+    async def acquire(self, tokens: float = 1):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+    
+    def pause(self, seconds: float):
+        # Masalan, Telegram 429 (retry_after) qaytarganda
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+class KeyedRateLimiter:
+    """Har bir kalit (masalan, foydalanuvchi) uchun alohida token bucket.
+    
+    Eng uzoq vaqt faol bo'lmagan kalitlar `max_keys` dan oshganda o'chiriladi.
+    """
+    
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+    
+    def allow(self, key) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.try_acquire()
+
+class Overloaded(Exception):
+    pass
+
+class PriorityLimiter:
+    """Bir vaqtda `limit` tagacha ishga ruxsat beruvchi, navbati cheklangan semafor.
+    
+    Kutayotganlar kichik `priority` bo'yicha, teng bo'lsa kelish tartibida
+    navbat oladi. Navbat to'lsa, `Overloaded` ko'tariladi: yangi kelgan
+    so'rov ustuvorroq bo'lsa, navbatdagi eng past ustuvorlikdagi eng oxirgi
+    kutuvchi rad etiladi, aks holda yangi so'rovning o'zi.
+    """
+    
+    def __init__(self, limit: int, max_waiting: int):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+    
+    async def acquire(self, priority: int = 0):
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+        
+        if self.waiting >= self.max_waiting:
+            self.rejected += 1
+            if not self._evict(priority):
+                raise Overloaded()
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.waiting += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Joy berilgan edi, lekin kutuvchi bekor qilindi - joyni qaytarish
+                self.release()
+            else:
+                self.waiting -= 1
+            raise
+    
+    def _evict(self, priority: int) -> bool:
+        # Navbatdagi eng past ustuvorlikdagi (teng bo'lsa eng kech kelgan) kutuvchini rad etish
+        candidates = [entry for entry in self._waiters if not entry[2].done()]
+        if not candidates:
+            return False
+        victim = max(candidates, key=lambda entry: (entry[0], entry[1]))
+        if victim[0] <= priority:
+            return False
+        self._waiters.remove(victim)
+        heapq.heapify(self._waiters)
+        self.waiting -= 1
+        victim[2].set_exception(Overloaded())
+        return True
+    
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Joy to'g'ridan-to'g'ri keyingi kutuvchiga o'tadi
+                self.waiting -= 1
+                future.set_result(None)
+                return
+        self.active -= 1
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: int = 0):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
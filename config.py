@@ -3,7 +3,27 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Noto'g'ri formatdagi sonlar import paytida xatolik bermaydi: standart qiymat
+# olinadi, xato esa validate_config da ko'rsatiladi
+_env_errors = []
+
+def _env_number(name: str, default: str, cast):
+    value = os.getenv(name, '').strip()
+    try:
+        return cast(value or default)
+    except ValueError:
+        _env_errors.append(f"{name} noto'g'ri formatda: {value!r} (son bo'lishi kerak).")
+        return cast(default)
+
+def _env_int(name: str, default: str) -> int:
+    return _env_number(name, default, int)
+
+def _env_float(name: str, default: str) -> float:
+    return _env_number(name, default, float)
+
 class Config:
+    ENV_ERRORS = _env_errors
+    
     BOT_TOKEN = os.getenv('BOT_TOKEN', '').strip()
     OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY', '').strip()
     
@@ -16,9 +36,105 @@ class Config:
     
     OPENROUTER_API_URL = os.getenv('OPENROUTER_API_URL', 'https://openrouter.ai/api/v1/chat/completions').strip()
     MODEL = "google/gemini-pro-1.5"
+    # Modellar ustuvorlik tartibida: "model" yoki "model@endpoint_url", vergul bilan
+    LLM_BACKENDS = os.getenv('LLM_BACKENDS', MODEL).strip()
     MAX_TOKENS = 1000
     TEMPERATURE = 0.7
     
+    # Webhook rejimi (WEBHOOK_URL bo'sh bo'lsa, polling ishlatiladi)
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '').strip()
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram').strip()
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0').strip()
+    WEBHOOK_PORT = _env_int('WEBHOOK_PORT', '8443')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '').strip()
+    WEBHOOK_MAX_CONNECTIONS = _env_int('WEBHOOK_MAX_CONNECTIONS', '40')
+    
+    # Tugallanmagan update lar chegarasi (navbatdagi + qayta ishlanayotgan; oshsa
+    # webhook 503 qaytaradi) va bir vaqtda qayta ishlanadigan update lar soni
+    # (turli chatlar parallel, bitta chat ichida ketma-ket)
+    UPDATE_QUEUE_SIZE = _env_int('UPDATE_QUEUE_SIZE', '1000')
+    CONCURRENT_UPDATES = _env_int('CONCURRENT_UPDATES', '256')
+    
+    # OpenRouter HTTP klienti (ulanishlar puli va timeoutlar)
+    HTTP2 = os.getenv('HTTP2', 'true').strip().lower() in ('1', 'true', 'yes')
+    HTTP_MAX_CONNECTIONS = _env_int('HTTP_MAX_CONNECTIONS', '100')
+    HTTP_MAX_KEEPALIVE = _env_int('HTTP_MAX_KEEPALIVE', '20')
+    HTTP_KEEPALIVE_EXPIRY = _env_float('HTTP_KEEPALIVE_EXPIRY', '30')
+    HTTP_TIMEOUT = _env_float('HTTP_TIMEOUT', '30')
+    HTTP_CONNECT_TIMEOUT = _env_float('HTTP_CONNECT_TIMEOUT', '10')
+    
+    # Kirishni boshqarish: foydalanuvchi tezligi, umumiy navbat va OpenRouter parallelligi.
+    # Savollar navbati update lar ichida turadi, shuning uchun
+    # MAX_ACTIVE_QUESTIONS + QUESTION_QUEUE_SIZE < CONCURRENT_UPDATES bo'lishi kerak,
+    # aks holda navbat hech qachon to'lmaydi va bazadan javob beriladigan savollarga joy qolmaydi
+    USER_RATE = _env_float('USER_RATE', '0.2')
+    USER_BURST = _env_float('USER_BURST', '3')
+    MAX_ACTIVE_QUESTIONS = _env_int('MAX_ACTIVE_QUESTIONS', '64')
+    QUESTION_QUEUE_SIZE = _env_int('QUESTION_QUEUE_SIZE', '128')
+    UPSTREAM_CONCURRENCY = _env_int('UPSTREAM_CONCURRENCY', '16')
+    
+    # Zaxira modellar: qayta urinishlar, circuit breaker va hedging
+    LLM_MAX_ATTEMPTS = _env_int('LLM_MAX_ATTEMPTS', '3')
+    LLM_BACKOFF_BASE = _env_float('LLM_BACKOFF_BASE', '0.5')
+    LLM_BACKOFF_MAX = _env_float('LLM_BACKOFF_MAX', '4')
+    LLM_DEADLINE = _env_float('LLM_DEADLINE', '60')
+    LLM_BREAKER_FAILURES = _env_int('LLM_BREAKER_FAILURES', '5')
+    LLM_BREAKER_RESET = _env_float('LLM_BREAKER_RESET', '30')
+    LLM_HEDGE = os.getenv('LLM_HEDGE', 'false').strip().lower() in ('1', 'true', 'yes')
+    LLM_HEDGE_DELAY = _env_float('LLM_HEDGE_DELAY', '5')
+    LLM_HEDGE_MIN_DELAY = _env_float('LLM_HEDGE_MIN_DELAY', '1')
+    
+    # Suhbat tarixi (CONTEXT_MAX_TURNS=0 - o'chirilgan): foydalanuvchi boshiga
+    # oxirgi savol-javoblar, LLM ga yuboriladigan tarix hajmi tokenlarda
+    CONTEXT_MAX_TURNS = _env_int('CONTEXT_MAX_TURNS', '4')
+    CONTEXT_MAX_USERS = _env_int('CONTEXT_MAX_USERS', '20000')
+    CONTEXT_TOKEN_BUDGET = _env_int('CONTEXT_TOKEN_BUDGET', '1000')
+    CONTEXT_TTL = _env_float('CONTEXT_TTL', '1800')
+    CONTEXT_MESSAGE_CHARS = _env_int('CONTEXT_MESSAGE_CHARS', '600')
+    CONTEXT_SUMMARY = os.getenv('CONTEXT_SUMMARY', 'true').strip().lower() in ('1', 'true', 'yes')
+    
+    # Javobni oqim (SSE) bilan olish va xabarni tahrirlash oralig'i (soniya)
+    STREAMING = os.getenv('STREAMING', 'true').strip().lower() in ('1', 'true', 'yes')
+    STREAM_EDIT_INTERVAL = _env_float('STREAM_EDIT_INTERVAL', '1.5')
+    
+    # O'xshash savollarni qidirish (TF-IDF)
+    RETRIEVAL_THRESHOLD = _env_float('RETRIEVAL_THRESHOLD', '0.8')
+    RETRIEVAL_MIN_SCORE = _env_float('RETRIEVAL_MIN_SCORE', '0.2')
+    RETRIEVAL_TOP_K = _env_int('RETRIEVAL_TOP_K', '3')
+    
+    # Maktablar: chat biriktirilmagan bo'lsa asosiy baza va shu nom ishlatiladi;
+    # xotirada eng ko'pi MAX_ACTIVE_TENANTS ta maktab indekslari saqlanadi
+    SCHOOL_NAME = os.getenv('SCHOOL_NAME', '2-maktab').strip()
+    MAX_ACTIVE_TENANTS = _env_int('MAX_ACTIVE_TENANTS', '32')
+    
+    # LLM javoblari keshi (CACHE_FILE bo'sh bo'lsa, diskka saqlanmaydi)
+    CACHE_MAX_SIZE = _env_int('CACHE_MAX_SIZE', '2000')
+    CACHE_TTL = _env_float('CACHE_TTL', '21600')
+    CACHE_FILE = os.getenv('CACHE_FILE', '').strip()
+    
+    # Reklama yuborish (Telegram umumiy cheklovi ~30 xabar/soniya)
+    BROADCAST_RATE = _env_float('BROADCAST_RATE', '25')
+    BROADCAST_WORKERS = _env_int('BROADCAST_WORKERS', '10')
+    BROADCAST_PROGRESS_INTERVAL = _env_float('BROADCAST_PROGRESS_INTERVAL', '3')
+    BROADCAST_CHECKPOINT = os.getenv('BROADCAST_CHECKPOINT', 'data/broadcast.json').strip()
+    
+    # Ma'lumotlarni saqlash usuli: json yoki sqlite
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').strip().lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH', 'data/hasanai.db').strip()
+    
+    # Bir nechta bot jarayoni uchun umumiy holat: bo'sh - bitta jarayon,
+    # sqlite - umumiy fayl (javoblar keshi, reklama qulfi va qoralamalari)
+    SHARED_STATE = os.getenv('SHARED_STATE', '').strip().lower()
+    SHARED_STATE_PATH = os.getenv('SHARED_STATE_PATH', 'data/shared.db').strip()
+    
+    # JSON ma'lumotlarni diskka yozish (write-behind)
+    DB_FLUSH_INTERVAL = _env_float('DB_FLUSH_INTERVAL', '5')
+    DB_FLUSH_EVERY = _env_int('DB_FLUSH_EVERY', '100')
+    
+    # Prometheus /metrics endpoint (METRICS_PORT=0 - o'chirilgan)
+    METRICS_PORT = _env_int('METRICS_PORT', '0')
+    METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1').strip()
+    
     @classmethod
     def validate_config(cls):
         """Konfiguratsiyani tekshirish"""
@@ -30,7 +146,21 @@ class Config:
         if not cls.OPENROUTER_API_KEY:
             errors.append("OPENROUTER_API_KEY topilmadi. .env faylini tekshiring.")
         
+        errors.extend(cls.ENV_ERRORS)
+        
         if not cls.ADMIN_ID:
             errors.append("ADMIN_ID topilmadi yoki noto'g'ri formatda. .env faylini tekshiring.")
         
+        if cls.SHARED_STATE not in ('', 'sqlite'):
+            errors.append(f"SHARED_STATE noto'g'ri: {cls.SHARED_STATE} (bo'sh yoki sqlite bo'lishi kerak)")
+        elif cls.SHARED_STATE and cls.STORAGE_BACKEND != 'sqlite':
+            errors.append("Bir nechta jarayon uchun STORAGE_BACKEND=sqlite bo'lishi kerak (JSON fayllar umumiy emas).")
+        
+        if cls.MAX_ACTIVE_QUESTIONS + cls.QUESTION_QUEUE_SIZE >= cls.CONCURRENT_UPDATES:
+            errors.append(f"MAX_ACTIVE_QUESTIONS + QUESTION_QUEUE_SIZE ({cls.MAX_ACTIVE_QUESTIONS + cls.QUESTION_QUEUE_SIZE}) "
+                          f"CONCURRENT_UPDATES ({cls.CONCURRENT_UPDATES}) dan kichik bo'lishi kerak.")
+        
+        if cls.WEBHOOK_URL and not cls.WEBHOOK_SECRET:
+            errors.append("WEBHOOK_SECRET topilmadi. Webhook rejimida maxfiy token majburiy.")
+        
         return errors
@@ -0,0 +1,169 @@
+import re
+import time
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+_WORD = re.compile(r"[\w'-]+")
+# o‘sha, oʻsha va o'sha bir xil yoziladi
+_APOSTROPHES = str.maketrans("ʻʼ‘’", "''''")
+
+# Oldingi savolga tayanadigan savollar: "va soat nechida?", "unga kim boradi?"
+FOLLOW_UP_STARTS = frozenset(
+    "va yana unda undan keyin lekin ammo xo'sh hali and also then but и а ещё еще но".split()
+)
+FOLLOW_UP_WORDS = frozenset(
+    "u bu shu o'sha ular uni unga uning undan unda buni bunga buning bunda shuni shunga "
+    "shuning shunda bular shular ularni ularga ularning it its this that they them there "
+    "он она оно они его её ее их это этот эта там".split()
+)
+
+def estimate_tokens(text: str) -> int:
+    """Tokenlar sonini tez taxminlash (o'rtacha ~4 belgi = 1 token)"""
+    return len(text) // 4 + 1
+
+def clip(text: str, limit: int) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+def first_sentence(text: str, limit: int) -> str:
+    return clip(_SENTENCE_END.split(text.strip(), 1)[0], limit)
+
+def looks_like_follow_up(question: str) -> bool:
+    """Savol oldingi suhbatsiz tushunarsizmi (bir so'z, bog'lovchi yoki olmosh bilan)"""
+    words = _WORD.findall(question.casefold().translate(_APOSTROPHES))
+    return (len(words) <= 1 or words[0] in FOLLOW_UP_STARTS
+            or any(word in FOLLOW_UP_WORDS for word in words))
+
+class _History:
+    __slots__ = ('turns', 'summary', 'updated')
+    
+    def __init__(self, max_turns: int):
+        # (savol, javob) juftliklari, eng eskisi avtomatik tushib qoladi
+        self.turns = deque(maxlen=max_turns)
+        self.summary = ''
+        self.updated = time.monotonic()
+
+class ConversationMemory:
+    """Foydalanuvchilar suhbat tarixi: har biriga cheklangan halqa bufer.
+    
+    Faol foydalanuvchilar soni `max_users` dan oshsa, eng uzoq yozmagani
+    chiqariladi (LRU); `ttl` soniya yozmagan foydalanuvchi tarixi eskirgan
+    hisoblanadi. Xabarlar `message_chars` gacha qisqartirib saqlanadi, shuning
+    uchun xotira max_users * max_turns * message_chars bilan chegaralangan.
+    """
+    
+    def __init__(self, max_users: int = 20000, max_turns: int = 4, token_budget: int = 1000,
+                 ttl: float = 1800, message_chars: int = 600, summarize: bool = True,
+                 summary_chars: int = 600):
+        self.max_users = max_users
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.ttl = ttl
+        self.message_chars = message_chars
+        self.summarize = summarize
+        self.summary_chars = summary_chars
+        self._users: Dict[int, _History] = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._users)
+    
+    def _get(self, user_id: int) -> Optional[_History]:
+        history = self._users.get(user_id)
+        if history is not None and time.monotonic() - history.updated > self.ttl:
+            del self._users[user_id]
+            return None
+        return history
+    
+    def has_history(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        with self._lock:
+            return self._get(user_id) is not None
+    
+    def is_follow_up(self, user_id: Optional[int], question: str) -> bool:
+        """Javob suhbat tarixiga bog'liqmi: tarix bor va savol davom ettiruvchi.
+        
+        Mustaqil savollar tarix bo'lsa ham keshdan olinadi va bir xil
+        savollar bilan bitta so'rovga birlashtiriladi.
+        """
+        return looks_like_follow_up(question) and self.has_history(user_id)
+    
+    def _summarize(self, history: _History, question: str, answer: str):
+        # Ekstraktiv xulosa: chiqib ketayotgan savol-javobning birinchi gaplari
+        line = f"{first_sentence(question, 160)} — {first_sentence(answer, 200)}"
+        summary = f"{history.summary}\n{line}" if history.summary else line
+        if len(summary) > self.summary_chars:
+            # Eng eski qatorlar tashlab yuboriladi
+            summary = summary[-self.summary_chars:]
+            summary = summary.split('\n', 1)[-1] if '\n' in summary else summary
+        history.summary = summary
+    
+    def record(self, user_id: int, question: str, answer: str):
+        if not self.max_turns:
+            return
+        question = clip(question, self.message_chars)
+        answer = clip(answer, self.message_chars)
+        with self._lock:
+            history = self._get(user_id)
+            if history is None:
+                history = _History(self.max_turns)
+                self._users[user_id] = history
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            else:
+                self._users.move_to_end(user_id)
+            
+            if self.summarize and len(history.turns) == history.turns.maxlen:
+                self._summarize(history, *history.turns[0])
+            history.turns.append((question, answer))
+            history.updated = time.monotonic()
+    
+    def clear(self, user_id: int):
+        with self._lock:
+            self._users.pop(user_id, None)
+    
+    def messages(self, user_id: Optional[int], reserved_tokens: int = 0) -> List[Dict[str, str]]:
+        """OpenRouter uchun oldingi xabarlar: eng yangilari byudjetga sig'guncha"""
+        if user_id is None:
+            return []
+        with self._lock:
+            history = self._get(user_id)
+            if history is None:
+                return []
+            turns = list(history.turns)
+            summary = history.summary
+        
+        budget = self.token_budget - reserved_tokens
+        selected = []
+        for index in range(len(turns) - 1, -1, -1):
+            question, answer = turns[index]
+            cost = estimate_tokens(question) + estimate_tokens(answer)
+            if cost > budget:
+                # Sig'maganlar ham xulosaga qisqacha qo'shiladi
+                if self.summarize:
+                    dropped = '\n'.join(f"{first_sentence(q, 160)} — {first_sentence(a, 200)}"
+                                        for q, a in turns[:index + 1])
+                    summary = f"{summary}\n{dropped}" if summary else dropped
+                break
+            budget -= cost
+            selected.append({"role": "assistant", "content": answer})
+            selected.append({"role": "user", "content": question})
+        selected.reverse()
+        
+        if summary:
+            summary = summary[-self.summary_chars:]
+            if estimate_tokens(summary) <= budget:
+                selected.insert(0, {"role": "system", "content": f"Oldingi suhbat qisqacha:\n{summary}"})
+        return selected
+    
+    def prune(self) -> int:
+        """Eskirgan tarixlarni o'chirish; o'chirilganlar sonini qaytaradi"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [user_id for user_id, history in self._users.items() if now - history.updated > self.ttl]
+            for user_id in expired:
+                del self._users[user_id]
+        return len(expired)
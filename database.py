@@ -1,95 +1,112 @@
-import json
 import os
-from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+from config import Config
+from storage import DEFAULT_TENANT, StorageBackend, JsonBackend, SQLiteBackend
 
 class Database:
-    def __init__(self):
+    def __init__(self, backend: StorageBackend = None):
         self.data_dir = "data"
         os.makedirs(self.data_dir, exist_ok=True)
         
-    def _get_file_path(self, filename: str) -> str:
-        return os.path.join(self.data_dir, filename)
-    
-    def load_json(self, filename: str) -> Dict[str, Any]:
-        file_path = self._get_file_path(filename)
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return {}
-    
-    def save_json(self, filename: str, data: Dict[str, Any]):
-        file_path = self._get_file_path(filename)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        # Saqlash usuli konfiguratsiyadan tanlanadi (json yoki sqlite)
+        if backend is None:
+            if Config.STORAGE_BACKEND == 'sqlite':
+                backend = SQLiteBackend(Config.SQLITE_PATH, self.data_dir)
+            else:
+                backend = JsonBackend(self.data_dir, Config.DB_FLUSH_INTERVAL, Config.DB_FLUSH_EVERY)
+        self.backend = backend
+        self._knowledge_listeners = []
+        self._reload_listeners = []
+    
+    @property
+    def kb_version(self) -> int:
+        # Ma'lumotlar bazasi har o'zgarganda oshiriladi va diskda saqlanadi
+        return self.backend.get_kb_version()
+    
+    def get_kb_version(self, tenant: str = DEFAULT_TENANT) -> int:
+        # Har bir maktab bazasining o'z versiyasi bor
+        return self.backend.get_kb_version(tenant)
+    
+    def on_knowledge_added(self, callback):
+        # callback(tenant, question, answer) har bir yangi ma'lumotdan keyin chaqiriladi
+        self._knowledge_listeners.append(callback)
+    
+    def on_knowledge_reloaded(self, callback):
+        # callback(tenant) ommaviy import dan keyin bir marta chaqiriladi
+        self._reload_listeners.append(callback)
+    
+    def flush(self):
+        self.backend.flush()
+    
+    def close(self):
+        self.backend.close()
     
     def update_user(self, user_id: int, username: str, first_name: str):
-        users = self.load_json('users.json')
-        
-        if str(user_id) not in users:
-            users[str(user_id)] = {
-                'username': username,
-                'first_name': first_name,
-                'join_date': datetime.now().isoformat(),
-                'questions_asked': 0,
-                'last_active': datetime.now().isoformat()
-            }
-        else:
-            users[str(user_id)].update({
-                'username': username,
-                'first_name': first_name,
-                'last_active': datetime.now().isoformat()
-            })
-        
-        self.save_json('users.json', users)
+        self.backend.update_user(user_id, username, first_name)
     
     def increment_questions(self, user_id: int):
-        users = self.load_json('users.json')
-        stats = self.load_json('stats.json')
-        
-        if str(user_id) in users:
-            users[str(user_id)]['questions_asked'] = users[str(user_id)].get('questions_asked', 0) + 1
-        
-        stats['total_questions'] = stats.get('total_questions', 0) + 1
-        stats['last_question_time'] = datetime.now().isoformat()
-        
-        self.save_json('users.json', users)
-        self.save_json('stats.json', stats)
+        self.backend.increment_questions(user_id)
+    
+    def get_users(self) -> Dict[str, Any]:
+        return self.backend.get_users()
+    
+    def count_users(self) -> int:
+        return self.backend.count_users()
+    
+    def get_users_page(self, cursor: int, limit: int, query: str = '',
+                       backward: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+        return self.backend.get_users_page(cursor, limit, query, backward)
+    
+    def mark_blocked(self, user_id: int):
+        self.backend.mark_blocked(user_id)
+    
+    def get_broadcast_recipients(self) -> List[int]:
+        return self.backend.get_broadcast_recipients()
     
     def get_stats(self) -> Dict[str, Any]:
-        users = self.load_json('users.json')
-        stats = self.load_json('stats.json')
-        
-        return {
-            'total_users': len(users),
-            'total_questions': stats.get('total_questions', 0),
-            'active_today': self._count_active_today(users)
-        }
-    
-    def _count_active_today(self, users: Dict[str, Any]) -> int:
-        today = datetime.now().date()
-        count = 0
-        
-        for user_data in users.values():
-            last_active = user_data.get('last_active')
-            if last_active:
-                try:
-                    active_date = datetime.fromisoformat(last_active).date()
-                    if active_date == today:
-                        count += 1
-                except ValueError:
-                    continue
-        
-        return count
-
-    def add_knowledge(self, question: str, answer: str):
-        knowledge_base = self.load_json('knowledge_base.json')
-        if 'qa_pairs' not in knowledge_base:
-            knowledge_base['qa_pairs'] = {}
-        
-        knowledge_base['qa_pairs'][question.strip()] = answer.strip()
-        self.save_json('knowledge_base.json', knowledge_base)
+        return self.backend.get_stats()
+    
+    def get_activity_history(self, days: int = 30) -> List[Dict[str, Any]]:
+        return self.backend.get_activity_history(days)
+    
+    def add_knowledge(self, question: str, answer: str, tenant: str = DEFAULT_TENANT):
+        self.backend.add_knowledge(question, answer, tenant)
+        for callback in self._knowledge_listeners:
+            callback(tenant, question.strip(), answer.strip())
+    
+    def add_knowledge_bulk(self, qa_pairs: Dict[str, str], tenant: str = DEFAULT_TENANT) -> int:
+        qa_pairs = {question.strip(): answer.strip() for question, answer in qa_pairs.items()}
+        if not qa_pairs:
+            return 0
+        added = self.backend.add_knowledge_bulk(qa_pairs, tenant)
+        for callback in self._reload_listeners:
+            callback(tenant)
+        return added
+    
+    def get_knowledge_base(self, tenant: str = DEFAULT_TENANT):
+        return self.backend.get_knowledge_base(tenant)
+    
+    def count_knowledge(self, tenant: str = DEFAULT_TENANT) -> int:
+        return self.backend.count_knowledge(tenant)
+    
+    def get_knowledge_page(self, offset: int, limit: int, query: str = '',
+                           tenant: str = DEFAULT_TENANT) -> List[Tuple[str, str]]:
+        return self.backend.get_knowledge_page(offset, limit, query, tenant)
+    
+    def release_knowledge(self, tenant: str):
+        self.backend.release_knowledge(tenant)
+    
+    def get_tenant(self, tenant: str) -> Optional[Dict[str, str]]:
+        return self.backend.get_tenant(tenant)
+    
+    def save_tenant(self, tenant: str, name: str, prompt: str = ''):
+        self.backend.save_tenant(tenant, name, prompt)
+    
+    def list_tenants(self) -> List[Tuple[str, Dict[str, str]]]:
+        return self.backend.list_tenants()
+    
+    def get_chat_tenant(self, chat_id: int) -> Optional[str]:
+        return self.backend.get_chat_tenant(chat_id)
     
-    def get_knowledge_base(self):
-        return self.load_json('knowledge_base.json')
+    def set_chat_tenant(self, chat_id: int, tenant: str):
+        self.backend.set_chat_tenant(chat_id, tenant)
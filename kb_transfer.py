@@ -0,0 +1,161 @@
+import csv
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database import Database
+from knowledge import normalize_text
+from storage import DEFAULT_TENANT
+from streaming import MAX_MESSAGE_LENGTH
+
+# Bot API orqali yuklab olinadigan fayl hajmi chegarasi
+MAX_IMPORT_BYTES = 20 * 1024 * 1024
+MAX_QUESTION_LENGTH = 1000
+MAX_ERRORS_SHOWN = 10
+EXPORT_BATCH_SIZE = 1000
+
+QUESTION_FIELDS = ('question', 'savol', 'q')
+ANSWER_FIELDS = ('answer', 'javob', 'a')
+
+FORMATS = {
+    '.csv': 'csv',
+    '.tsv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl'
+}
+
+# (qator raqami, savol, javob, xato)
+Row = Tuple[int, Optional[str], Optional[str], Optional[str]]
+
+def detect_format(filename: str) -> Optional[str]:
+    return FORMATS.get(os.path.splitext(filename or '')[1].lower())
+
+def _pick(record: Dict[str, Any], fields: Tuple[str, ...]) -> Optional[str]:
+    for field in fields:
+        value = record.get(field)
+        if value is not None:
+            return str(value)
+    return None
+
+def _prepend(first: List[str], rows: Iterator[List[str]]) -> Iterator[List[str]]:
+    yield first
+    yield from rows
+
+def _read_csv(f) -> Iterator[Row]:
+    sample = f.read(4096)
+    f.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    
+    reader = csv.reader(f, dialect)
+    question_index, answer_index = 0, 1
+    first = next(reader, None)
+    if first is None:
+        return
+    
+    header = [cell.strip().lower() for cell in first]
+    if any(field in header for field in QUESTION_FIELDS) and any(field in header for field in ANSWER_FIELDS):
+        question_index = next(header.index(field) for field in QUESTION_FIELDS if field in header)
+        answer_index = next(header.index(field) for field in ANSWER_FIELDS if field in header)
+        rows = reader
+    else:
+        # Sarlavha yo'q: birinchi ikki ustun - savol va javob
+        rows = _prepend(first, reader)
+    
+    for row in rows:
+        if not any(cell.strip() for cell in row):
+            continue
+        if len(row) <= max(question_index, answer_index):
+            yield reader.line_num, None, None, "ustunlar yetarli emas"
+            continue
+        yield reader.line_num, row[question_index], row[answer_index], None
+
+def _read_jsonl(f) -> Iterator[Row]:
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, None, f"JSON xato ({e.msg})"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, None, "obyekt kutilgan edi"
+            continue
+        yield line_number, _pick(record, QUESTION_FIELDS), _pick(record, ANSWER_FIELDS), None
+
+def parse_knowledge_file(path: str, file_format: str, existing_questions: Iterable[str]) -> Dict[str, Any]:
+    """Faylni qatorma-qator o'qish, tekshirish va takrorlarni olib tashlash.
+    
+    Savollar normalize_text bo'yicha solishtiriladi: fayldagi takrorlardan
+    oxirgisi qoladi, bazada bor savol esa o'sha yozuvni yangilaydi.
+    """
+    existing = {normalize_text(question): question for question in existing_questions}
+    pairs: Dict[str, Tuple[str, str]] = {}
+    report = {'total': 0, 'invalid': 0, 'duplicates': 0, 'errors': []}
+    
+    def reject(line_number: int, reason: str):
+        report['invalid'] += 1
+        if len(report['errors']) < MAX_ERRORS_SHOWN:
+            report['errors'].append(f"{line_number}-qator: {reason}")
+    
+    reader = _read_csv if file_format == 'csv' else _read_jsonl
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for line_number, question, answer, error in reader(f):
+            report['total'] += 1
+            if error:
+                reject(line_number, error)
+                continue
+            
+            question = (question or '').strip()
+            answer = (answer or '').strip()
+            if not question or not answer:
+                reject(line_number, "savol yoki javob bo'sh")
+                continue
+            if len(question) > MAX_QUESTION_LENGTH:
+                reject(line_number, f"savol {MAX_QUESTION_LENGTH} belgidan uzun")
+                continue
+            if len(answer) > MAX_MESSAGE_LENGTH:
+                reject(line_number, f"javob {MAX_MESSAGE_LENGTH} belgidan uzun")
+                continue
+            
+            key = normalize_text(question)
+            if key in pairs:
+                report['duplicates'] += 1
+            pairs[key] = (existing.get(key, question), answer)
+    
+    report['pairs'] = dict(pairs.values())
+    report['updated'] = sum(1 for key in pairs if key in existing)
+    report['new'] = len(pairs) - report['updated']
+    return report
+
+def iter_knowledge_pages(db: Database, batch_size: int = EXPORT_BATCH_SIZE,
+                         tenant: str = DEFAULT_TENANT) -> Iterator[List[Tuple[str, str]]]:
+    offset = 0
+    while True:
+        page = db.get_knowledge_page(offset, batch_size, tenant=tenant)
+        if not page:
+            return
+        yield page
+        offset += len(page)
+
+def write_export(path: str, pages: Iterable[List[Tuple[str, str]]], file_format: str) -> int:
+    """Bazani bo'laklab faylga yozish; yozilgan juftliklar sonini qaytaradi"""
+    count = 0
+    # utf-8-sig: Excel kirill/lotin harflarini to'g'ri ochishi uchun
+    with open(path, 'w', encoding='utf-8-sig' if file_format == 'csv' else 'utf-8', newline='') as f:
+        if file_format == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(['question', 'answer'])
+            for page in pages:
+                writer.writerows(page)
+                count += len(page)
+        else:
+            for page in pages:
+                f.writelines(json.dumps({'question': question, 'answer': answer}, ensure_ascii=False) + '\n'
+                             for question, answer in page)
+                count += len(page)
+    return count
@@ -0,0 +1,115 @@
+from array import array
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+# O'zbek tilidagi turli apostrof belgilarini bitta ko'rinishga keltirish
+APOSTROPHES = str.maketrans({
+    'ʻ': "'", 'ʼ': "'", '‘': "'", '’': "'", '`': "'", '´': "'", 'ʹ': "'"
+})
+
+def normalize_text(text: str) -> str:
+    return ' '.join(text.casefold().translate(APOSTROPHES).split())
+
+class KnowledgeMatcher:
+    """Savollar bo'yicha Aho–Corasick avtomati.
+    
+    Foydalanuvchi xabarida uchragan eng uzun savolni bir marta o'qib
+    topadi, shuning uchun qidiruv vaqti savollar soniga bog'liq emas.
+    """
+    
+    def __init__(self, qa_pairs: Dict[str, str]):
+        self.questions = []
+        self.answers = []
+        self._lengths = array('i')
+        
+        # Holatlar o'tishi bitta lug'atda: kalit = (holat << 21) | belgi kodi
+        self._goto = {}
+        self._fail = array('i', [0])
+        # Holatda tugaydigan eng uzun savol indeksi (-1 - yo'q)
+        self._output = array('i', [-1])
+        
+        for question, answer in qa_pairs.items():
+            self._insert(normalize_text(question), question, answer)
+        
+        self._build_links()
+    
+    def __len__(self) -> int:
+        return len(self.questions)
+    
+    def _insert(self, pattern: str, question: str, answer: str):
+        if not pattern:
+            return
+        
+        state = 0
+        for char in pattern:
+            key = (state << 21) | ord(char)
+            next_state = self._goto.get(key)
+            if next_state is None:
+                next_state = len(self._fail)
+                self._goto[key] = next_state
+                self._fail.append(0)
+                self._output.append(-1)
+            state = next_state
+        
+        # Bir xil normallashgan savol qayta qo'shilsa, oxirgisi ustun
+        if self._output[state] != -1:
+            self.questions[self._output[state]] = question
+            self.answers[self._output[state]] = answer
+            return
+        
+        self._output[state] = len(self.questions)
+        self.questions.append(question)
+        self.answers.append(answer)
+        self._lengths.append(len(pattern))
+    
+    def _children(self):
+        children = {}
+        for key, child in self._goto.items():
+            children.setdefault(key >> 21, []).append((key & 0x1FFFFF, child))
+        return children
+    
+    def _build_links(self):
+        children = self._children()
+        queue = deque(child for _, child in children.get(0, ()))
+        
+        while queue:
+            state = queue.popleft()
+            for code, child in children.get(state, ()):
+                fail = self._fail[state]
+                while fail and ((fail << 21) | code) not in self._goto:
+                    fail = self._fail[fail]
+                target = self._goto.get((fail << 21) | code, 0)
+                self._fail[child] = target if target != child else 0
+                
+                # O'zida savol tugamasa, suffiksdagi eng uzun savolni meros oladi
+                if self._output[child] == -1:
+                    self._output[child] = self._output[self._fail[child]]
+                queue.append(child)
+    
+    def match(self, text: str) -> Optional[Tuple[str, str]]:
+        """Matnda uchragan eng uzun savol va uning javobini qaytaradi"""
+        if not self.questions:
+            return None
+        
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        lengths = self._lengths
+        best = -1
+        best_length = 0
+        state = 0
+        
+        for char in normalize_text(text):
+            code = ord(char)
+            while state and ((state << 21) | code) not in goto:
+                state = fail[state]
+            state = goto.get((state << 21) | code, 0)
+            
+            found = output[state]
+            if found != -1 and lengths[found] > best_length:
+                best = found
+                best_length = lengths[found]
+        
+        if best == -1:
+            return None
+        return self.questions[best], self.answers[best]
@@ -0,0 +1,332 @@
+import json
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import httpx
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# So'rovning o'zi yoki kalit noto'g'ri: boshqa model ham xuddi shu javobni beradi
+FATAL_STATUSES = (400, 401, 403)
+
+class OpenRouterError(Exception):
+    def __init__(self, status_code, text: str):
+        super().__init__(f"{status_code} - {text}")
+        self.status_code = status_code
+
+class CircuitBreaker:
+    """Ketma-ket xatolardan keyin backend ni vaqtincha chetlab o'tish.
+    
+    closed -> (failure_threshold ta xato) -> open -> (reset_timeout) ->
+    half_open: bitta sinov so'rovi; muvaffaqiyatli bo'lsa closed, aks holda yana open.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+    
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+    
+    def allow(self) -> bool:
+        """So'rov yuborish mumkinmi (half_open da sinov so'rovini band qiladi)"""
+        state = self.state
+        if state == 'closed':
+            return True
+        if state == 'half_open' and not self._probing:
+            self._probing = True
+            return True
+        return False
+    
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+    
+    def record_failure(self):
+        self._failures += 1
+        if self._probing or self._failures >= self.failure_threshold:
+            self._opened_at = self._clock()
+        self._probing = False
+    
+    def release(self):
+        # So'rov natijasiz tugadi (bekor qilindi): sinov huquqi qaytariladi
+        self._probing = False
+
+class Backend:
+    """Model va endpoint, uning circuit breaker i va oxirgi kechikishlari"""
+    
+    MIN_SAMPLES = 20
+    
+    def __init__(self, model: str, url: str, breaker: CircuitBreaker, window: int = 200):
+        self.model = model
+        self.url = url
+        self.breaker = breaker
+        self._latencies = deque(maxlen=window)
+    
+    @property
+    def name(self) -> str:
+        return self.model
+    
+    def observe(self, seconds: float):
+        # Oqimda - birinchi token gacha, oddiy so'rovda - to'liq javob vaqti
+        self._latencies.append(seconds)
+    
+    def p95(self) -> Optional[float]:
+        if len(self._latencies) < self.MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)]
+
+def parse_backends(spec: str, default_url: str, failure_threshold: int = 5,
+                   reset_timeout: float = 30.0) -> List[Backend]:
+    """"model1, model2@https://boshqa/endpoint" -> Backend lar ro'yxati (tartib - ustuvorlik)"""
+    backends = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        model, _, url = item.partition('@')
+        backends.append(Backend(model.strip(), url.strip() or default_url,
+                                CircuitBreaker(failure_threshold, reset_timeout)))
+    return backends
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, OpenRouterError):
+        return error.status_code not in FATAL_STATUSES
+    return True
+
+class LLMRouter:
+    """Modellar ro'yxati bo'yicha so'rov: zaxira model, qayta urinish va hedging.
+    
+    Har urinish circuit breaker i yopiq bo'lgan birinchi backend ga yuboriladi,
+    xato bo'lsa keyingisiga (jitter bilan kutib). Hedging yoqilgan bo'lsa va
+    backend p95 vaqtida javob bermasa, parallel ravishda keyingi backend ga ham
+    so'rov yuboriladi; birinchi javob bergani g'olib bo'ladi.
+    """
+    
+    def __init__(self, backends: List[Backend], max_attempts: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 4.0, deadline: float = 60.0, hedge: bool = False,
+                 hedge_delay: float = 5.0, hedge_min_delay: float = 1.0,
+                 limiter: Optional[asyncio.Semaphore] = None):
+        if not backends:
+            raise ValueError("Kamida bitta model kerak")
+        self.backends = backends
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.limiter = limiter or asyncio.Semaphore(1 << 30)
+        self.client: Optional[httpx.AsyncClient] = None
+        
+        metrics.LLM_BREAKER_OPEN.set_function(
+            lambda: sum(1 for backend in self.backends if backend.breaker.state != 'closed'))
+    
+    @property
+    def model(self) -> str:
+        return self.backends[0].model
+    
+    def status(self) -> Dict[str, str]:
+        return {backend.name: backend.breaker.state for backend in self.backends}
+    
+    def _pick(self, exclude: Set[Backend]) -> Optional[Backend]:
+        for backend in self.backends:
+            if backend not in exclude and backend.breaker.allow():
+                return backend
+        return None
+    
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: bir vaqtda xato olgan so'rovlar birga qaytmasligi uchun
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+    
+    def _hedge_delay(self, backend: Backend) -> float:
+        p95 = backend.p95()
+        return max(p95, self.hedge_min_delay) if p95 is not None else self.hedge_delay
+    
+    async def complete(self, payload: dict, on_update: Optional[Callable[[str], Awaitable]] = None) -> str:
+        """payload - model siz chat/completions so'rovi; on_update bo'lsa javob oqim bilan olinadi"""
+        try:
+            return await asyncio.wait_for(self._complete(payload, on_update), self.deadline)
+        except asyncio.TimeoutError:
+            metrics.LLM_ATTEMPTS.inc(backend='*', result='deadline')
+            raise OpenRouterError(504, f"{self.deadline:.0f} s ichida javob olinmadi")
+    
+    async def _complete(self, payload: dict, on_update) -> str:
+        tried: Set[Backend] = set()
+        error = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await asyncio.sleep(self._backoff(attempt))
+            
+            backend = self._pick(tried)
+            if backend is None and tried:
+                # Hamma backend lar sinab ko'rildi: boshidan qayta urinish
+                tried.clear()
+                backend = self._pick(tried)
+            if backend is None:
+                metrics.LLM_ATTEMPTS.inc(backend='*', result='circuit_open')
+                raise error or OpenRouterError(503, "Barcha modellar vaqtincha o'chirilgan")
+            
+            if attempt and backend is not self.backends[0]:
+                metrics.LLM_FALLBACKS.inc()
+            tried.add(backend)
+            
+            try:
+                if self.hedge and len(self.backends) > 1:
+                    return await self._hedged(backend, tried, payload, on_update)
+                return await self._call(backend, payload, on_update)
+            except Exception as e:
+                error = e
+                if not is_retryable(e):
+                    raise
+                logger.warning(f"LLM urinish {attempt + 1}/{self.max_attempts} ({backend.name}) muvaffaqiyatsiz: {e}")
+        raise error
+    
+    async def _hedged(self, primary: Backend, tried: Set[Backend], payload: dict, on_update) -> str:
+        tasks: Dict[Backend, asyncio.Task] = {}
+        winner = None
+        progress = asyncio.Event()
+        
+        def launch(backend: Backend):
+            async def relay(text: str):
+                # Foydalanuvchi faqat birinchi token bergan so'rov oqimini ko'radi
+                nonlocal winner
+                if winner is None:
+                    winner = backend
+                    progress.set()
+                    for other, task in tasks.items():
+                        if other is not backend:
+                            task.cancel()
+                if winner is backend:
+                    await on_update(text)
+            
+            task = asyncio.create_task(self._call(backend, payload, relay if on_update else None))
+            task.add_done_callback(lambda _: progress.set())
+            tasks[backend] = task
+        
+        launch(primary)
+        try:
+            try:
+                await asyncio.wait_for(progress.wait(), self._hedge_delay(primary))
+            except asyncio.TimeoutError:
+                secondary = self._pick(tried)
+                if secondary is not None:
+                    metrics.LLM_HEDGES.inc()
+                    tried.add(secondary)
+                    launch(secondary)
+            
+            error = None
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error or OpenRouterError(499, "so'rov bekor qilindi")
+        finally:
+            for task in tasks.values():
+                task.cancel()
+    
+    async def _call(self, backend: Backend, payload: dict, on_update) -> str:
+        payload = {**payload, "model": backend.model}
+        started = time.perf_counter()
+        first_token = None
+        
+        async def observe_first(text: str):
+            nonlocal first_token
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            await on_update(text)
+        
+        try:
+            async with self.limiter:
+                started = time.perf_counter()
+                try:
+                    if on_update is not None:
+                        answer = await self._stream(backend, payload, observe_first)
+                    else:
+                        response = await self.client.post(backend.url, json=payload)
+                        if response.status_code != 200:
+                            raise OpenRouterError(response.status_code, response.text)
+                        answer = response.json()['choices'][0]['message']['content'].strip()
+                finally:
+                    metrics.UPSTREAM_SECONDS.observe(time.perf_counter() - started)
+        except asyncio.CancelledError:
+            backend.breaker.release()
+            metrics.LLM_ATTEMPTS.inc(backend=backend.name, result='cancelled')
+            raise
+        except OpenRouterError as e:
+            metrics.UPSTREAM_REQUESTS.inc(status=e.status_code)
+            self._record_failure(backend, e)
+            raise
+        except httpx.HTTPError as e:
+            metrics.UPSTREAM_REQUESTS.inc(status='connection_error')
+            self._record_failure(backend, e)
+            raise
+        except Exception as e:
+            metrics.UPSTREAM_REQUESTS.inc(status='exception')
+            self._record_failure(backend, e)
+            raise
+        
+        backend.observe(first_token if first_token is not None else time.perf_counter() - started)
+        backend.breaker.record_success()
+        metrics.UPSTREAM_REQUESTS.inc(status=200)
+        metrics.LLM_ATTEMPTS.inc(backend=backend.name, result='ok')
+        return answer
+    
+    def _record_failure(self, backend: Backend, error: Exception):
+        metrics.LLM_ATTEMPTS.inc(backend=backend.name, result='error')
+        if is_retryable(error):
+            was_closed = backend.breaker.state == 'closed'
+            backend.breaker.record_failure()
+            if was_closed and backend.breaker.state == 'open':
+                logger.warning(f"{backend.name} vaqtincha o'chirildi ({backend.breaker.reset_timeout:.0f} s)")
+        else:
+            backend.breaker.release()
+    
+    async def _stream(self, backend: Backend, payload: dict, on_update) -> str:
+        # OpenRouter SSE oqimi: "data: {...}" qatorlari, oxirida "data: [DONE]"
+        parts = []
+        async with self.client.stream('POST', backend.url, json={**payload, "stream": True}) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                raise OpenRouterError(response.status_code, body.decode('utf-8', 'replace'))
+            
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                
+                chunk = json.loads(data)
+                if 'error' in chunk:
+                    raise OpenRouterError(chunk['error'].get('code', 500), chunk['error'].get('message', ''))
+                delta = chunk['choices'][0].get('delta', {}).get('content')
+                if delta:
+                    parts.append(delta)
+                    await on_update(''.join(parts))
+        
+        return ''.join(parts).strip()
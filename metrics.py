@@ -0,0 +1,268 @@
+import time
+import bisect
+import threading
+import contextlib
+from typing import Callable, Dict, Iterable, List, Tuple
+
+class Metric:
+    """Nomli metrika: label qiymatlari bo'yicha alohida qiymatlar"""
+    
+    TYPE = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._function = None
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames) or set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: label lar {self.labelnames} bo'lishi kerak, berildi {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def set_function(self, function: Callable[[], float]):
+        # Qiymat har safar o'qilganda hisoblanadi (masalan, navbat uzunligi)
+        self._function = function
+    
+    def value(self, **labels) -> float:
+        if self._function is not None:
+            return self._function()
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+    
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        if self._function is not None:
+            return {(): self._function()}
+        with self._lock:
+            return dict(self._values)
+    
+    def total(self) -> float:
+        return sum(self.values().values())
+    
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [('', dict(zip(self.labelnames, key)), value) for key, value in sorted(self.values().items())]
+
+class Counter(Metric):
+    TYPE = 'counter'
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    TYPE = 'gauge'
+    
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    """Kechikishlar taqsimoti: chegaralar bo'yicha yig'ma hisoblagichlar"""
+    
+    TYPE = 'histogram'
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [har bir chegara uchun soni (+Inf bilan), yig'indi]
+                state = [[0] * (len(self.buckets) + 1), 0.0]
+                self._values[key] = state
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+    
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return sum(state[0]) if state else 0
+    
+    def quantile(self, q: float, **labels) -> float:
+        """Taxminiy kvantil (chegara ichida chiziqli interpolyatsiya)"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            counts = list(state[0]) if state else []
+        total = sum(counts)
+        if not total:
+            return 0.0
+        
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+    
+    def total(self) -> float:
+        with self._lock:
+            return sum(sum(state[0]) for state in self._values.values())
+    
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1])) for key, state in self._values.items())
+        
+        result = []
+        for key, (counts, total_sum) in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                result.append(('_bucket', {**labels, 'le': _format_value(bound)}, cumulative))
+            result.append(('_sum', labels, total_sum))
+            result.append(('_count', labels, cumulative))
+        return result
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Registry:
+    """Metrikalar ro'yxati va Prometheus matn formatida chiqarish"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, documentation, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} boshqa turdagi metrika sifatida ro'yxatdan o'tgan")
+            return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+    
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+    
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+    
+    def render(self) -> str:
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {name} {metric.TYPE}")
+            for suffix, labels, value in metric.samples():
+                label_text = ','.join(f'{key}="{_escape(str(label))}"' for key, label in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {_format_value(value)}" if label_text
+                             else f"{name}{suffix} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# Savollar
+MESSAGES = REGISTRY.counter(
+    'hasanai_messages_total', "Foydalanuvchi savollari natijasi bo'yicha", ('result',))
+MESSAGE_SECONDS = REGISTRY.histogram(
+    'hasanai_message_seconds', "Savolga javob berish vaqti (local - baza/kesh, llm - OpenRouter)", ('source',))
+LOOKUPS = REGISTRY.counter(
+    'hasanai_lookups_total', "LLM siz javob qidirish natijasi (kb, retrieval, cache, miss)", ('result',))
+
+# OpenRouter
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    'hasanai_openrouter_requests_total', "OpenRouter so'rovlari javob holati bo'yicha", ('status',))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    'hasanai_openrouter_seconds', "OpenRouter so'rovi davomiyligi")
+UPSTREAM_SHARED = REGISTRY.counter(
+    'hasanai_openrouter_shared_total', "Bir xil savol uchun boshqa so'rov natijasini kutib olingan javoblar")
+LLM_ATTEMPTS = REGISTRY.counter(
+    'hasanai_llm_attempts_total', "Model bo'yicha so'rov urinishlari natijasi", ('backend', 'result'))
+LLM_FALLBACKS = REGISTRY.counter(
+    'hasanai_llm_fallbacks_total', "Xatodan keyin zaxira modelga yuborilgan so'rovlar")
+LLM_HEDGES = REGISTRY.counter(
+    'hasanai_llm_hedges_total', "Kechikkan so'rov uchun parallel yuborilgan qo'shimcha so'rovlar")
+LLM_BREAKER_OPEN = REGISTRY.gauge(
+    'hasanai_llm_breaker_open', "Circuit breaker i ochiq (vaqtincha o'chirilgan) modellar soni")
+
+CONTEXT_USERS = REGISTRY.gauge('hasanai_context_users', "Suhbat tarixi saqlanayotgan foydalanuvchilar")
+
+# Maktablar (har birining o'z bilimlar bazasi)
+ACTIVE_TENANTS = REGISTRY.gauge('hasanai_active_tenants', "Indekslari xotirada turgan maktablar")
+TENANT_EVICTIONS = REGISTRY.counter(
+    'hasanai_tenant_evictions_total', "Uzoq ishlatilmagani uchun xotiradan chiqarilgan maktablar")
+
+# Javoblar keshi (qiymatlar AnswerCache dan olinadi)
+CACHE_HITS = REGISTRY.counter('hasanai_cache_hits_total', "Keshdan topilgan javoblar")
+CACHE_MISSES = REGISTRY.counter('hasanai_cache_misses_total', "Keshda topilmagan javoblar")
+CACHE_ENTRIES = REGISTRY.gauge('hasanai_cache_entries', "Keshdagi javoblar soni")
+
+# Reklama
+BROADCASTS = REGISTRY.counter(
+    'hasanai_broadcasts_total', "Admin reklama tasdiqlash natijasi", ('result',))
+BROADCAST_MESSAGES = REGISTRY.counter(
+    'hasanai_broadcast_messages_total', "Reklama xabarlari natija bo'yicha", ('result',))
+BROADCAST_RATE_LIMITED = REGISTRY.counter(
+    'hasanai_broadcast_rate_limited_total', "Reklama paytida Telegram 429 javoblari")
+
+# Ma'lumotlar bazasi
+DB_LOAD_SECONDS = REGISTRY.histogram(
+    'hasanai_db_load_seconds', "JSON faylni o'qish vaqti", ('file',))
+DB_SAVE_SECONDS = REGISTRY.histogram(
+    'hasanai_db_save_seconds', "JSON faylni diskka yozish vaqti", ('file',))
+
+# Navbatlar
+UPDATE_QUEUE = REGISTRY.gauge('hasanai_update_queue', "Navbatdagi Telegram update lar")
+UPDATES_IN_FLIGHT = REGISTRY.gauge(
+    'hasanai_updates_in_flight', "Tugallanmagan (navbatdagi va qayta ishlanayotgan) Telegram update lar")
+ACTIVE_QUESTIONS = REGISTRY.gauge('hasanai_active_questions', "Hozir javob berilayotgan savollar")
+WAITING_QUESTIONS = REGISTRY.gauge('hasanai_waiting_questions', "Navbatda kutayotgan savollar")
+
+async def start_metrics_server(host: str, port: int, registry: Registry = REGISTRY):
+    """Lokal /metrics HTTP endpoint (aiohttp.web.AppRunner qaytaradi)"""
+    # aiohttp faqat METRICS_PORT yoqilganda yuklanadi
+    from aiohttp import web
+    
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(body=registry.render().encode('utf-8'), headers={
+            'Content-Type': 'text/plain; version=0.0.4; charset=utf-8',
+            'Cache-Control': 'no-cache'
+        })
+    
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
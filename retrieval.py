@@ -0,0 +1,185 @@
+import math
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from knowledge import normalize_text
+
+class RetrievalIndex:
+    """Savollar bo'yicha belgi n-gramm TF-IDF indeksi.
+    
+    Yangi juftliklar qo'shilganda faqat ularning n-grammlari hisoblanadi,
+    og'irliklangan matritsa esa `commit` da (fon oqimida) qayta hisoblanadi.
+    Yangisi tayyor bo'lguncha qidiruv oldingi matritsadan foydalanadi.
+    """
+    
+    def __init__(self, qa_pairs: Dict[str, str] = None, ngram_range: Tuple[int, int] = (3, 5)):
+        self.ngram_range = ngram_range
+        self.questions = []
+        self.answers = []
+        self._positions = {}
+        self._vocabulary = {}
+        self._df = np.zeros(0, dtype=np.float64)
+        self._counts = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self._pending = []
+        # (matritsa, IDF, ustunlar soni, savollar soni) - commit da birdaniga almashtiriladi
+        self._state = None
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        
+        for question, answer in (qa_pairs or {}).items():
+            self.add(question, answer)
+        if self.questions:
+            self.commit()
+    
+    def __len__(self) -> int:
+        return len(self.questions)
+    
+    @property
+    def pending(self) -> bool:
+        """Qidiruvga hali kirmagan juftliklar bor"""
+        return bool(self._pending)
+    
+    def _ngrams(self, text: str) -> Dict[str, int]:
+        low, high = self.ngram_range
+        grams = {}
+        for word in normalize_text(text).split():
+            word = f" {word} "
+            for n in range(low, high + 1):
+                for i in range(max(len(word) - n + 1, 1)):
+                    gram = word[i:i + n]
+                    grams[gram] = grams.get(gram, 0) + 1
+        return grams
+    
+    def add(self, question: str, answer: str):
+        key = normalize_text(question)
+        if not key:
+            return
+        
+        # Savol allaqachon bor bo'lsa, faqat javob yangilanadi
+        if key in self._positions:
+            position = self._positions[key]
+            self.questions[position] = question
+            self.answers[position] = answer
+            return
+        
+        grams = self._ngrams(question)
+        with self._lock:
+            columns = []
+            for gram, count in grams.items():
+                column = self._vocabulary.get(gram)
+                if column is None:
+                    column = len(self._vocabulary)
+                    self._vocabulary[gram] = column
+                columns.append((column, count))
+            
+            self._positions[key] = len(self.questions)
+            self.questions.append(question)
+            self.answers.append(answer)
+            self._pending.append(columns)
+    
+    def commit(self):
+        """Qo'shilgan juftliklarni qidiruvga kiritish (to'liq qayta hisoblash, fon oqimida)"""
+        with self._commit_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+                vocabulary_size = len(self._vocabulary)
+            if pending or self._state is None:
+                self._state = self._weigh(pending, vocabulary_size)
+    
+    def _weigh(self, pending: list, vocabulary_size: int) -> tuple:
+        if pending:
+            indptr = [0]
+            indices = []
+            data = []
+            for columns in pending:
+                for column, count in columns:
+                    indices.append(column)
+                    data.append(count)
+                indptr.append(len(indices))
+            new_rows = sparse.csr_matrix(
+                (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int64), indptr),
+                shape=(len(pending), vocabulary_size)
+            )
+            
+            counts = self._counts
+            counts.resize((counts.shape[0], vocabulary_size))
+            self._counts = sparse.vstack([counts, new_rows], format='csr')
+            
+            df = np.zeros(vocabulary_size, dtype=np.float64)
+            df[:len(self._df)] = self._df
+            df += np.bincount(new_rows.indices, minlength=vocabulary_size)
+            self._df = df
+        
+        # Sublinear TF, silliqlangan IDF va L2 normallashtirish
+        documents = self._counts.shape[0]
+        idf = np.log((1.0 + documents) / (1.0 + self._df)) + 1.0
+        matrix = self._counts.copy()
+        matrix.data = 1.0 + np.log(matrix.data)
+        matrix = matrix.multiply(idf).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        # Teskari indeks ko'rinishi: qidiruv faqat so'rov n-grammlari ustunlarini o'qiydi
+        matrix = sparse.diags(1.0 / norms).dot(matrix).T.tocsr()
+        return matrix, idf, self._counts.shape[1], documents
+    
+    def _vectorize(self, texts: List[str], idf: np.ndarray, vocabulary_size: int,
+                   documents: int) -> sparse.csr_matrix:
+        indptr = [0]
+        indices = []
+        data = []
+        # Bazada uchramagan n-grammlar matritsada ustun sifatida yo'q, lekin so'rov
+        # normasiga kiradi (df=0 dagi IDF bilan): aks holda savolga begona so'zlar
+        # qo'shilgan so'rov ham saqlangan savol bilan ~1.0 o'xshash chiqadi
+        # (commit dan keyin qo'shilgan n-grammlar ham shu yerda hisoblanadi)
+        unseen_idf = math.log(1.0 + documents) + 1.0
+        unseen = []
+        for text in texts:
+            missing = 0.0
+            for gram, count in self._ngrams(text).items():
+                weight = 1.0 + math.log(count)
+                column = self._vocabulary.get(gram)
+                if column is not None and column < vocabulary_size:
+                    indices.append(column)
+                    data.append(weight * idf[column])
+                else:
+                    missing += (weight * unseen_idf) ** 2
+            unseen.append(missing)
+            indptr.append(len(indices))
+        
+        vectors = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int64), indptr),
+            shape=(len(texts), vocabulary_size)
+        )
+        norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel() + np.asarray(unseen))
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(vectors).tocsr()
+    
+    def search_batch(self, texts: List[str], top_k: int = 3) -> List[List[Tuple[float, str, str]]]:
+        """Bir nechta matn uchun eng o'xshash savollar (kosinus o'xshashligi)"""
+        if not self.questions or not texts:
+            return [[] for _ in texts]
+        
+        # Bo'sh bazaga birinchi juftliklar qo'shilganda kutadigan eski matritsa yo'q
+        if self._state is None or not self._state[3]:
+            self.commit()
+        
+        matrix, idf, vocabulary_size, documents = self._state
+        scores = self._vectorize(texts, idf, vocabulary_size, documents).dot(matrix).toarray()
+        top_k = min(top_k, documents)
+        
+        results = []
+        for row in range(scores.shape[0]):
+            row_scores = scores[row]
+            top = np.argpartition(-row_scores, top_k - 1)[:top_k]
+            top = top[np.argsort(-row_scores[top])]
+            results.append([
+                (float(row_scores[i]), self.questions[i], self.answers[i])
+                for i in top if row_scores[i] > 0
+            ])
+        return results
+    
+    def search(self, text: str, top_k: int = 3) -> List[Tuple[float, str, str]]:
+        return self.search_batch([text], top_k)[0]
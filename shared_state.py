@@ -0,0 +1,198 @@
+import os
+import time
+import socket
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+# Qulf egasi: bir nechta jarayon va server orasida noyob
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+class SharedState:
+    """Bot jarayonlari orasida umumiy holat: qiymatlar, javoblar keshi va qulflar.
+    
+    Vaqtlar time.time() bo'yicha (jarayonlar orasida bir xil soat).
+    """
+    
+    def get_value(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+    
+    def set_value(self, key: str, value: str, ttl: Optional[float] = None):
+        raise NotImplementedError
+    
+    def delete(self, key: str):
+        raise NotImplementedError
+    
+    def cache_get(self, key: str) -> Optional[Tuple[float, str]]:
+        """(tugash vaqti, javob) yoki None"""
+        raise NotImplementedError
+    
+    def cache_set(self, key: str, answer: str, ttl: float):
+        raise NotImplementedError
+    
+    def acquire_lock(self, name: str, owner: str = WORKER_ID, ttl: float = 60) -> bool:
+        """Qulfni olish yoki egasi o'zi bo'lsa muddatini uzaytirish"""
+        raise NotImplementedError
+    
+    def release_lock(self, name: str, owner: str = WORKER_ID):
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+class LocalState(SharedState):
+    """Bitta jarayon uchun (standart): hamma narsa xotirada"""
+    
+    def __init__(self):
+        self._values: Dict[str, Tuple[Optional[float], str]] = {}
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def get_value(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.time():
+                del self._values[key]
+                return None
+            return entry[1]
+    
+    def set_value(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._lock:
+            self._values[key] = (time.time() + ttl if ttl else None, value)
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._values.pop(key, None)
+    
+    def cache_get(self, key: str) -> Optional[Tuple[float, str]]:
+        # Jarayon ichidagi AnswerCache ning o'zi yetarli
+        return None
+    
+    def cache_set(self, key: str, answer: str, ttl: float):
+        pass
+    
+    def acquire_lock(self, name: str, owner: str = WORKER_ID, ttl: float = 60) -> bool:
+        now = time.time()
+        with self._lock:
+            holder = self._locks.get(name)
+            if holder is not None and holder[1] > now and holder[0] != owner:
+                return False
+            self._locks[name] = (owner, now + ttl)
+            return True
+    
+    def release_lock(self, name: str, owner: str = WORKER_ID):
+        with self._lock:
+            if self._locks.get(name, (None,))[0] == owner:
+                del self._locks[name]
+
+class SQLiteState(SharedState):
+    """Bitta serverdagi bir nechta jarayon uchun: umumiy SQLite fayli (WAL).
+    
+    SQLite fayl qulfi jarayonlar orasidagi tranzaksiyalarni tartiblaydi;
+    har bir amal bitta atomik so'rov. Boshqa serverlar uchun xuddi shu
+    interfeysni tarmoq ombori (masalan, Redis) bilan amalga oshirish mumkin.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS kv (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires REAL
+        );
+        
+        CREATE TABLE IF NOT EXISTS answer_cache (
+            key TEXT PRIMARY KEY,
+            answer TEXT NOT NULL,
+            expires REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_answer_cache_expires ON answer_cache(expires);
+        
+        CREATE TABLE IF NOT EXISTS locks (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires REAL NOT NULL
+        );
+    """
+    
+    # Qulf bo'sh, muddati o'tgan yoki egasi shu jarayon bo'lsagina yoziladi
+    ACQUIRE_LOCK = """
+        INSERT INTO locks (name, owner, expires) VALUES (?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+        WHERE locks.expires <= ? OR locks.owner = excluded.owner
+    """
+    
+    # Har shuncha yozuvdan keyin eskirgan kesh tozalanadi
+    PRUNE_EVERY = 200
+    
+    def __init__(self, path: str, cache_max_size: int = 20000):
+        self.path = path
+        self.cache_max_size = cache_max_size
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(self.SCHEMA)
+        self._cache_writes = 0
+    
+    def get_value(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+    
+    def set_value(self, key: str, value: str, ttl: Optional[float] = None):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)",
+                               (key, value, time.time() + ttl if ttl else None))
+    
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+    
+    def cache_get(self, key: str) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires, answer FROM answer_cache WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        return tuple(row) if row else None
+    
+    def cache_set(self, key: str, answer: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO answer_cache (key, answer, expires) VALUES (?, ?, ?)",
+                               (key, answer, now + ttl))
+            self._cache_writes += 1
+            if self._cache_writes % self.PRUNE_EVERY == 0:
+                self._prune_cache(now)
+    
+    def _prune_cache(self, now: float):
+        self._conn.execute("DELETE FROM answer_cache WHERE expires <= ?", (now,))
+        # Hajm chegarasidan oshganlari: eng tez eskiradiganlari o'chiriladi
+        self._conn.execute(
+            "DELETE FROM answer_cache WHERE key IN "
+            "(SELECT key FROM answer_cache ORDER BY expires DESC LIMIT -1 OFFSET ?)", (self.cache_max_size,)
+        )
+    
+    def acquire_lock(self, name: str, owner: str = WORKER_ID, ttl: float = 60) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(self.ACQUIRE_LOCK, (name, owner, now + ttl, now))
+            return cursor.rowcount == 1
+    
+    def release_lock(self, name: str, owner: str = WORKER_ID):
+        with self._lock:
+            self._conn.execute("DELETE FROM locks WHERE name = ? AND owner = ?", (name, owner))
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def create_shared_state(kind: str, path: str, cache_max_size: int) -> SharedState:
+    if kind == 'sqlite':
+        return SQLiteState(path, cache_max_size)
+    return LocalState()
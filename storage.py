@@ -0,0 +1,986 @@
+import json
+import os
+import time
+import bisect
+import itertools
+import queue
+import sqlite3
+import tempfile
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+from activity import ActivityTracker
+from metrics import DB_LOAD_SECONDS, DB_SAVE_SECONDS
+
+# Chatga maktab biriktirilmagan bo'lsa ishlatiladigan (eski yagona) bilimlar bazasi
+DEFAULT_TENANT = 'default'
+
+logger = logging.getLogger(__name__)
+
+def atomic_write(path: str, text: str):
+    """Atomik yozish: vaqtinchalik faylga yozib, keyin almashtirish"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _dumps(data: Dict[str, Any], chunk: int = 1000) -> str:
+    """json.dumps ni bo'laklab bajarish.
+    
+    json.dumps butun chaqiruv davomida GIL ni ushlab turadi, shuning uchun katta
+    lug'at (100k foydalanuvchi) fon oqimida ham event loop ni to'xtatib qo'yadi.
+    Bo'laklar orasida boshqa oqimlar ishlashga ulguradi.
+    """
+    items = iter(data.items())
+    parts = []
+    while True:
+        part = dict(itertools.islice(items, chunk))
+        if not part:
+            return '{' + ','.join(parts) + '}'
+        parts.append(json.dumps(part, ensure_ascii=False)[1:-1])
+
+def _user_matches(user_id, data: Dict[str, Any], query: str) -> bool:
+    # query oldindan casefold qilingan bo'lishi kerak
+    return (query == str(user_id) or query in (data.get('username') or '').casefold()
+            or query in (data.get('first_name') or '').casefold())
+
+class StorageBackend:
+    """Ma'lumotlarni saqlash uchun umumiy interfeys"""
+    
+    # Diskka yozishlar soni (fayl yozish yoki SQLite tranzaksiyasi)
+    writes = 0
+    
+    def update_user(self, user_id: int, username: str, first_name: str):
+        raise NotImplementedError
+    
+    def increment_questions(self, user_id: int):
+        raise NotImplementedError
+    
+    def get_users(self) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    def count_users(self) -> int:
+        raise NotImplementedError
+    
+    def get_users_page(self, cursor: int, limit: int, query: str = '',
+                       backward: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+        """user_id bo'yicha sahifa: cursor dan keyingi (backward - oldingi) foydalanuvchilar"""
+        raise NotImplementedError
+    
+    def mark_blocked(self, user_id: int):
+        raise NotImplementedError
+    
+    def get_broadcast_recipients(self) -> List[int]:
+        raise NotImplementedError
+    
+    def get_stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+    
+    def get_activity_history(self, days: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+    
+    def add_knowledge(self, question: str, answer: str, tenant: str = DEFAULT_TENANT):
+        raise NotImplementedError
+    
+    def add_knowledge_bulk(self, qa_pairs: Dict[str, str], tenant: str = DEFAULT_TENANT) -> int:
+        """Ko'p juftlikni bitta yozuvda qo'shish; yangi savollar sonini qaytaradi"""
+        raise NotImplementedError
+    
+    def get_knowledge_base(self, tenant: str = DEFAULT_TENANT) -> Dict[str, Any]:
+        """Bilimlar bazasi nusxasi: fon oqimida o'qish mumkin (keyingi o'zgarishlar unga tegmaydi)"""
+        raise NotImplementedError
+    
+    def count_knowledge(self, tenant: str = DEFAULT_TENANT) -> int:
+        raise NotImplementedError
+    
+    def get_knowledge_page(self, offset: int, limit: int, query: str = '',
+                           tenant: str = DEFAULT_TENANT) -> List[Tuple[str, str]]:
+        raise NotImplementedError
+    
+    def get_kb_version(self, tenant: str = DEFAULT_TENANT) -> int:
+        raise NotImplementedError
+    
+    def release_knowledge(self, tenant: str):
+        """Faol bo'lmagan maktab bilimlarini xotiradan chiqarish (kerak bo'lsa qayta o'qiladi)"""
+        pass
+    
+    def get_tenant(self, tenant: str) -> Optional[Dict[str, str]]:
+        """{'name': ..., 'prompt': ...} yoki None (bunday maktab yo'q)"""
+        raise NotImplementedError
+    
+    def save_tenant(self, tenant: str, name: str, prompt: str = ''):
+        raise NotImplementedError
+    
+    def list_tenants(self) -> List[Tuple[str, Dict[str, str]]]:
+        raise NotImplementedError
+    
+    def get_chat_tenant(self, chat_id: int) -> Optional[str]:
+        raise NotImplementedError
+    
+    def set_chat_tenant(self, chat_id: int, tenant: str):
+        raise NotImplementedError
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.flush()
+
+class JsonBackend(StorageBackend):
+    FILES = ('users.json', 'stats.json', 'knowledge_base.json', 'activity.json', 'tenants.json')
+    # Boshqa maktablar bazasi alohida fayllarda, birinchi so'rovda yuklanadi
+    TENANT_DIR = 'knowledge'
+    
+    def __init__(self, data_dir: str, flush_interval: float, flush_every: int):
+        self.data_dir = data_dir
+        
+        # Ma'lumotlar bir marta yuklanadi va xotirada saqlanadi,
+        # diskka esa har N soniyada yoki M o'zgarishda yoziladi
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        os.makedirs(os.path.join(data_dir, self.TENANT_DIR), exist_ok=True)
+        self._data = {filename: self.load_json(filename) for filename in self.FILES}
+        self._dirty = set()
+        # Sahifalash uchun tartiblangan user_id lar (birinchi so'rovda quriladi)
+        self._user_ids = None
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        # Xotiradan chiqarilgan, lekin hali diskka yozilmagan maktab fayllari
+        self._released = set()
+        
+        # Kunlik faollik; birinchi marta mavjud foydalanuvchilardan tiklanadi
+        if self._data['activity.json']:
+            self.activity = ActivityTracker.from_dict(self._data['activity.json'])
+        else:
+            self.activity = ActivityTracker()
+            users = self._data['users.json']
+            if users:
+                self.activity.seed((user_id, data.get('last_active'), data.get('join_date'))
+                                   for user_id, data in users.items())
+                self._dirty.add('activity.json')
+        
+        # Diskka fon oqimi yozadi: o'zgartirishlar faqat belgilanadi va oqim uyg'otiladi,
+        # shuning uchun event loop dagi chaqiruvlar JSON yozilishini kutmaydi
+        self._flush_wanted = threading.Event()
+        self._closed = False
+        self._flusher = threading.Thread(target=self._flush_worker, name='json-flush', daemon=True)
+        self._flusher.start()
+    
+    def _get_file_path(self, filename: str) -> str:
+        return os.path.join(self.data_dir, filename)
+    
+    def _knowledge_file(self, tenant: str) -> str:
+        if tenant == DEFAULT_TENANT:
+            return 'knowledge_base.json'
+        return f"{self.TENANT_DIR}/{tenant}.json"
+    
+    def _knowledge(self, tenant: str) -> Dict[str, Any]:
+        # self._lock ichida chaqiriladi
+        filename = self._knowledge_file(tenant)
+        if filename not in self._data:
+            self._data[filename] = self.load_json(filename)
+        return self._data[filename]
+    
+    def load_json(self, filename: str) -> Dict[str, Any]:
+        file_path = self._get_file_path(filename)
+        try:
+            with DB_LOAD_SECONDS.time(file=filename), open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+    
+    def save_json(self, filename: str, data: Dict[str, Any]):
+        self._write_file(filename, json.dumps(data, ensure_ascii=False))
+    
+    def _write_file(self, filename: str, text: str):
+        with DB_SAVE_SECONDS.time(file=filename):
+            atomic_write(self._get_file_path(filename), text)
+        self.writes += 1
+    
+    def _mark_dirty(self, *filenames: str):
+        # self._lock ichida chaqiriladi; yozish vaqti kelgan bo'lsa fon oqimi uyg'otiladi
+        self._dirty.update(filenames)
+        self._pending += 1
+        if (self._pending >= self.flush_every or
+                time.monotonic() - self._last_flush >= self.flush_interval):
+            self._flush_wanted.set()
+    
+    def _flush_worker(self):
+        while not self._closed:
+            self._flush_wanted.wait(self.flush_interval)
+            self._flush_wanted.clear()
+            if self._closed:
+                break
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error(f"Ma'lumotlarni diskka yozishda xatolik: {e}")
+    
+    def _snapshot(self, filename: str) -> Dict[str, Any]:
+        # self._lock ichida chaqiriladi. Foydalanuvchi yozuvlari joyida o'zgartirilmaydi
+        # (yangisi bilan almashtiriladi), shuning uchun tashqi lug'at nusxasi yetarli;
+        # qolgan fayllarda ichki lug'atlar (qa_pairs, chats, ...) ham nusxalanadi
+        data = self._data[filename]
+        if filename == 'users.json':
+            return dict(data)
+        return {key: dict(value) if isinstance(value, dict) else value for key, value in data.items()}
+    
+    def flush(self):
+        """O'zgargan fayllarni diskka yozish"""
+        with self._flush_lock:
+            # Qulf ostida faqat arzon nusxa olinadi, JSON ga aylantirish undan tashqarida
+            with self._lock:
+                if not self._dirty:
+                    self._last_flush = time.monotonic()
+                    self._drop_released()
+                    return
+                if 'activity.json' in self._dirty:
+                    self._data['activity.json'] = self.activity.to_dict()
+                snapshot = {filename: self._snapshot(filename) for filename in self._dirty}
+                self._dirty.clear()
+                self._pending = 0
+                self._last_flush = time.monotonic()
+            
+            for filename, data in snapshot.items():
+                try:
+                    self._write_file(filename, _dumps(data))
+                except OSError:
+                    with self._lock:
+                        self._dirty.add(filename)
+                    raise
+            
+            with self._lock:
+                self._drop_released()
+    
+    def _drop_released(self):
+        # self._lock ichida: diskka yozib bo'lingan chiqarilgan maktablar
+        released = self._released - self._dirty
+        for filename in released:
+            self._data.pop(filename, None)
+        self._released -= released
+    
+    def close(self):
+        self._closed = True
+        self._flush_wanted.set()
+        self._flusher.join()
+        self.flush()
+    
+    def update_user(self, user_id: int, username: str, first_name: str):
+        with self._lock:
+            users = self._data['users.json']
+            now = datetime.now().isoformat()
+            
+            activity_changed = self.activity.record_active(user_id)
+            if str(user_id) not in users:
+                users[str(user_id)] = {
+                    'username': username,
+                    'first_name': first_name,
+                    'join_date': now,
+                    'questions_asked': 0,
+                    'last_active': now
+                }
+                if self._user_ids is not None:
+                    bisect.insort(self._user_ids, int(user_id))
+                self.activity.record_new_user()
+                activity_changed = True
+            else:
+                # Yozuv nusxasi almashtiriladi: flush dagi nusxa fon oqimida o'qiladi
+                user = dict(users[str(user_id)], username=username, first_name=first_name, last_active=now)
+                # Botga qayta yozgan foydalanuvchi endi bloklamagan
+                user.pop('blocked', None)
+                users[str(user_id)] = user
+            
+            if activity_changed:
+                self._mark_dirty('users.json', 'activity.json')
+            else:
+                self._mark_dirty('users.json')
+    
+    def increment_questions(self, user_id: int):
+        with self._lock:
+            users = self._data['users.json']
+            stats = self._data['stats.json']
+            
+            user = users.get(str(user_id))
+            if user is not None:
+                users[str(user_id)] = dict(user, questions_asked=user.get('questions_asked', 0) + 1)
+            
+            stats['total_questions'] = stats.get('total_questions', 0) + 1
+            stats['last_question_time'] = datetime.now().isoformat()
+            self.activity.record_question()
+            
+            self._mark_dirty('users.json', 'stats.json', 'activity.json')
+    
+    def get_users(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._data['users.json'])
+    
+    def count_users(self) -> int:
+        return len(self._data['users.json'])
+    
+    def get_users_page(self, cursor: int, limit: int, query: str = '',
+                       backward: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+        query = query.casefold()
+        with self._lock:
+            users = self._data['users.json']
+            if self._user_ids is None:
+                self._user_ids = sorted(int(user_id) for user_id in users)
+            ids = self._user_ids
+            
+            if backward:
+                positions = range(bisect.bisect_left(ids, cursor) - 1, -1, -1)
+            else:
+                positions = range(bisect.bisect_right(ids, cursor), len(ids))
+            
+            page = []
+            for position in positions:
+                user_id = ids[position]
+                data = users[str(user_id)]
+                if not query or _user_matches(user_id, data, query):
+                    page.append((user_id, dict(data)))
+                    if len(page) == limit:
+                        break
+        
+        if backward:
+            page.reverse()
+        return page
+    
+    def mark_blocked(self, user_id: int):
+        with self._lock:
+            user = self._data['users.json'].get(str(user_id))
+            if user is None or user.get('blocked'):
+                return
+            self._data['users.json'][str(user_id)] = dict(user, blocked=True)
+            self._mark_dirty('users.json')
+    
+    def get_broadcast_recipients(self) -> List[int]:
+        with self._lock:
+            return [int(user_id) for user_id, data in self._data['users.json'].items()
+                    if not data.get('blocked')]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        # Faollik oldindan hisoblangan, foydalanuvchilar qayta ko'rib chiqilmaydi
+        with self._lock:
+            return {
+                'total_users': len(self._data['users.json']),
+                'total_questions': self._data['stats.json'].get('total_questions', 0),
+                **self.activity.summary()
+            }
+    
+    def get_activity_history(self, days: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self.activity.history(days)
+    
+    def add_knowledge(self, question: str, answer: str, tenant: str = DEFAULT_TENANT):
+        with self._lock:
+            knowledge_base = self._knowledge(tenant)
+            if 'qa_pairs' not in knowledge_base:
+                knowledge_base['qa_pairs'] = {}
+            
+            knowledge_base['qa_pairs'][question.strip()] = answer.strip()
+            knowledge_base['version'] = knowledge_base.get('version', 0) + 1
+            self._mark_dirty(self._knowledge_file(tenant))
+            # Ma'lumot qo'shish kam uchraydi, shuning uchun darhol yoziladi
+            self._flush_wanted.set()
+    
+    def add_knowledge_bulk(self, qa_pairs: Dict[str, str], tenant: str = DEFAULT_TENANT) -> int:
+        with self._lock:
+            knowledge_base = self._knowledge(tenant)
+            existing = knowledge_base.setdefault('qa_pairs', {})
+            added = sum(1 for question in qa_pairs if question not in existing)
+            existing.update(qa_pairs)
+            knowledge_base['version'] = knowledge_base.get('version', 0) + 1
+            self._mark_dirty(self._knowledge_file(tenant))
+        
+        self.flush()
+        return added
+    
+    def get_knowledge_base(self, tenant: str = DEFAULT_TENANT) -> Dict[str, Any]:
+        # Indekslar fon oqimida quriladi, /add_info esa shu paytda bazani o'zgartiradi
+        with self._lock:
+            self._knowledge(tenant)
+            return self._snapshot(self._knowledge_file(tenant))
+    
+    def count_knowledge(self, tenant: str = DEFAULT_TENANT) -> int:
+        with self._lock:
+            return len(self._knowledge(tenant).get('qa_pairs', {}))
+    
+    def get_knowledge_page(self, offset: int, limit: int, query: str = '',
+                           tenant: str = DEFAULT_TENANT) -> List[Tuple[str, str]]:
+        query = query.casefold()
+        with self._lock:
+            items = self._knowledge(tenant).get('qa_pairs', {}).items()
+            if query:
+                items = ((question, answer) for question, answer in items
+                         if query in question.casefold() or query in answer.casefold())
+            return list(itertools.islice(items, offset, offset + limit))
+    
+    def get_kb_version(self, tenant: str = DEFAULT_TENANT) -> int:
+        with self._lock:
+            return self._knowledge(tenant).get('version', 0)
+    
+    def release_knowledge(self, tenant: str):
+        filename = self._knowledge_file(tenant)
+        if tenant == DEFAULT_TENANT:
+            return
+        with self._lock:
+            if filename not in self._dirty:
+                self._data.pop(filename, None)
+            else:
+                # Hali yozilmagan o'zgarishlar fon oqimi yozgandan keyin chiqariladi
+                self._released.add(filename)
+                self._flush_wanted.set()
+    
+    def get_tenant(self, tenant: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            info = self._data['tenants.json'].get('tenants', {}).get(tenant)
+            return dict(info) if info is not None else None
+    
+    def save_tenant(self, tenant: str, name: str, prompt: str = ''):
+        with self._lock:
+            self._data['tenants.json'].setdefault('tenants', {})[tenant] = {'name': name, 'prompt': prompt}
+            self._mark_dirty('tenants.json')
+            self._flush_wanted.set()
+    
+    def list_tenants(self) -> List[Tuple[str, Dict[str, str]]]:
+        with self._lock:
+            tenants = self._data['tenants.json'].get('tenants', {})
+            return sorted((tenant, dict(info)) for tenant, info in tenants.items())
+    
+    def get_chat_tenant(self, chat_id: int) -> Optional[str]:
+        return self._data['tenants.json'].get('chats', {}).get(str(chat_id))
+    
+    def set_chat_tenant(self, chat_id: int, tenant: str):
+        with self._lock:
+            chats = self._data['tenants.json'].setdefault('chats', {})
+            if tenant == DEFAULT_TENANT:
+                chats.pop(str(chat_id), None)
+            else:
+                chats[str(chat_id)] = tenant
+            self._mark_dirty('tenants.json')
+
+class SQLiteBackend(StorageBackend):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            first_name TEXT,
+            join_date TEXT NOT NULL,
+            questions_asked INTEGER NOT NULL DEFAULT 0,
+            last_active TEXT NOT NULL,
+            blocked INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_users_last_active ON users(last_active);
+        
+        CREATE TABLE IF NOT EXISTS knowledge (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tenant TEXT NOT NULL DEFAULT 'default',
+            question TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            UNIQUE (tenant, question)
+        );
+        
+        CREATE TABLE IF NOT EXISTS tenants (
+            tenant TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            prompt TEXT NOT NULL DEFAULT ''
+        );
+        
+        CREATE TABLE IF NOT EXISTS chat_tenants (
+            chat_id INTEGER PRIMARY KEY,
+            tenant TEXT NOT NULL
+        );
+        
+        CREATE TABLE IF NOT EXISTS stats (
+            key TEXT PRIMARY KEY,
+            value
+        );
+        
+        CREATE TABLE IF NOT EXISTS activity (
+            day TEXT PRIMARY KEY,
+            hll BLOB NOT NULL,
+            questions INTEGER NOT NULL DEFAULT 0,
+            new_users INTEGER NOT NULL DEFAULT 0
+        );
+    """
+    
+    # So'rovlar o'zgarmas matn bo'lgani uchun sqlite3 ularni tayyorlangan holda keshlaydi
+    UPSERT_USER = """
+        INSERT INTO users (user_id, username, first_name, join_date, questions_asked, last_active)
+        VALUES (?, ?, ?, ?, 0, ?)
+        ON CONFLICT(user_id) DO UPDATE SET
+            username = excluded.username,
+            first_name = excluded.first_name,
+            last_active = excluded.last_active,
+            blocked = 0
+    """
+    INCREMENT_USER_QUESTIONS = "UPDATE users SET questions_asked = questions_asked + 1 WHERE user_id = ?"
+    # Foydalanuvchilar soni yangi foydalanuvchi qo'shilgan tranzaksiyaning o'zida yangilanadi
+    # (statistika uchun COUNT(*) butun jadvalni o'qiydi)
+    INCREMENT_USER_COUNT = "UPDATE stats SET value = value + 1 WHERE key = 'total_users'"
+    SEED_USER_COUNT = "INSERT OR IGNORE INTO stats (key, value) SELECT 'total_users', COUNT(*) FROM users"
+    INCREMENT_STAT = """
+        INSERT INTO stats (key, value) VALUES (?, 1)
+        ON CONFLICT(key) DO UPDATE SET value = value + 1
+    """
+    SET_STAT = """
+        INSERT INTO stats (key, value) VALUES (?, ?)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value
+    """
+    UPSERT_KNOWLEDGE = """
+        INSERT INTO knowledge (tenant, question, answer) VALUES (?, ?, ?)
+        ON CONFLICT(tenant, question) DO UPDATE SET answer = excluded.answer
+    """
+    UPSERT_ACTIVITY = "INSERT OR REPLACE INTO activity (day, hll, questions, new_users) VALUES (?, ?, ?, ?)"
+    # Bir nechta jarayon bir kunni birga yangilaydi: hisoblagichlar qo'shiladi,
+    # HLL esa yozishdan oldin bazadagisi bilan birlashtiriladi
+    MERGE_ACTIVITY_USER = """
+        INSERT INTO activity (day, hll, questions, new_users) VALUES (?, ?, 0, ?)
+        ON CONFLICT(day) DO UPDATE SET hll = excluded.hll, new_users = new_users + excluded.new_users
+    """
+    INCREMENT_ACTIVITY_QUESTIONS = """
+        INSERT INTO activity (day, hll, questions, new_users) VALUES (?, ?, 1, 0)
+        ON CONFLICT(day) DO UPDATE SET questions = questions + 1
+    """
+    
+    def __init__(self, db_path: str, data_dir: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Xotiradagi faollik uchun alohida qulf: yozuvchi oqim uni tranzaksiya ichida oladi,
+        # shuning uchun bu qulf ostida SQLite qulfini kutadigan so'rov bajarilmaydi
+        self._activity_lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.executescript(self.SCHEMA)
+        self._migrate_schema()
+        
+        if self._get_stat('json_migrated') is None:
+            self.migrate_from_json(data_dir)
+        # Hisoblagichdan oldingi bazalarda bir marta sanaladi
+        self._conn.execute(self.SEED_USER_COUNT)
+        # Faqat so'ralgan maktablar versiyasi saqlanadi
+        self._kb_versions: Dict[str, int] = {}
+        # Boshqa ulanishlar (jarayonlar) yozganda o'zgaradi
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        self._load_activity()
+        
+        # Har bir xabardagi yozuvlar (faollik, savollar soni, bloklanganlar) navbatga qo'yiladi va
+        # alohida ulanish orqali fon oqimida yoziladi: boshqa jarayon yozayotganda busy_timeout
+        # kutishi event loop ni to'xtatmaydi, o'qishlar esa (WAL) yozuvchini kutmaydi
+        self._write_conn = self._connect()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_worker, name='sqlite-writer', daemon=True)
+        self._writer.start()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+    
+    def _write_worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                method, args = item
+                method(*args)
+            except sqlite3.Error as e:
+                logger.error(f"Bazaga yozishda xatolik: {e}")
+            finally:
+                self._queue.task_done()
+    
+    def _load_activity(self):
+        self.activity = ActivityTracker()
+        if self._get_stat('activity_seeded') is None:
+            # Birinchi marta: mavjud foydalanuvchilarning oxirgi faolligidan tiklash
+            self.activity.seed(self._conn.execute("SELECT user_id, last_active, join_date FROM users"))
+            with self._lock:
+                self._conn.execute("BEGIN")
+                try:
+                    self._conn.executemany(self.UPSERT_ACTIVITY, self.activity.rows())
+                    self._conn.execute(self.SET_STAT, ('activity_seeded', datetime.now().isoformat()))
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        else:
+            self.activity.load_rows(self._conn.execute(
+                "SELECT day, hll, questions, new_users FROM activity ORDER BY day"
+            ))
+    
+    def _migrate_schema(self):
+        # Avvalgi versiyada yaratilgan bazalarga yangi ustunlarni qo'shish
+        if 'blocked' not in self._table_columns('users'):
+            self._conn.execute("ALTER TABLE users ADD COLUMN blocked INTEGER NOT NULL DEFAULT 0")
+        
+        if 'tenant' not in self._table_columns('knowledge'):
+            self._add_knowledge_tenant()
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_knowledge_tenant ON knowledge(tenant, id)")
+    
+    def _table_columns(self, table: str) -> set:
+        return {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+    
+    def _add_knowledge_tenant(self):
+        # UNIQUE(question) ni o'zgartirib bo'lmaydi: jadval qayta yaratiladi (id lar saqlanadi)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Boshqa jarayon ulgurgan bo'lishi mumkin
+            if 'tenant' not in self._table_columns('knowledge'):
+                self._conn.execute("ALTER TABLE knowledge RENAME TO knowledge_old")
+                self._conn.execute("""
+                    CREATE TABLE knowledge (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        tenant TEXT NOT NULL DEFAULT 'default',
+                        question TEXT NOT NULL,
+                        answer TEXT NOT NULL,
+                        UNIQUE (tenant, question)
+                    )
+                """)
+                self._conn.execute(
+                    "INSERT INTO knowledge (id, question, answer) SELECT id, question, answer FROM knowledge_old"
+                )
+                self._conn.execute("DROP TABLE knowledge_old")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+    
+    @staticmethod
+    def _like_pattern(query: str) -> str:
+        # LIKE maxsus belgilarini oddiy belgi sifatida qidirish (ESCAPE '\\')
+        return '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    
+    def _get_stat(self, key: str):
+        row = self._conn.execute("SELECT value FROM stats WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+    
+    def migrate_from_json(self, data_dir: str):
+        """Eski JSON fayllardan ma'lumotlarni bir marta ko'chirish"""
+        def load(filename):
+            try:
+                with open(os.path.join(data_dir, filename), 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                return {}
+        
+        users = load('users.json')
+        stats = load('stats.json')
+        qa_pairs = load('knowledge_base.json').get('qa_pairs', {})
+        now = datetime.now().isoformat()
+        
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    """INSERT OR IGNORE INTO users
+                       (user_id, username, first_name, join_date, questions_asked, last_active)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (
+                        (int(user_id), data.get('username'), data.get('first_name'),
+                         data.get('join_date') or now, data.get('questions_asked', 0),
+                         data.get('last_active') or now)
+                        for user_id, data in users.items()
+                    )
+                )
+                self._conn.executemany(self.UPSERT_KNOWLEDGE, (
+                    (DEFAULT_TENANT, question, answer) for question, answer in qa_pairs.items()
+                ))
+                for key in ('total_questions', 'last_question_time'):
+                    if key in stats:
+                        self._conn.execute(self.SET_STAT, (key, stats[key]))
+                # Ko'chirish bir martalik, shuning uchun bu yerda sanash mumkin
+                self._conn.execute("UPDATE stats SET value = (SELECT COUNT(*) FROM users) WHERE key = 'total_users'")
+                self._conn.execute(self.SET_STAT, ('json_migrated', now))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+    
+    def _refresh_activity(self):
+        # Boshqa jarayonlar yozgan faollik (hisoblagichlar va HLL lar) o'qiladi
+        cutoff = (datetime.now().date() - timedelta(days=ActivityTracker.RETENTION_DAYS - 1)).isoformat()
+        rows = self._conn.execute(
+            "SELECT day, hll, questions, new_users FROM activity WHERE day >= ? ORDER BY day", (cutoff,)
+        ).fetchall()
+        with self._activity_lock:
+            self.activity.load_rows(rows)
+    
+    def update_user(self, user_id: int, username: str, first_name: str):
+        self._queue.put((self._write_user, (user_id, username, first_name, datetime.now())))
+    
+    def _write_user(self, user_id: int, username: str, first_name: str, now: datetime):
+        # Yozuvchi oqimda; self._lock olinmaydi (u bilan asosiy ulanish yozuvlari
+        # SQLite qulfini kutadi), xotiradagi faollik esa _activity_lock ostida
+        conn = self._write_conn
+        today = now.date()
+        now = now.isoformat()
+        is_new = conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is None
+        with self._activity_lock:
+            activity_changed = self.activity.record_active(user_id, today)
+        
+        if not (is_new or activity_changed):
+            conn.execute(self.UPSERT_USER, (user_id, username, first_name, now, now))
+            self.writes += 1
+            return
+        
+        # Kunlik HLL faqat o'zgarganda yoziladi
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Yozish qulfi olingandan keyin qayta tekshiriladi (boshqa jarayon ulgurgan bo'lishi mumkin)
+            is_new = conn.execute("SELECT 1 FROM users WHERE user_id = ?", (user_id,)).fetchone() is None
+            row = conn.execute("SELECT hll FROM activity WHERE day = ?", (today.isoformat(),)).fetchone()
+            with self._activity_lock:
+                if row is not None:
+                    self.activity.merge_sketch(row[0], today)
+                if is_new:
+                    self.activity.record_new_user(today)
+                day, sketch, _, _ = self.activity.day_row(today)
+            conn.execute(self.UPSERT_USER, (user_id, username, first_name, now, now))
+            if is_new:
+                conn.execute(self.INCREMENT_USER_COUNT)
+            conn.execute(self.MERGE_ACTIVITY_USER, (day, sketch, int(is_new)))
+            conn.execute("COMMIT")
+            self.writes += 1
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def increment_questions(self, user_id: int):
+        self._queue.put((self._write_question, (user_id, datetime.now())))
+    
+    def _write_question(self, user_id: int, now: datetime):
+        conn = self._write_conn
+        today = now.date()
+        with self._activity_lock:
+            self.activity.record_question(today)
+            day, sketch, _, _ = self.activity.day_row(today)
+        conn.execute("BEGIN")
+        try:
+            conn.execute(self.INCREMENT_USER_QUESTIONS, (user_id,))
+            conn.execute(self.INCREMENT_STAT, ('total_questions',))
+            conn.execute(self.SET_STAT, ('last_question_time', now.isoformat()))
+            conn.execute(self.INCREMENT_ACTIVITY_QUESTIONS, (day, sketch))
+            conn.execute("COMMIT")
+            self.writes += 1
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    
+    def get_users(self) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user_id, username, first_name, join_date, questions_asked, last_active FROM users"
+            ).fetchall()
+        
+        return {
+            str(user_id): {
+                'username': username,
+                'first_name': first_name,
+                'join_date': join_date,
+                'questions_asked': questions_asked,
+                'last_active': last_active
+            }
+            for user_id, username, first_name, join_date, questions_asked, last_active in rows
+        }
+    
+    def count_users(self) -> int:
+        with self._lock:
+            return self._get_stat('total_users') or 0
+    
+    def get_users_page(self, cursor: int, limit: int, query: str = '',
+                       backward: bool = False) -> List[Tuple[int, Dict[str, Any]]]:
+        # Keyset sahifalash: PRIMARY KEY bo'yicha, OFFSET siz
+        sql = ("SELECT user_id, username, first_name, join_date, questions_asked, last_active, blocked "
+               "FROM users WHERE user_id " + ("< ?" if backward else "> ?"))
+        params = [cursor]
+        if query:
+            pattern = self._like_pattern(query)
+            sql += (" AND (username LIKE ? ESCAPE '\\' OR first_name LIKE ? ESCAPE '\\'"
+                    " OR CAST(user_id AS TEXT) = ?)")
+            params += [pattern, pattern, query]
+        sql += " ORDER BY user_id " + ("DESC" if backward else "ASC") + " LIMIT ?"
+        params.append(limit)
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        if backward:
+            rows.reverse()
+        
+        return [
+            (user_id, {
+                'username': username,
+                'first_name': first_name,
+                'join_date': join_date,
+                'questions_asked': questions_asked,
+                'last_active': last_active,
+                'blocked': bool(blocked)
+            })
+            for user_id, username, first_name, join_date, questions_asked, last_active, blocked in rows
+        ]
+    
+    def mark_blocked(self, user_id: int):
+        self._queue.put((self._write_blocked, (user_id,)))
+    
+    def _write_blocked(self, user_id: int):
+        self._write_conn.execute("UPDATE users SET blocked = 1 WHERE user_id = ?", (user_id,))
+        self.writes += 1
+    
+    def get_broadcast_recipients(self) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id FROM users WHERE blocked = 0 ORDER BY user_id").fetchall()
+        return [user_id for user_id, in rows]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total_users = self._get_stat('total_users') or 0
+            total_questions = self._get_stat('total_questions') or 0
+            self._refresh_activity()
+        with self._activity_lock:
+            return {
+                'total_users': total_users,
+                'total_questions': total_questions,
+                **self.activity.summary()
+            }
+    
+    def get_activity_history(self, days: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._refresh_activity()
+        with self._activity_lock:
+            return self.activity.history(days)
+    
+    @staticmethod
+    def _version_key(tenant: str) -> str:
+        # Asosiy baza versiyasi oldingi nom bilan qoladi
+        return 'kb_version' if tenant == DEFAULT_TENANT else f"kb_version:{tenant}"
+    
+    def add_knowledge(self, question: str, answer: str, tenant: str = DEFAULT_TENANT):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(self.UPSERT_KNOWLEDGE, (tenant, question.strip(), answer.strip()))
+                self._conn.execute(self.INCREMENT_STAT, (self._version_key(tenant),))
+                self._conn.execute("COMMIT")
+                self.writes += 1
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._kb_versions[tenant] = self._get_stat(self._version_key(tenant))
+    
+    def add_knowledge_bulk(self, qa_pairs: Dict[str, str], tenant: str = DEFAULT_TENANT) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                count = "SELECT COUNT(*) FROM knowledge WHERE tenant = ?"
+                before = self._conn.execute(count, (tenant,)).fetchone()[0]
+                self._conn.executemany(self.UPSERT_KNOWLEDGE, (
+                    (tenant, question, answer) for question, answer in qa_pairs.items()
+                ))
+                after = self._conn.execute(count, (tenant,)).fetchone()[0]
+                self._conn.execute(self.INCREMENT_STAT, (self._version_key(tenant),))
+                self._conn.execute("COMMIT")
+                self.writes += 1
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._kb_versions[tenant] = self._get_stat(self._version_key(tenant))
+        return after - before
+    
+    def get_knowledge_base(self, tenant: str = DEFAULT_TENANT) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question, answer FROM knowledge WHERE tenant = ? ORDER BY id", (tenant,)
+            ).fetchall()
+        return {'qa_pairs': dict(rows)}
+    
+    def count_knowledge(self, tenant: str = DEFAULT_TENANT) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM knowledge WHERE tenant = ?", (tenant,)).fetchone()[0]
+    
+    def get_knowledge_page(self, offset: int, limit: int, query: str = '',
+                           tenant: str = DEFAULT_TENANT) -> List[Tuple[str, str]]:
+        sql = "SELECT question, answer FROM knowledge WHERE tenant = ?"
+        params = [tenant]
+        if query:
+            pattern = self._like_pattern(query)
+            sql += " AND (question LIKE ? ESCAPE '\\' OR answer LIKE ? ESCAPE '\\')"
+            params += [pattern, pattern]
+        sql += " ORDER BY id LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+    
+    def get_kb_version(self, tenant: str = DEFAULT_TENANT) -> int:
+        # Boshqa jarayon ma'lumot qo'shgan bo'lsa, versiyalar bazadan qayta o'qiladi
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self._kb_versions.clear()
+            version = self._kb_versions.get(tenant)
+            if version is None:
+                version = self._kb_versions[tenant] = self._get_stat(self._version_key(tenant)) or 0
+            return version
+    
+    def release_knowledge(self, tenant: str):
+        with self._lock:
+            self._kb_versions.pop(tenant, None)
+    
+    def get_tenant(self, tenant: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT name, prompt FROM tenants WHERE tenant = ?", (tenant,)).fetchone()
+        return {'name': row[0], 'prompt': row[1]} if row else None
+    
+    def save_tenant(self, tenant: str, name: str, prompt: str = ''):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO tenants (tenant, name, prompt) VALUES (?, ?, ?) "
+                "ON CONFLICT(tenant) DO UPDATE SET name = excluded.name, prompt = excluded.prompt",
+                (tenant, name, prompt)
+            )
+            self.writes += 1
+    
+    def list_tenants(self) -> List[Tuple[str, Dict[str, str]]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT tenant, name, prompt FROM tenants ORDER BY tenant").fetchall()
+        return [(tenant, {'name': name, 'prompt': prompt}) for tenant, name, prompt in rows]
+    
+    def get_chat_tenant(self, chat_id: int) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT tenant FROM chat_tenants WHERE chat_id = ?", (chat_id,)).fetchone()
+        return row[0] if row else None
+    
+    def set_chat_tenant(self, chat_id: int, tenant: str):
+        with self._lock:
+            if tenant == DEFAULT_TENANT:
+                self._conn.execute("DELETE FROM chat_tenants WHERE chat_id = ?", (chat_id,))
+            else:
+                self._conn.execute(
+                    "INSERT INTO chat_tenants (chat_id, tenant) VALUES (?, ?) "
+                    "ON CONFLICT(chat_id) DO UPDATE SET tenant = excluded.tenant", (chat_id, tenant)
+                )
+            self.writes += 1
+    
+    def flush(self):
+        """Navbatdagi yozuvlar bazaga yozilishini kutish"""
+        self._queue.join()
+    
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        with self._lock:
+            self._write_conn.close()
+            self._conn.close()
@@ -0,0 +1,81 @@
+import time
+import asyncio
+import logging
+
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Telegram xabari uzunligi chegarasi
+MAX_MESSAGE_LENGTH = 4096
+
+class MessageStreamer:
+    """Javobni kutish xabarini tahrirlash orqali bosqichma-bosqich ko'rsatish.
+    
+    Tahrirlar `interval` soniyadan tez-tez yuborilmaydi, oradagi bo'laklar
+    bitta tahrirga birlashtiriladi.
+    """
+    
+    CURSOR = " ▌"
+    
+    def __init__(self, message: Message, interval: float):
+        self.message = message
+        self.interval = interval
+        self._shown = None
+        self._last_edit = 0.0
+        self._paused_until = 0.0
+    
+    async def _edit(self, text: str) -> bool:
+        if text == self._shown:
+            return True
+        try:
+            await self.message.edit_text(text)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            seconds = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else retry_after
+            self._paused_until = time.monotonic() + seconds
+            return False
+        except BadRequest as e:
+            # Matn o'zgarmagan bo'lsa, Telegram xato qaytaradi
+            if 'not modified' not in e.message.lower():
+                raise
+        self._shown = text
+        self._last_edit = time.monotonic()
+        return True
+    
+    async def update(self, text: str):
+        """Oqim davomida yig'ilgan matn (birinchi bo'lak darhol ko'rsatiladi)"""
+        now = time.monotonic()
+        if now < self._paused_until or now - self._last_edit < self.interval:
+            return
+        preview = text[:MAX_MESSAGE_LENGTH - len(self.CURSOR)] + self.CURSOR
+        try:
+            await self._edit(preview)
+        except TelegramError as e:
+            logger.warning(f"Oqimli tahrirda xatolik: {e}")
+    
+    async def finish(self, text: str):
+        """Yakuniy javob: kutish xabari tahrirlanadi, ortiqchasi alohida yuboriladi"""
+        text = text or "❌ Javob bo'sh qaytdi"
+        chunks = [text[i:i + MAX_MESSAGE_LENGTH] for i in range(0, len(text), MAX_MESSAGE_LENGTH)]
+        
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            edited = await self._edit(chunks[0])
+            if not edited:
+                await asyncio.sleep(max(self._paused_until - time.monotonic(), 0))
+                edited = await self._edit(chunks[0])
+        except BadRequest as e:
+            # Kutish xabari o'chirilgan yoki endi tahrirlab bo'lmaydi
+            logger.warning(f"Kutish xabarini tahrirlab bo'lmadi: {e}")
+            edited = False
+        # Javob yo'qolmasligi uchun tahrirlab bo'lmasa yangi xabar sifatida yuboriladi
+        send = self.message.reply_text if edited else self.message.chat.send_message
+        if not edited:
+            await send(chunks[0])
+        
+        for chunk in chunks[1:]:
+            await send(chunk)
@@ -0,0 +1,222 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from database import Database
+from knowledge import KnowledgeMatcher
+from storage import DEFAULT_TENANT
+
+# Maktab kodi /start parametri sifatida ham keladi (t.me/bot?start=<kod>),
+# Telegram deep-link da faqat lotin harflari, raqamlar, _ va - ruxsat etilgan
+TENANT_ID = re.compile(r'[a-z0-9_-]{1,32}')
+
+DEFAULT_PROMPT = ("Siz {name} yordamchi assistanti sifatida javob berasiz. Faqat berilgan ma'lumotlar asosida "
+                  "javob bering. Agar savolga javob knowledge bazada bo'lmasa, 'Afsuski, men bu haqda "
+                  "maʼlumotga ega emasman' deb javob bering.")
+
+def parse_tenant_id(text: Optional[str]) -> Optional[str]:
+    value = (text or '').strip().lower()
+    return value if TENANT_ID.fullmatch(value) else None
+
+class TenantKnowledge:
+    """Bitta maktab bilimlari: KB avtomati va TF-IDF indeksi.
+    
+    Ikkalasi ham birinchi kerak bo'lganda quriladi va maktab bazasi
+    versiyasi o'zgarganda (boshqa jarayonda ham) qayta quriladi.
+    """
+    
+    def __init__(self, db: Database, tenant: str, name: str, prompt: str = ''):
+        self.db = db
+        self.tenant = tenant
+        self.name = name
+        self.prompt = prompt
+        self.rebuilding = False
+        self._matcher = None
+        self._matcher_version = None
+        self._index = None
+        self._index_version = None
+        # Fondagi warm_up va birinchi savol bir xil indeksni ikki marta qurmasligi uchun
+        self._build_lock = threading.Lock()
+    
+    @property
+    def system_prompt(self) -> str:
+        return self.prompt or DEFAULT_PROMPT.format(name=self.name)
+    
+    @property
+    def version(self) -> int:
+        return self.db.get_kb_version(self.tenant)
+    
+    @property
+    def ready(self) -> bool:
+        """Avtomat va indeks qurilgan (baza o'zgargan bo'lsa ham ular bilan javob berish mumkin)"""
+        return self._matcher is not None and self._index is not None
+    
+    @property
+    def stale(self) -> bool:
+        """Baza avtomat yoki indeks qurilganidan keyin o'zgargan (boshqa jarayonda ham)"""
+        # Sovuq maktab fayli bu yerda o'qilmaydi (versiya faqat ikkalasi qurilgandan keyin so'raladi)
+        if not self.ready or self.rebuilding:
+            return False
+        version = self.version
+        return self._matcher_version != version or self._index_version != version or self._index.pending
+    
+    def _qa_pairs(self) -> Dict[str, str]:
+        return self.db.get_knowledge_base(self.tenant).get('qa_pairs', {})
+    
+    def get_matcher(self) -> KnowledgeMatcher:
+        # Eskirgan avtomat yangisi fonda qurilguncha ishlatiladi (warm_up)
+        if self._matcher is None:
+            with self._build_lock:
+                if self._matcher is None:
+                    version = self.version
+                    self._matcher = KnowledgeMatcher(self._qa_pairs())
+                    self._matcher_version = version
+        return self._matcher
+    
+    def get_index(self):
+        if self._index is None:
+            with self._build_lock:
+                if self._index is None:
+                    # scipy faqat indeks birinchi marta kerak bo'lganda yuklanadi
+                    from retrieval import RetrievalIndex
+                    version = self.version
+                    self._index = RetrievalIndex(self._qa_pairs())
+                    self._index_version = version
+        return self._index
+    
+    def warm_up(self):
+        """Avtomat va indeksni bazaning joriy versiyasiga moslab qurish (fon oqimida).
+        
+        Yangisi tayyor bo'lgach almashtiriladi, shu paytgacha savollarga eskisi javob beradi.
+        """
+        with self._build_lock:
+            version = self.version
+            if self._matcher_version != version or self._index_version != version:
+                qa_pairs = self._qa_pairs()
+                if self._matcher is None or self._matcher_version != version:
+                    matcher = KnowledgeMatcher(qa_pairs)
+                    self._matcher, self._matcher_version = matcher, version
+                if self._index is None or self._index_version != version:
+                    from retrieval import RetrievalIndex
+                    index = RetrievalIndex(qa_pairs)
+                    self._index, self._index_version = index, version
+            # /add_info qo'shgan juftliklar TF-IDF matritsasiga shu yerda kiritiladi
+            if self._index.pending:
+                self._index.commit()
+    
+    def on_added(self, question: str, answer: str):
+        # TF-IDF indeksi qayta qurilmaydi, faqat yangi juftlik qo'shiladi
+        version = self.version
+        if self._index is not None and self._index_version == version - 1:
+            self._index.add(question, answer)
+            self._index_version = version
+    
+    def on_reloaded(self):
+        # Import paytida indekslar import_pairs ning o'zida quriladi
+        if not self.rebuilding:
+            self._index = None
+    
+    def import_pairs(self, qa_pairs: Dict[str, str]) -> int:
+        added = self.db.add_knowledge_bulk(qa_pairs, self.tenant)
+        version = self.version
+        qa_pairs = dict(self._qa_pairs())
+        # Avtomat va TF-IDF indeksi bir marta quriladi va tayyor bo'lgach almashtiriladi
+        from retrieval import RetrievalIndex
+        matcher = KnowledgeMatcher(qa_pairs)
+        index = RetrievalIndex(qa_pairs)
+        self._matcher, self._matcher_version = matcher, version
+        self._index, self._index_version = index, version
+        return added
+
+class TenantRegistry:
+    """Faol maktablar: LRU tartibida eng ko'pi `max_active` ta.
+    
+    Maktab birinchi savolda yuklanadi; limitdan oshganda eng uzoq
+    ishlatilmaganining avtomati va indeksi xotiradan chiqariladi. Shuning
+    uchun xotira jami emas, faol maktablar soniga bog'liq, maktabni topish
+    esa bitta lug'at so'rovi.
+    """
+    
+    def __init__(self, db: Database, default_name: str, max_active: int = 32):
+        self.db = db
+        self.default_name = default_name
+        self.max_active = max(max_active, 1)
+        self._active: Dict[str, TenantKnowledge] = OrderedDict()
+        self._lock = threading.Lock()
+        self.db.on_knowledge_added(self._on_knowledge_added)
+        self.db.on_knowledge_reloaded(self._on_knowledge_reloaded)
+        metrics.ACTIVE_TENANTS.set_function(lambda: len(self._active))
+    
+    def __len__(self) -> int:
+        return len(self._active)
+    
+    def _loaded(self, tenant: str) -> Optional[TenantKnowledge]:
+        with self._lock:
+            return self._active.get(tenant)
+    
+    def _on_knowledge_added(self, tenant: str, question: str, answer: str):
+        knowledge = self._loaded(tenant)
+        if knowledge is not None:
+            knowledge.on_added(question, answer)
+    
+    def _on_knowledge_reloaded(self, tenant: str):
+        knowledge = self._loaded(tenant)
+        if knowledge is not None:
+            knowledge.on_reloaded()
+    
+    def info(self, tenant: str) -> Optional[Dict[str, str]]:
+        """Maktab nomi va prompti (noma'lum maktab - None)"""
+        if tenant == DEFAULT_TENANT:
+            return {'name': self.default_name, 'prompt': ''}
+        return self.db.get_tenant(tenant)
+    
+    def exists(self, tenant: str) -> bool:
+        return self.info(tenant) is not None
+    
+    def list_tenants(self) -> List[Tuple[str, Dict[str, str]]]:
+        return [(DEFAULT_TENANT, self.info(DEFAULT_TENANT))] + self.db.list_tenants()
+    
+    def resolve(self, chat_id: Optional[int]) -> str:
+        """Chatga biriktirilgan maktab (biriktirilmagan bo'lsa - asosiy)"""
+        if chat_id is None:
+            return DEFAULT_TENANT
+        return self.db.get_chat_tenant(chat_id) or DEFAULT_TENANT
+    
+    def bind(self, chat_id: int, tenant: str):
+        self.db.set_chat_tenant(chat_id, tenant)
+    
+    def save(self, tenant: str, name: str, prompt: str = ''):
+        self.db.save_tenant(tenant, name, prompt)
+        knowledge = self._loaded(tenant)
+        if knowledge is not None:
+            knowledge.name, knowledge.prompt = name, prompt
+    
+    def get(self, tenant: str) -> TenantKnowledge:
+        with self._lock:
+            knowledge = self._active.get(tenant)
+            if knowledge is not None:
+                self._active.move_to_end(tenant)
+                return knowledge
+        
+        # Bazada yo'q maktabga biriktirilgan chat asosiy bazadan foydalanadi
+        info = self.info(tenant)
+        if info is None:
+            return self.get(DEFAULT_TENANT)
+        
+        evicted = []
+        with self._lock:
+            knowledge = self._active.get(tenant)
+            if knowledge is None:
+                knowledge = TenantKnowledge(self.db, tenant, info['name'], info.get('prompt', ''))
+                self._active[tenant] = knowledge
+                while len(self._active) > self.max_active:
+                    evicted.append(self._active.popitem(last=False)[0])
+            else:
+                self._active.move_to_end(tenant)
+        
+        for name in evicted:
+            self.db.release_knowledge(name)
+            metrics.TENANT_EVICTIONS.inc()
+        return knowledge
@@ -0,0 +1,141 @@
+import asyncio
+import unittest
+
+from concurrency import Overloaded, PriorityLimiter, SingleFlight
+
+class PriorityLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_waiters_served_by_priority_then_arrival(self):
+        limiter = PriorityLimiter(limit=1, max_waiting=10)
+        await limiter.acquire()
+        order = []
+        
+        async def waiter(name: str, priority: int):
+            async with limiter.slot(priority):
+                order.append(name)
+        
+        tasks = [asyncio.create_task(waiter(name, priority))
+                 for name, priority in (('llm1', 1), ('kb1', 0), ('llm2', 1), ('kb2', 0))]
+        await asyncio.sleep(0)
+        self.assertEqual(limiter.waiting, 4)
+        
+        limiter.release()
+        await asyncio.gather(*tasks)
+        self.assertEqual(order, ['kb1', 'kb2', 'llm1', 'llm2'])
+        self.assertEqual((limiter.active, limiter.waiting), (0, 0))
+    
+    async def test_full_queue_sheds_newcomer_of_same_priority(self):
+        limiter = PriorityLimiter(limit=1, max_waiting=1)
+        await limiter.acquire()
+        queued = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+        
+        with self.assertRaises(Overloaded):
+            await limiter.acquire(1)
+        self.assertEqual(limiter.rejected, 1)
+        self.assertFalse(queued.done())
+        
+        limiter.release()
+        await queued
+        self.assertEqual((limiter.active, limiter.waiting), (1, 0))
+    
+    async def test_full_queue_evicts_latest_lower_priority_waiter(self):
+        limiter = PriorityLimiter(limit=1, max_waiting=2)
+        await limiter.acquire()
+        first = asyncio.create_task(limiter.acquire(1))
+        latest = asyncio.create_task(limiter.acquire(1))
+        await asyncio.sleep(0)
+        
+        urgent = asyncio.create_task(limiter.acquire(0))
+        await asyncio.sleep(0)
+        with self.assertRaises(Overloaded):
+            await latest
+        self.assertFalse(first.done())
+        self.assertEqual(limiter.waiting, 2)
+        
+        limiter.release()
+        await urgent
+        self.assertFalse(first.done())
+        limiter.release()
+        await first
+        self.assertEqual((limiter.active, limiter.waiting), (1, 0))
+    
+    async def test_cancelled_waiter_gives_back_its_place(self):
+        limiter = PriorityLimiter(limit=1, max_waiting=2)
+        await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire())
+        other = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        
+        cancelled.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await cancelled
+        self.assertEqual(limiter.waiting, 1)
+        
+        limiter.release()
+        await other
+        limiter.release()
+        self.assertEqual((limiter.active, limiter.waiting), (0, 0))
+
+class SingleFlightTest(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        calls = 0
+        
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return 'javob'
+        
+        results = await asyncio.gather(*(flight.do('savol', fetch) for _ in range(5)))
+        self.assertEqual(results, ['javob'] * 5)
+        self.assertEqual((calls, flight.calls, flight.shared), (1, 1, 4))
+        self.assertEqual(len(flight), 0)
+    
+    async def test_error_reaches_every_waiter_and_is_not_cached(self):
+        flight = SingleFlight()
+        
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError('upstream')
+        
+        results = await asyncio.gather(*(flight.do('savol', fail) for _ in range(3)), return_exceptions=True)
+        self.assertEqual([type(result) for result in results], [RuntimeError] * 3)
+        self.assertNotIn('savol', flight)
+        
+        async def succeed():
+            return 'javob'
+        
+        self.assertEqual(await flight.do('savol', succeed), 'javob')
+    
+    async def test_cancelled_waiter_does_not_cancel_shared_call(self):
+        flight = SingleFlight()
+        
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return 'javob'
+        
+        first = asyncio.create_task(flight.do('savol', fetch))
+        second = asyncio.create_task(flight.do('savol', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        
+        self.assertEqual(await second, 'javob')
+        self.assertTrue(first.cancelled())
+    
+    async def test_start_runs_without_waiter(self):
+        flight = SingleFlight()
+        done = asyncio.Event()
+        
+        async def build():
+            done.set()
+        
+        task = flight.start('maktab', build)
+        self.assertIn('maktab', flight)
+        self.assertIs(flight.start('maktab', build), task)
+        await asyncio.wait_for(done.wait(), 1)
+        await task
+        self.assertNotIn('maktab', flight)
+
+if __name__ == '__main__':
+    unittest.main()
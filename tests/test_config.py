@@ -0,0 +1,28 @@
+import os
+import unittest
+from unittest import mock
+
+import config
+from config import Config
+
+class EnvNumberTest(unittest.TestCase):
+    def setUp(self):
+        self._errors = list(config._env_errors)
+    
+    def tearDown(self):
+        config._env_errors[:] = self._errors
+    
+    def test_valid_and_missing_values(self):
+        with mock.patch.dict(os.environ, {'TEST_RATE': ' 2.5 '}):
+            self.assertEqual(config._env_float('TEST_RATE', '1'), 2.5)
+            self.assertEqual(config._env_int('TEST_MISSING', '40'), 40)
+        self.assertEqual(config._env_errors, self._errors)
+    
+    def test_malformed_value_falls_back_and_is_reported(self):
+        with mock.patch.dict(os.environ, {'TEST_PORT': '84a3'}):
+            self.assertEqual(config._env_int('TEST_PORT', '8443'), 8443)
+        errors = Config.validate_config()
+        self.assertTrue(any(error.startswith('TEST_PORT') for error in errors))
+
+if __name__ == '__main__':
+    unittest.main()
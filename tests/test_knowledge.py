@@ -0,0 +1,41 @@
+import unittest
+
+from knowledge import KnowledgeMatcher, normalize_text
+
+class KnowledgeMatcherTest(unittest.TestCase):
+    def match(self, qa_pairs: dict, text: str):
+        found = KnowledgeMatcher(qa_pairs).match(text)
+        return found[1] if found else None
+    
+    def test_normalizes_case_spaces_and_apostrophes(self):
+        self.assertEqual(normalize_text("  O‘qituvchi   KIM? "), "o'qituvchi kim?")
+        self.assertEqual(self.match({"O'qituvchi kim?": "Karimova"}, "Salom, o‘qituvchi  KIM?"), "Karimova")
+    
+    def test_longest_of_nested_questions(self):
+        qa_pairs = {"dars jadvali": "qisqa", "dars jadvali qachon": "uzun"}
+        self.assertEqual(self.match(qa_pairs, "dars jadvali qachon e'lon qilinadi"), "uzun")
+        self.assertEqual(self.match(qa_pairs, "dars jadvali qayerda"), "qisqa")
+    
+    def test_overlapping_questions_found_through_fail_links(self):
+        # "she" tugagach "hers" boshqa holatdan davom etadi
+        qa_pairs = {"he": "1", "she": "2", "hers": "3"}
+        self.assertEqual(self.match(qa_pairs, "ushers"), "3")
+        self.assertEqual(self.match(qa_pairs, "ushe"), "2")
+    
+    def test_suffix_question_inside_failed_longer_one(self):
+        qa_pairs = {"abcd": "uzun", "bc": "qisqa"}
+        self.assertEqual(self.match(qa_pairs, "abce"), "qisqa")
+        self.assertEqual(self.match(qa_pairs, "xabcd"), "uzun")
+    
+    def test_duplicate_normalized_question_keeps_last_answer(self):
+        matcher = KnowledgeMatcher({"Direktor kim?": "eski", "direktor  KIM?": "yangi"})
+        self.assertEqual(len(matcher), 1)
+        self.assertEqual(matcher.match("direktor kim?"), ("direktor  KIM?", "yangi"))
+    
+    def test_no_match(self):
+        self.assertIsNone(self.match({"Direktor kim?": "Hasanov"}, "Kutubxona qayerda?"))
+        self.assertIsNone(self.match({}, "Direktor kim?"))
+        self.assertIsNone(self.match({"   ": "bo'sh"}, "   "))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from config import Config
+from retrieval import RetrievalIndex
+
+QA_PAIRS = {
+    "Dars jadvali qachon?": "Dars jadvali har dushanba e'lon qilinadi.",
+    "Maktab qachon ochiladi?": "Maktab 1-sentabrda ochiladi.",
+    "Kutubxona qayerda joylashgan?": "Kutubxona ikkinchi qavatda.",
+    "Direktor kim?": "Direktor - Hasanov A.",
+    "Imtihonlar qachon boshlanadi?": "Imtihonlar may oyida boshlanadi."
+}
+
+class RetrievalThresholdTest(unittest.TestCase):
+    """RETRIEVAL_THRESHOLD dan yuqori o'xshashlik - LLM siz javob, shuning uchun
+    yaqin, lekin boshqa savollar chegaradan past qolishi kerak"""
+    
+    def setUp(self):
+        self.index = RetrievalIndex(QA_PAIRS)
+    
+    def score(self, text: str) -> float:
+        hits = self.index.search(text, 1)
+        return hits[0][0] if hits else 0.0
+    
+    def test_same_question_scores_one(self):
+        self.assertAlmostEqual(self.score("maktab qachon ochiladi?"), 1.0, places=6)
+    
+    def test_close_rewordings_pass_threshold(self):
+        for text in ("Maktab qachon ochiladi", "dars jadvali qachon", "Imtihonlar qachon boshlanadi",
+                     "imtihon qachon boshlanadi?"):
+            with self.subTest(text=text):
+                self.assertGreaterEqual(self.score(text), Config.RETRIEVAL_THRESHOLD)
+    
+    def test_unseen_words_lower_the_score(self):
+        # Bazada yo'q so'zlar so'rov normasiga kiradi
+        self.assertLess(self.score("Dars jadvali xyzzy plugh qachon?"), Config.RETRIEVAL_THRESHOLD)
+    
+    def test_near_miss_stays_below_threshold(self):
+        # "yopiladi" va "ochiladi" ko'p n-grammlari umumiy, lekin ma'nosi teskari
+        for text in ("Maktab qachon yopiladi?", "Dars jadvali qachon bo'ladi?"):
+            with self.subTest(text=text):
+                self.assertLess(self.score(text), Config.RETRIEVAL_THRESHOLD)
+    
+    def test_added_pair_is_found_after_commit(self):
+        self.index.add("Bayram qachon?", "Bayram 25-dekabrda.")
+        self.assertTrue(self.index.pending)
+        # commit gacha qidiruv eski matritsadan foydalanadi
+        self.assertLess(self.score("bayram qachon?"), Config.RETRIEVAL_THRESHOLD)
+        self.assertAlmostEqual(self.score("maktab qachon ochiladi?"), 1.0, places=6)
+        
+        self.index.commit()
+        self.assertFalse(self.index.pending)
+        hits = self.index.search("bayram qachon?", 1)
+        self.assertEqual(hits[0][2], "Bayram 25-dekabrda.")
+    
+    def test_first_pairs_of_empty_index(self):
+        index = RetrievalIndex()
+        index.add("Direktor kim?", "Direktor - Hasanov A.")
+        self.assertEqual(index.search("direktor kim?", 1)[0][2], "Direktor - Hasanov A.")
+
+if __name__ == '__main__':
+    unittest.main()
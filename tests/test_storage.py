@@ -0,0 +1,62 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import SQLiteBackend
+
+class SQLiteBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.workdir, 'bot.db')
+        self.backend = SQLiteBackend(self.db_path, self.workdir)
+    
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+    
+    def test_queued_writes_are_visible_after_flush(self):
+        self.backend.update_user(1, 'ali', 'Ali')
+        self.backend.increment_questions(1)
+        self.backend.increment_questions(1)
+        self.backend.flush()
+        
+        self.assertEqual(self.backend.get_users()['1']['questions_asked'], 2)
+        self.assertEqual(self.backend.count_users(), 1)
+        self.assertEqual(self.backend.get_stats()['total_questions'], 2)
+    
+    def test_writes_do_not_wait_for_other_process(self):
+        # Boshqa jarayon yozish qulfini ushlab turibdi
+        other = sqlite3.connect(self.db_path, isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        try:
+            started = time.perf_counter()
+            self.backend.update_user(2, 'vali', 'Vali')
+            self.backend.increment_questions(2)
+            self.assertLess(time.perf_counter() - started, 0.1)
+            # O'qishlar ham yozuvchini kutmaydi
+            self.assertEqual(self.backend.count_users(), 0)
+        finally:
+            other.execute("COMMIT")
+            other.close()
+        
+        self.backend.flush()
+        self.assertEqual(self.backend.get_users()['2']['questions_asked'], 1)
+    
+    def test_admin_writes_alongside_writer_thread(self):
+        # Yozuvchi oqim va asosiy ulanish bir-birining qulfini kutib qolmasligi kerak
+        # (bot da /start biriktirishlari asyncio.to_thread orqali parallel yoziladi)
+        for user_id in range(1, 1001):
+            self.backend.update_user(user_id, None, 'Foydalanuvchi')
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda user_id: self.backend.set_chat_tenant(user_id, 'maktab1'), range(1, 1001)))
+        self.backend.flush()
+        
+        self.assertEqual(self.backend.count_users(), 1000)
+        self.assertEqual(self.backend.get_chat_tenant(1000), 'maktab1')
+
+if __name__ == '__main__':
+    unittest.main()
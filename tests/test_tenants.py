@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from database import Database
+from storage import JsonBackend
+from tenants import TenantKnowledge, TenantRegistry
+
+def make_pairs(count: int, prefix: str = 'savol'):
+    return {f"{prefix} {index} qachon bo'ladi?": f"javob {index}" for index in range(count)}
+
+class TenantKnowledgeTest(unittest.TestCase):
+    def setUp(self):
+        # Database joriy papkada data/ yaratadi
+        self._cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+        self.db = Database(JsonBackend('data', flush_interval=60, flush_every=10 ** 6))
+    
+    def tearDown(self):
+        self.db.close()
+        os.chdir(self._cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+    
+    def test_add_during_warm_up(self):
+        # warm_up fon oqimida bazani o'qiyotganda /add_info bazani o'zgartiradi
+        self.db.add_knowledge_bulk(make_pairs(5000))
+        knowledge = TenantKnowledge(self.db, 'default', 'Maktab')
+        errors = []
+        
+        def warm_up():
+            try:
+                for _ in range(3):
+                    knowledge._matcher = knowledge._index = None
+                    knowledge.warm_up()
+            except Exception as e:
+                errors.append(e)
+        
+        thread = threading.Thread(target=warm_up)
+        thread.start()
+        index = 0
+        while thread.is_alive() and index < 500:
+            self.db.add_knowledge(f"yangi savol {index}?", "yangi javob")
+            index += 1
+            time.sleep(0.001)
+        thread.join()
+        
+        self.assertEqual(errors, [])
+        self.assertGreater(index, 0)
+    
+    def test_stale_matcher_is_served_until_rebuilt(self):
+        self.db.add_knowledge("Direktor kim?", "Hasanov A.")
+        knowledge = TenantKnowledge(self.db, 'default', 'Maktab')
+        knowledge.warm_up()
+        matcher = knowledge.get_matcher()
+        
+        self.db.add_knowledge("Bayram qachon?", "25-dekabrda")
+        self.assertTrue(knowledge.ready)
+        self.assertTrue(knowledge.stale)
+        # Savol qayta qurilishni kutmaydi
+        self.assertIs(knowledge.get_matcher(), matcher)
+        
+        knowledge.warm_up()
+        self.assertFalse(knowledge.stale)
+        self.assertEqual(knowledge.get_matcher().match("Bayram qachon?")[1], "25-dekabrda")
+    
+    def test_tenants_do_not_share_answers(self):
+        registry = TenantRegistry(self.db, 'Asosiy maktab', max_active=1)
+        registry.save('maktab1', '1-maktab')
+        self.db.add_knowledge("Direktor kim?", "Birinchi maktab direktori", 'maktab1')
+        self.db.add_knowledge("Direktor kim?", "Asosiy maktab direktori")
+        
+        self.assertEqual(registry.get('maktab1').get_matcher().match("Direktor kim?")[1],
+                         "Birinchi maktab direktori")
+        # max_active=1: maktab1 chiqariladi, asosiy baza o'zinikini qaytaradi
+        self.assertEqual(registry.get('default').get_matcher().match("Direktor kim?")[1],
+                         "Asosiy maktab direktori")
+        self.assertEqual(len(registry), 1)
+    
+    def test_unknown_tenant_falls_back_to_default(self):
+        registry = TenantRegistry(self.db, 'Asosiy maktab')
+        self.assertEqual(registry.get('yoq').tenant, 'default')
+
+if __name__ == '__main__':
+    unittest.main()
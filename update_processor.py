@@ -0,0 +1,84 @@
+import asyncio
+from typing import Awaitable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class UpdateQueue(asyncio.Queue):
+    """Hajmi qayta ishlanayotgan update larni ham hisobga oladigan navbat.
+    
+    Parallel rejimda Application update ni navbatdan darhol olib, alohida task
+    yaratadi, shuning uchun oddiy navbat hech qachon to'lmaydi. Bu yerda
+    chegara tugallanmagan update lar (navbatda + qayta ishlanayotgan) bo'yicha:
+    Application har bir update tugagach task_done() chaqiradi. To'lganda
+    webhook 503 qaytaradi, polling esa yangi update larni olishni kutadi.
+    """
+    
+    @property
+    def in_flight(self) -> int:
+        return self._unfinished_tasks
+    
+    def full(self) -> bool:
+        return 0 < self.maxsize <= self._unfinished_tasks
+    
+    def task_done(self):
+        super().task_done()
+        # put() da kutayotganlar navbatdan olinganda emas, update tugaganda uyg'otiladi
+        self._wakeup_next(self._putters)
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Turli chatlarning update lari parallel, bitta chatniki esa qat'iy ketma-ket.
+    
+    Admin reklama oqimi (/broadcast -> media/matn -> "Ha/Yo'q") context.user_data
+    holatiga tayanadi, shuning uchun bitta chat ichidagi tartib saqlanishi kerak.
+    Umumiy parallellik `max_concurrent_updates` bilan cheklanadi.
+    """
+    
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        # Kalit -> [lock, shu kalitdagi update lar soni]; bo'shagan kalitlar o'chiriladi
+        self._chains: Dict[Hashable, list] = {}
+    
+    @staticmethod
+    def _ordering_key(update: object) -> Optional[Hashable]:
+        if isinstance(update, Update):
+            if update.effective_chat is not None:
+                return ('chat', update.effective_chat.id)
+            if update.effective_user is not None:
+                return ('user', update.effective_user.id)
+        return None
+    
+    @property
+    def active_chains(self) -> int:
+        return len(self._chains)
+    
+    async def process_update(self, update: object, coroutine: Awaitable) -> None:
+        key = self._ordering_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+        
+        chain = self._chains.get(key)
+        if chain is None:
+            chain = [asyncio.Lock(), 0]
+            self._chains[key] = chain
+        chain[1] += 1
+        
+        try:
+            # Avval chat navbati, keyin umumiy semafor: kutayotgan update lar
+            # umumiy joylarni band qilib turmaydi
+            async with chain[0]:
+                await super().process_update(update, coroutine)
+        finally:
+            chain[1] -= 1
+            if chain[1] == 0:
+                del self._chains[key]
+    
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        await coroutine
+    
+    async def initialize(self) -> None:
+        pass
+    
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,106 @@
+import hmac
+import signal
+import asyncio
+import logging
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+class WebhookServer:
+    """Telegram webhook qabul qiluvchi aiohttp server (+ /health)"""
+    
+    SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+    
+    def __init__(self, application: Application, path: str, secret_token: str):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.received = 0
+        self.rejected = 0
+    
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        app.router.add_get('/health', self.health)
+        return app
+    
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret_token:
+            received_token = request.headers.get(self.SECRET_HEADER, '')
+            if not hmac.compare_digest(received_token, self.secret_token):
+                logger.warning(f"Webhook: noto'g'ri maxfiy token ({request.remote})")
+                return web.Response(status=403)
+        
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except ValueError:
+            return web.Response(status=400)
+        
+        try:
+            self.application.update_queue.put_nowait(update)
+        except asyncio.QueueFull:
+            # Telegram 2xx bo'lmagan javobdan keyin update ni qayta yuboradi
+            self.rejected += 1
+            logger.warning("Webhook: tugallanmagan update lar chegarasi to'la")
+            return web.Response(status=503)
+        
+        self.received += 1
+        return web.Response()
+    
+    async def health(self, request: web.Request) -> web.Response:
+        queue = self.application.update_queue
+        return web.json_response({
+            'status': 'ok' if self.application.running else 'starting',
+            'update_queue': queue.qsize(),
+            'update_queue_size': queue.maxsize,
+            'in_flight': getattr(queue, 'in_flight', queue.qsize()),
+            'received': self.received,
+            'rejected': self.rejected
+        })
+
+async def run_webhook(application: Application):
+    """run_polling o'rniga: webhook o'rnatish va HTTP serverni ishga tushirish"""
+    server = WebhookServer(application, Config.WEBHOOK_PATH, Config.WEBHOOK_SECRET)
+    runner = web.AppRunner(server.build_app())
+    
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+    
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    
+    try:
+        await application.bot.set_webhook(
+            url=Config.WEBHOOK_URL.rstrip('/') + Config.WEBHOOK_PATH,
+            secret_token=Config.WEBHOOK_SECRET or None,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=Config.WEBHOOK_MAX_CONNECTIONS
+        )
+        await application.start()
+        
+        await runner.setup()
+        site = web.TCPSite(runner, Config.WEBHOOK_LISTEN, Config.WEBHOOK_PORT)
+        await site.start()
+        logger.info(f"Webhook server ishga tushdi: {Config.WEBHOOK_LISTEN}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+        
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)